@@ -1,27 +1,48 @@
 from __future__ import print_function
 import sys
-import numpy as np
 
 from sfdd.structural_model import StructuralModel
+from sfdd.log_reader import LogReader
 from sfdd.sfdd import SFDD
+from sfdd.result_store import FaultIntervalStore
+from sfdd.diagnosis import ComponentDiagnoser
 
 if __name__ == '__main__':
     structural_model_file = sys.argv[1]
     data_file = sys.argv[2]
     window_size = int(sys.argv[3])
+    result_file = sys.argv[4] if len(sys.argv) > 4 else None
 
     structural_model = StructuralModel(structural_model_file)
     sfdd_manager = SFDD(structural_model.sensors, structural_model, 0.8, 2)
+    diagnoser = ComponentDiagnoser(structural_model, sfdd_manager.sensor_names)
 
-    data = np.loadtxt(data_file, skiprows=1, delimiter=';')
-    start_time = data[15, 0]
-    data[:, 0] = data[:, 0] - start_time
+    timestamps, data = LogReader(data_file).read_sensors(structural_model.sensors)
+    start_time = timestamps[15]
+    timestamps = timestamps - start_time
 
-    measurement_cols = np.array([8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, \
-                                 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 35, 36])
-    for i in range(15, data.shape[0] - window_size):
-        sensors = sfdd_manager.monitor_sensors_basic(data[i:i+window_size, measurement_cols],
-                                                     data[i:i+window_size, 0])
-        print(data[i+window_size, 0])
+    ### the results are written to a fault interval store if a result file is given
+    result_store = None
+    if result_file is not None:
+        result_store = FaultIntervalStore(result_file, sfdd_manager.sensor_names,
+                                          sfdd_manager.pattern_registry.names)
+
+    sfdd_manager.start_stream(window_size)
+    for i in range(15, data.shape[0]):
+        sensors = sfdd_manager.push(timestamps[i], data[i])
+        if i - 15 + 1 < window_size:
+            continue
+        if result_store is not None:
+            result_store.append(timestamps[i], sensors, sfdd_manager.window_patterns)
+            continue
+        print(timestamps[i])
         print(sensors)
+        if sensors:
+            ### the three most likely sets of faulty components
+            print(diagnoser.diagnose(sensors)[0:3])
         print()
+
+    if result_store is not None:
+        result_store.close()
+        for interval in result_store.intervals():
+            print(interval)
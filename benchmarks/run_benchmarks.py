@@ -0,0 +1,384 @@
+'''
+Benchmarks of the detection latency, throughput, training time and peak memory
+of SFDD on synthetic workloads of configurable size and on the youBot logs.
+
+Usage (from the repository root):
+    python -m benchmarks.run_benchmarks --output results.json [--compare old_results.json]
+
+'''
+from __future__ import print_function
+import os
+import glob
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+
+from sfdd.structural_model import StructuralModel
+from sfdd.sfdd import SFDD
+from sfdd.log_reader import LogReader
+from sfdd.parallel import ParallelDetector
+from benchmarks.synthetic import generate_structural_model, generate_signals, inject_faults
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def summarise_latencies(latencies):
+    '''Returns a dictionary with latency percentiles (in milliseconds) and the throughput
+    (in windows per second) corresponding to a list of per-window latencies in seconds
+
+    Keyword arguments:
+    latencies -- a list of per-window latencies in seconds
+
+    '''
+    latencies = np.asarray(latencies) * 1e3
+    return {'latency_ms': {'p50': float(np.percentile(latencies, 50)),
+                           'p90': float(np.percentile(latencies, 90)),
+                           'p99': float(np.percentile(latencies, 99)),
+                           'max': float(latencies.max())},
+            'windows_per_second': float(1e3 * len(latencies) / latencies.sum())}
+
+def peak_memory(function):
+    '''Returns the peak memory (in bytes) allocated while "function" is executed
+
+    Keyword arguments:
+    function -- a function without arguments
+
+    '''
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def benchmark_monitoring(sfdd_manager, data, timestamps, window_size, mode, max_windows):
+    '''Returns the latency statistics and the peak memory of calling the per-window
+    monitoring method of the given mode on consecutive windows of "data"
+
+    Keyword arguments:
+    sfdd_manager -- an "SFDD" instance (trained for the extended mode)
+    data -- an m x n numpy array of sensor measurements
+    timestamps -- a numpy array with the m timestamps of the measurements
+    window_size -- number of measurements in a window
+    mode -- 'basic' or 'extended'
+    max_windows -- maximum number of monitored windows
+
+    '''
+    if mode == 'basic':
+        monitor = sfdd_manager.monitor_sensors_basic
+    else:
+        monitor = sfdd_manager.monitor_sensors_extended
+    window_count = min(data.shape[0] - window_size, max_windows)
+
+    latencies = list()
+    for i in range(window_count):
+        window, window_timestamps = data[i:i+window_size], timestamps[i:i+window_size]
+        start_time = time.perf_counter()
+        monitor(window, window_timestamps)
+        latencies.append(time.perf_counter() - start_time)
+
+    result = summarise_latencies(latencies)
+    memory_windows = min(window_count, 50)
+    result['peak_memory_bytes'] = peak_memory(
+        lambda: [monitor(data[i:i+window_size], timestamps[i:i+window_size])
+                 for i in range(memory_windows)])
+    return result
+
+def benchmark_batch(sfdd_manager, data, timestamps, window_size, mode):
+    '''Returns the throughput and the peak memory of "SFDD.detect_log"
+
+    Keyword arguments:
+    sfdd_manager -- an "SFDD" instance (trained for the extended mode)
+    data -- an m x n numpy array of sensor measurements
+    timestamps -- a numpy array with the m timestamps of the measurements
+    window_size -- number of measurements in a window
+    mode -- 'basic' or 'extended'
+
+    '''
+    start_time = time.perf_counter()
+    faults, _ = sfdd_manager.detect_log(data, timestamps, window_size, mode=mode)
+    elapsed_time = time.perf_counter() - start_time
+    return {'time_s': elapsed_time,
+            'windows_per_second': faults.shape[0] / elapsed_time,
+            'peak_memory_bytes': peak_memory(
+                lambda: sfdd_manager.detect_log(data, timestamps, window_size, mode=mode))}
+
+def benchmark_compact_batch(sfdd_manager, data, timestamps, window_size, mode):
+    '''Returns the throughput and the peak memory of "SFDD.detect_log" on a single-precision
+    "CompactLog" together with the memory taken by the compact and the float64 log
+
+    Keyword arguments:
+    sfdd_manager -- an "SFDD" instance (trained for the extended mode)
+    data -- an m x n numpy array of sensor measurements
+    timestamps -- a numpy array with the m timestamps of the measurements
+    window_size -- number of measurements in a window
+    mode -- 'basic' or 'extended'
+
+    '''
+    compact_log = sfdd_manager.compact_log(data, timestamps, window_size, mode)
+    start_time = time.perf_counter()
+    faults, _ = sfdd_manager.detect_log(compact_log, timestamps, window_size, mode=mode)
+    elapsed_time = time.perf_counter() - start_time
+    return {'time_s': elapsed_time,
+            'windows_per_second': faults.shape[0] / elapsed_time,
+            'peak_memory_bytes': peak_memory(
+                lambda: sfdd_manager.detect_log(compact_log, timestamps, window_size, mode=mode)),
+            'log_bytes': compact_log.nbytes,
+            'float64_log_bytes': data[:, 0:compact_log.shape[1]].nbytes + timestamps.nbytes,
+            'float64_columns': int(compact_log.exact_columns.shape[0])}
+
+def benchmark_streaming(sfdd_manager, data, timestamps, window_size, mode, max_windows):
+    '''Returns the latency statistics of "SFDD.push" once the stream window is full
+
+    Keyword arguments:
+    sfdd_manager -- an "SFDD" instance (trained for the extended mode)
+    data -- an m x n numpy array of sensor measurements
+    timestamps -- a numpy array with the m timestamps of the measurements
+    window_size -- number of measurements in a window
+    mode -- 'basic' or 'extended'
+    max_windows -- maximum number of monitored windows
+
+    '''
+    sfdd_manager.start_stream(window_size, mode)
+    latencies = list()
+    for i in range(min(data.shape[0], window_size - 1 + max_windows)):
+        start_time = time.perf_counter()
+        sfdd_manager.push(timestamps[i], data[i])
+        if i >= window_size - 1:
+            latencies.append(time.perf_counter() - start_time)
+    return summarise_latencies(latencies)
+
+def benchmark_parallel(sfdd_manager, data, timestamps, window_size, mode, max_windows,
+                       process_count):
+    '''Returns the latency statistics of "ParallelDetector.push" once the window is full
+
+    Keyword arguments:
+    sfdd_manager -- an "SFDD" instance (trained for the extended mode)
+    data -- an m x n numpy array of sensor measurements
+    timestamps -- a numpy array with the m timestamps of the measurements
+    window_size -- number of measurements in a window
+    mode -- 'basic' or 'extended'
+    max_windows -- maximum number of monitored windows
+    process_count -- number of worker processes
+
+    '''
+    latencies = list()
+    with ParallelDetector(sfdd_manager, window_size, mode, process_count) as detector:
+        for i in range(min(data.shape[0], window_size - 1 + max_windows)):
+            start_time = time.perf_counter()
+            detector.push(timestamps[i], data[i])
+            if i >= window_size - 1:
+                latencies.append(time.perf_counter() - start_time)
+    return summarise_latencies(latencies)
+
+def benchmark_training(sfdd_manager, data, timestamps, window_size):
+    '''Trains "sfdd_manager" and returns the time and the peak memory
+    of "learn_correlations" and "find_normal_patterns"
+
+    Keyword arguments:
+    sfdd_manager -- an "SFDD" instance
+    data -- an m x n numpy array of fault-free sensor measurements
+    timestamps -- a numpy array with the m timestamps of the measurements
+    window_size -- number of measurements in a window
+
+    '''
+    results = dict()
+    start_time = time.perf_counter()
+    sfdd_manager.learn_correlations(data)
+    results['learn_correlations'] = {'time_s': time.perf_counter() - start_time,
+                                     'peak_memory_bytes': peak_memory(
+                                         lambda: sfdd_manager.learn_correlations(data))}
+
+    start_time = time.perf_counter()
+    sfdd_manager.find_normal_patterns(data, timestamps, window_size=window_size)
+    results['find_normal_patterns'] = {'time_s': time.perf_counter() - start_time,
+                                       'peak_memory_bytes': peak_memory(
+                                           lambda: sfdd_manager.find_normal_patterns(
+                                               data, timestamps, window_size=window_size))}
+    return results
+
+def run_workload(workload, structural_model, training_data, test_data, window_size, args):
+    '''Runs all benchmarks for a single workload and returns a list of result dictionaries
+
+    Keyword arguments:
+    workload -- name of the workload
+    structural_model -- a "StructuralModel" instance
+    training_data -- a tuple (timestamps, data) of fault-free measurements
+    test_data -- a tuple (timestamps, data) of measurements to monitor
+    window_size -- number of measurements in a window
+    args -- the parsed command-line arguments
+
+    '''
+    sensor_count = len(structural_model.sensors)
+    description = {'workload': workload, 'sensors': sensor_count, 'window_size': window_size}
+    results = list()
+
+    sfdd_manager = SFDD(structural_model.sensors, structural_model, args.threshold, 2)
+    training_results = benchmark_training(sfdd_manager, training_data[1], training_data[0],
+                                          window_size)
+    for benchmark, result in training_results.items():
+        results.append(dict(description, benchmark=benchmark, **result))
+
+    test_timestamps, test_data = test_data
+    for mode in ('basic', 'extended'):
+        result = benchmark_monitoring(sfdd_manager, test_data, test_timestamps,
+                                      window_size, mode, args.max_windows)
+        results.append(dict(description, benchmark='monitor_sensors_' + mode, **result))
+
+        result = benchmark_batch(sfdd_manager, test_data, test_timestamps, window_size, mode)
+        results.append(dict(description, benchmark='detect_log_' + mode, **result))
+
+        result = benchmark_compact_batch(sfdd_manager, test_data, test_timestamps,
+                                         window_size, mode)
+        results.append(dict(description, benchmark='detect_log_compact_' + mode, **result))
+
+        result = benchmark_streaming(sfdd_manager, test_data, test_timestamps,
+                                     window_size, mode, args.max_windows)
+        results.append(dict(description, benchmark='push_' + mode, **result))
+
+        for process_count in args.process_counts:
+            result = benchmark_parallel(sfdd_manager, test_data, test_timestamps,
+                                        window_size, mode, args.max_windows, process_count)
+            results.append(dict(description, benchmark='parallel_{0}_{1}'.format(mode,
+                                                                                process_count),
+                                **result))
+
+    for result in results:
+        print('{workload:>45} n={sensors:<5} w={window_size:<4} {benchmark:<28}'.format(**result),
+              ' '.join('{0}={1:.4g}'.format(key, result[key])
+                       for key in ('time_s', 'windows_per_second') if key in result),
+              'p99={0:.4g}ms'.format(result['latency_ms']['p99']) if 'latency_ms' in result else '')
+    return results
+
+def synthetic_workloads(args, directory):
+    '''Yields the arguments of "run_workload" for the synthetic workloads
+
+    Keyword arguments:
+    args -- the parsed command-line arguments
+    directory -- directory for the generated structural models
+
+    '''
+    for sensor_count in args.sensors:
+        model_file_name = os.path.join(directory, 'synthetic_{0}.yaml'.format(sensor_count))
+        component_count = max(2, sensor_count // args.sensors_per_component)
+        sensor_components = generate_structural_model(model_file_name, sensor_count,
+                                                      component_count, seed=args.seed)
+        structural_model = StructuralModel(model_file_name)
+
+        # the sensors are ordered as in the structural model
+        sensor_order = [int(name.split('_')[1]) for name in structural_model.sensors]
+        sensor_components = [sensor_components[i] for i in sensor_order]
+
+        training_data = generate_signals(sensor_components, args.samples, seed=args.seed)
+        timestamps, test_data = generate_signals(sensor_components, args.samples,
+                                                 seed=args.seed + 1)
+        test_data, _ = inject_faults(test_data, timestamps, args.faults, args.fault_length,
+                                     seed=args.seed)
+        for window_size in args.window_sizes:
+            yield ('synthetic', structural_model, training_data,
+                   (timestamps, test_data), window_size)
+
+def youbot_workloads(args, directory):
+    '''Yields the arguments of "run_workload" for the youBot model and logs;
+    the first log is used for training and every log is used for testing
+
+    Keyword arguments:
+    args -- the parsed command-line arguments
+    directory -- directory for the binary log caches
+
+    '''
+    structural_model = StructuralModel(os.path.join(REPOSITORY_ROOT, 'structural_models',
+                                                    'youBot.yaml'))
+    log_file_names = sorted(name for name in glob.glob(os.path.join(REPOSITORY_ROOT,
+                                                                    'test_data', '*'))
+                            if not name.endswith(LogReader.cache_extension)
+                            and not name.endswith(LogReader.cache_info_extension))
+    logs = [LogReader(name, cache_directory=directory).read_sensors(structural_model.sensors)
+            for name in log_file_names]
+    for log_file_name, log in zip(log_file_names, logs):
+        for window_size in args.window_sizes:
+            yield ('youBot/' + os.path.basename(log_file_name), structural_model,
+                   logs[0], log, window_size)
+
+def compare(results, baseline_file_name):
+    '''Prints the ratios between the current results and the results in a baseline file
+
+    Keyword arguments:
+    results -- a list of result dictionaries
+    baseline_file_name -- name of a JSON file written by a previous run
+
+    '''
+    with open(baseline_file_name, 'r') as baseline_file:
+        baseline = json.load(baseline_file)['results']
+    key = lambda result: (result['workload'], result['sensors'],
+                          result['window_size'], result['benchmark'])
+    baseline = dict((key(result), result) for result in baseline)
+
+    print('\nComparison with {0} (current / baseline):'.format(baseline_file_name))
+    for result in results:
+        if key(result) not in baseline:
+            continue
+        old_result = baseline[key(result)]
+        ratios = list()
+        for metric in ('time_s', 'windows_per_second', 'peak_memory_bytes'):
+            if metric in result and metric in old_result and old_result[metric]:
+                ratios.append('{0}={1:.3f}'.format(metric, result[metric] / old_result[metric]))
+        if 'latency_ms' in result and 'latency_ms' in old_result:
+            ratios.append('p99={0:.3f}'.format(result['latency_ms']['p99'] /
+                                               old_result['latency_ms']['p99']))
+        print('{0:>45} n={1:<5} w={2:<4} {3:<28}'.format(*key(result)), ' '.join(ratios))
+
+def main():
+    parser = argparse.ArgumentParser(description='SFDD performance benchmarks')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='JSON file to which the results are written')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    parser.add_argument('--sensors', type=int, nargs='+', default=[10, 50, 200],
+                        help='numbers of sensors of the synthetic workloads')
+    parser.add_argument('--sensors-per-component', type=int, default=5)
+    parser.add_argument('--window-sizes', type=int, nargs='+', default=[10, 20, 50])
+    parser.add_argument('--samples', type=int, default=2000,
+                        help='number of measurements of the synthetic signals')
+    parser.add_argument('--faults', type=int, default=10)
+    parser.add_argument('--fault-length', type=int, default=100)
+    parser.add_argument('--max-windows', type=int, default=500,
+                        help='maximum number of windows monitored one by one')
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--process-counts', type=int, nargs='*',
+                        default=sorted(set([1, os.cpu_count() or 1])),
+                        help='numbers of worker processes with which "ParallelDetector" '
+                             'is measured; not measured if no number is given '
+                             '(default: 1 and the number of CPUs)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-synthetic', action='store_true')
+    parser.add_argument('--skip-youbot', action='store_true')
+    args = parser.parse_args()
+
+    results = list()
+    with tempfile.TemporaryDirectory(prefix='sfdd_benchmarks_') as directory:
+        workloads = list()
+        if not args.skip_synthetic:
+            workloads.append(synthetic_workloads(args, directory))
+        if not args.skip_youbot:
+            workloads.append(youbot_workloads(args, directory))
+        for workload_generator in workloads:
+            for workload in workload_generator:
+                results.extend(run_workload(*(workload + (args,))))
+
+    with open(args.output, 'w') as output_file:
+        json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'python': platform.python_version(),
+                   'numpy': np.__version__,
+                   'cpu_count': os.cpu_count(),
+                   'arguments': vars(args),
+                   'results': results}, output_file, indent=2)
+    print('Results written to {0}'.format(args.output))
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
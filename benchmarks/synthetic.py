@@ -0,0 +1,93 @@
+'''
+Generators of synthetic structural models and sensor data with
+injected stuck-at and drift faults, used by the benchmarks.
+
+'''
+import oyaml as yaml
+import numpy as np
+
+def generate_structural_model(model_file_name, sensor_count, component_count, seed=0):
+    '''Writes a structural model with "component_count" subsystems and "sensor_count"
+    sensors, each of which depends on one randomly chosen subsystem, to a YAML file
+    and returns a list with the subsystem index of each sensor
+
+    Keyword arguments:
+    model_file_name -- name of the YAML file that is written
+    sensor_count -- number of sensors
+    component_count -- number of subsystems
+    seed -- seed of the random number generator (default 0)
+
+    '''
+    random_state = np.random.RandomState(seed)
+    sensor_components = random_state.randint(0, component_count, size=sensor_count)
+
+    system_components = dict()
+    for i in range(component_count):
+        system_components['component_{0}'.format(i)] = {'type': 'subsystem', 'parents': []}
+    for i in range(sensor_count):
+        system_components['sensor_{0}'.format(i)] = \
+            {'type': 'sensor', 'parents': ['component_{0}'.format(sensor_components[i])]}
+
+    with open(model_file_name, 'w') as model_file:
+        yaml.dump({'system_components': system_components}, model_file,
+                  default_flow_style=False)
+    return list(sensor_components)
+
+def generate_signals(sensor_components, sample_count, frequency=100., noise=1e-2, seed=0):
+    '''Returns a tuple (timestamps, data), where "data" is a sample_count x n numpy array
+    of correlated sensor measurements; every sensor is a mixture of a signal shared
+    by the whole system, a signal of its component and measurement noise
+
+    Keyword arguments:
+    sensor_components -- a list with the component index of each sensor
+    sample_count -- number of measurements per sensor
+    frequency -- sampling frequency in Hz (default 100)
+    noise -- standard deviation of the measurement noise (default 1e-2)
+    seed -- seed of the random number generator (default 0)
+
+    '''
+    random_state = np.random.RandomState(seed)
+    sensor_components = np.asarray(sensor_components)
+    component_count = sensor_components.max() + 1
+
+    timestamps = np.arange(sample_count) / frequency
+    system_signal = np.cumsum(random_state.normal(0., 0.05, size=sample_count))
+    component_signals = np.cumsum(random_state.normal(0., 0.05,
+                                                      size=(sample_count, component_count)),
+                                  axis=0)
+
+    gains = random_state.uniform(0.5, 2., size=len(sensor_components))
+    offsets = random_state.uniform(-10., 10., size=len(sensor_components))
+    data = gains * (system_signal[:, np.newaxis] + 0.3 * component_signals[:, sensor_components]) \
+           + offsets + random_state.normal(0., noise, size=(sample_count, len(sensor_components)))
+    return timestamps, data
+
+def inject_faults(data, timestamps, fault_count, fault_length, seed=0):
+    '''Injects stuck-at and drift faults into a copy of "data" and returns a tuple
+    (faulty_data, faults), where "faults" is a list of tuples
+    (sensor_idx, start_time, end_time, kind) with kind 'stuck_at' or 'drift'
+
+    Keyword arguments:
+    data -- an m x n numpy array of sensor measurements
+    timestamps -- a numpy array with the m timestamps of the measurements
+    fault_count -- number of injected faults
+    fault_length -- number of measurements affected by each fault
+    seed -- seed of the random number generator (default 0)
+
+    '''
+    random_state = np.random.RandomState(seed)
+    faulty_data = np.array(data)
+    faults = list()
+    for _ in range(fault_count):
+        sensor_idx = random_state.randint(0, data.shape[1])
+        start = random_state.randint(0, max(data.shape[0] - fault_length, 1))
+        end = min(start + fault_length, data.shape[0])
+        if random_state.rand() < 0.5:
+            faulty_data[start:end, sensor_idx] = faulty_data[start, sensor_idx]
+            kind = 'stuck_at'
+        else:
+            slope = random_state.choice([-1., 1.]) * random_state.uniform(0.5, 2.)
+            faulty_data[start:end, sensor_idx] += slope * (timestamps[start:end] - timestamps[start])
+            kind = 'drift'
+        faults.append((sensor_idx, timestamps[start], timestamps[end-1], kind))
+    return faulty_data, faults
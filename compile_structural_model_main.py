@@ -0,0 +1,14 @@
+from __future__ import print_function
+import sys
+
+from sfdd.structural_model import StructuralModel
+
+if __name__ == '__main__':
+    structural_model_file = sys.argv[1]
+    compiled_model_file = sys.argv[2]
+
+    structural_model = StructuralModel(structural_model_file)
+    structural_model.compile(compiled_model_file)
+    print('{0}: {1} sensors, {2} components'.format(compiled_model_file,
+                                                    len(structural_model.sensors),
+                                                    len(structural_model.components)))
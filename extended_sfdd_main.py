@@ -1,40 +1,60 @@
 from __future__ import print_function
+import os
 import sys
-import numpy as np
 
 from sfdd.structural_model import StructuralModel
 from sfdd.sfdd import SFDD
+from sfdd.log_reader import LogReader
+from sfdd.result_store import FaultIntervalStore
+from sfdd.diagnosis import ComponentDiagnoser
 
 if __name__ == '__main__':
     structural_model_file = sys.argv[1]
     data_file = sys.argv[2]
     test_data_file = sys.argv[3]
     window_size = int(sys.argv[4])
+    model_file = sys.argv[5] if len(sys.argv) > 5 and sys.argv[5] != '-' else None
+    result_file = sys.argv[6] if len(sys.argv) > 6 else None
 
     structural_model = StructuralModel(structural_model_file)
     sfdd_manager = SFDD(structural_model.sensors, structural_model, 0.9, 2)
 
-    measurement_cols = np.array([8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, \
-                                 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 35, 36])
+    ### model training; a previously saved model is loaded instead if available
+    if model_file is not None and os.path.isfile(model_file):
+        sfdd_manager.load_model(model_file)
+    else:
+        timestamps, data = LogReader(data_file).read_sensors(structural_model.sensors)
+        start_time = timestamps[15]
+        timestamps = timestamps - start_time
 
-    ### model training
-    data = np.loadtxt(data_file, skiprows=1, delimiter=';')
-
-    start_time = data[15, 0]
-    timestamps = data[:, 0] - start_time
-    data = data[:,measurement_cols]
-
-    sfdd_manager.learn_correlations(data, 'correlations.yaml')
-    sfdd_manager.find_normal_patterns(data, timestamps, 'patterns.yaml', window_size)
+        sfdd_manager.learn_correlations(data, 'correlations.yaml')
+        sfdd_manager.find_normal_patterns(data, timestamps, 'patterns.yaml', window_size)
+        if model_file is not None:
+            sfdd_manager.save_model(model_file)
 
     ### model testing
-    test_data = np.loadtxt(test_data_file, skiprows=1, delimiter=';')
-    start_time = test_data[15, 0]
-    test_data[:, 0] = test_data[:, 0] - start_time
-
-    for i in range(15, data.shape[0] - window_size):
-        sensors = sfdd_manager.monitor_sensors_extended(test_data[i:i+window_size, measurement_cols],
-                                                        test_data[i:i+window_size, 0])
-        print(test_data[i+window_size, 0])
-        print(sensors)
-        print()
+    test_timestamps, test_data = LogReader(test_data_file).read_sensors(structural_model.sensors)
+    start_time = test_timestamps[15]
+    test_timestamps = test_timestamps - start_time
+
+    faults, end_times, patterns = sfdd_manager.detect_log(test_data[15:], test_timestamps[15:],
+                                                          window_size, mode='extended',
+                                                          return_patterns=True)
+
+    ### the results are written to a fault interval store if a result file is given
+    if result_file is not None:
+        with FaultIntervalStore(result_file, sfdd_manager.sensor_names,
+                                sfdd_manager.pattern_registry.names) as result_store:
+            result_store.append_batch(end_times, faults, patterns)
+        for interval in result_store.intervals():
+            print(interval)
+    else:
+        diagnoser = ComponentDiagnoser(structural_model, sfdd_manager.sensor_names)
+        for window_faults, end_time in zip(faults, end_times):
+            print(end_time)
+            print([sensor for sensor, faulty in zip(sfdd_manager.sensor_names, window_faults)
+                   if faulty])
+            if window_faults.any():
+                ### the three most likely sets of faulty components
+                print(diagnoser.diagnose(window_faults)[0:3])
+            print()
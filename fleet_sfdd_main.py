@@ -0,0 +1,73 @@
+from __future__ import print_function
+import sys
+import asyncio
+
+from sfdd.structural_model import StructuralModel
+from sfdd.log_reader import LogReader
+from sfdd.sfdd import SFDD
+from sfdd.fleet import FleetMonitor
+
+async def replay_logs(fleet_monitor, robot_logs):
+    '''Submits the samples of the logs to the monitor, one sample per robot at a time
+
+    Keyword arguments:
+    fleet_monitor -- a "FleetMonitor" instance
+    robot_logs -- a list of (robot_id, timestamps, data) tuples
+
+    '''
+    sample_count = max(data.shape[0] for _, _, data in robot_logs)
+    for i in range(15, sample_count):
+        for robot_id, timestamps, data in robot_logs:
+            if i < data.shape[0]:
+                await fleet_monitor.submit(robot_id, timestamps[i], data[i])
+        # lets the monitor process the samples of this time step
+        await asyncio.sleep(0)
+    await fleet_monitor.stop()
+
+async def print_events(events):
+    '''Prints the events published by a "FleetMonitor"
+
+    Keyword arguments:
+    events -- an asyncio queue returned by "FleetMonitor.subscribe"
+
+    '''
+    while True:
+        event = await events.get()
+        print(event['robot'], event['timestamp'])
+        print(event['anomalous_sensors'])
+        print()
+        events.task_done()
+
+async def monitor_fleet(sfdd_manager, window_size, robot_logs):
+    '''Monitors the robots whose logs are given in "robot_logs" with a shared model
+
+    Keyword arguments:
+    sfdd_manager -- an "SFDD" instance
+    window_size -- number of measurements in a window
+    robot_logs -- a list of (robot_id, timestamps, data) tuples
+
+    '''
+    fleet_monitor = FleetMonitor(sfdd_manager, window_size)
+    events = fleet_monitor.subscribe()
+    printer = asyncio.ensure_future(print_events(events))
+    await asyncio.gather(fleet_monitor.run(), replay_logs(fleet_monitor, robot_logs))
+
+    # the printer is only stopped once all published events have been printed
+    await events.join()
+    printer.cancel()
+
+if __name__ == '__main__':
+    structural_model_file = sys.argv[1]
+    window_size = int(sys.argv[2])
+    data_files = sys.argv[3:]
+
+    structural_model = StructuralModel(structural_model_file)
+    sfdd_manager = SFDD(structural_model.sensors, structural_model, 0.8, 2)
+
+    # every log is replayed as the stream of a separate robot
+    robot_logs = list()
+    for data_file in data_files:
+        timestamps, data = LogReader(data_file).read_sensors(structural_model.sensors)
+        robot_logs.append((data_file, timestamps - timestamps[15], data))
+
+    asyncio.run(monitor_fleet(sfdd_manager, window_size, robot_logs))
@@ -7,7 +7,7 @@ setup(name='sfdd',
       author='Alex Mitrevski, Youssef Mahmoud Youssef',
       author_email='aleksandar.mitrevski@h-brs.de, youssef-mahmoud.youssef@h-brs.de',
       keywords='sensors fault_detection robotics',
-      packages=find_packages(exclude=['contrib', 'docs', 'tests']),
+      packages=find_packages(exclude=['contrib', 'docs', 'tests', 'benchmarks']),
       install_requires=['numpy', 'networkx'],
       project_urls={
           'Method description': 'https://link.springer.com/article/10.1007/s10514-017-9688-z',
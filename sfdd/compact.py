@@ -0,0 +1,352 @@
+'''
+Compact representations used by "SFDD": float32 storage of recorded logs
+(see "SFDD.compact_log"), whose pattern and correlation decisions are checked
+to be the same as with the float64 measurements, and read-only or mutable
+dictionary views of per-sensor arrays, which replace dictionaries of
+Python objects keyed by sensor name in all modes.
+
+'''
+try:
+    from collections.abc import Mapping, MutableMapping
+except ImportError:
+    from collections import Mapping, MutableMapping
+import numpy as np
+
+class CompactLog(object):
+    '''An m x n log of sensor measurements stored in single precision
+
+    Rounding the measurements to float32 changes the differences and slopes
+    from which the patterns are detected. A column is only stored in float32
+    if all its per-measurement differences, slopes and slope differences lie
+    on the same side of the detector thresholds as the ones of the float64
+    measurements, so that every window gives the same patterns as the float64
+    log; the other columns are kept in float64. Detectors that use other window
+    features (variance, min, max) are checked with a bound of the rounding error.
+
+    For the basic monitoring, the correlations of every window are checked
+    as well: if the absolute Pearson correlation of two columns lies on different
+    sides of the correlation threshold with the float64 and the stored measurements,
+    both columns are kept in float64, and the check is repeated until no
+    correlation changes its side.
+
+    The check assumes that, as the built-in detectors, the detectors compare
+    the magnitude of their features against their thresholds.
+
+    '''
+    ## relative part of a detector threshold that the rounding error
+    ## of the features checked with an error bound may take
+    error_margin = 0.1
+
+    ## maximum number of correlation matrix elements calculated at once
+    ## by the correlation check
+    correlation_chunk_elements = 1 << 22
+
+    def __init__(self, timestamps, data, pattern_registry, timestamp_offsets=(0,),
+                 dtype=np.float32, correlation_size=0, correlation_threshold=0.,
+                 correlation_mask=None):
+        '''
+        Keyword arguments:
+        timestamps -- a numpy array with the m timestamps of the measurements (kept in float64)
+        data -- an m x n numpy array in which the columns represent sensors
+        pattern_registry -- the "PatternRegistry" whose detectors have to give the same results
+        timestamp_offsets -- offsets between the first measurement in which patterns are
+                             looked for and the first timestamp used for the slopes (e.g.
+                             the number of correlation measurements of a window in the basic
+                             monitoring, see "SFDD.compact_log"); the check is done for
+                             each of them (default (0,))
+        dtype -- reduced-precision floating point type (default np.float32)
+        correlation_size -- number of consecutive measurements from which the correlations
+                            are calculated (the first half of a window in the basic
+                            monitoring); the correlations are not checked if 0 (default 0)
+        correlation_threshold -- threshold used for checking whether two columns
+                                 are correlated (default 0.)
+        correlation_mask -- an optional n x n Boolean numpy array with the pairs of columns
+                            whose correlations are used (default None, i.e. all pairs)
+        '''
+        data = np.asarray(data, dtype=float)
+
+        ## a numpy array with the timestamps of the measurements
+        self.timestamps = np.asarray(timestamps, dtype=float)
+
+        ## shape of the log (m, n)
+        self.shape = data.shape
+
+        reduced_data = data.astype(dtype)
+        exact_columns = ~self.__precision_sufficient(data, reduced_data, pattern_registry,
+                                                     timestamp_offsets)
+        if correlation_size > 1:
+            exact_columns = self.__correlation_exact_columns(data, reduced_data, exact_columns,
+                                                             correlation_size,
+                                                             correlation_threshold,
+                                                             correlation_mask)
+
+        ## indices of the columns that are stored in the reduced precision
+        self.reduced_columns = np.where(~exact_columns)[0]
+
+        ## an m x len(self.reduced_columns) numpy array with the reduced-precision
+        ## measurements of these columns
+        self.values = np.ascontiguousarray(reduced_data[:, self.reduced_columns])
+
+        ## indices of the columns that are stored in float64
+        self.exact_columns = np.where(exact_columns)[0]
+
+        ## an m x len(self.exact_columns) float64 numpy array with the measurements of these columns
+        self.exact_values = np.ascontiguousarray(data[:, self.exact_columns])
+
+    @property
+    def nbytes(self):
+        '''Number of bytes taken by the measurements and timestamps
+        '''
+        return self.values.nbytes + self.exact_values.nbytes + self.timestamps.nbytes
+
+    def read(self, start=0, end=None, column_count=None):
+        '''Returns a float64 numpy array with the measurements in the rows [start, end)
+
+        Keyword arguments:
+        start -- first row (default 0)
+        end -- end of the row range (default None, i.e. the end of the log)
+        column_count -- number of leading columns that are returned (default None, i.e. all)
+
+        '''
+        if column_count is None:
+            column_count = self.shape[1]
+        data = np.empty((len(range(self.shape[0])[start:end]), column_count))
+        reduced = self.reduced_columns < column_count
+        data[:, self.reduced_columns[reduced]] = self.values[start:end, reduced]
+        exact = self.exact_columns < column_count
+        data[:, self.exact_columns[exact]] = self.exact_values[start:end, exact]
+        return data
+
+    def __precision_sufficient(self, data, reduced_data, pattern_registry, timestamp_offsets):
+        '''Returns a Boolean numpy array specifying the columns whose patterns
+        are not changed by the reduced precision (see the class description)
+
+        Keyword arguments:
+        data -- an m x n float64 numpy array
+        reduced_data -- "data" rounded to the reduced precision
+        pattern_registry -- a "PatternRegistry"
+        timestamp_offsets -- a list of offsets between the measurements and the timestamps
+
+        '''
+        sufficient = np.ones(data.shape[1], dtype=bool)
+        value_errors = np.abs(reduced_data.astype(float) - data).max(axis=0) \
+                       if data.shape[0] > 0 else np.zeros(data.shape[1])
+        exact_differences = np.diff(data, axis=0)
+        reduced_differences = np.diff(reduced_data.astype(float), axis=0)
+        time_differences = np.diff(self.timestamps)
+        value_ranges = np.ptp(data, axis=0) if data.shape[0] > 0 else np.zeros(data.shape[1])
+
+        for _, _, feature_names, threshold in pattern_registry.detectors:
+            if 'differences' in feature_names:
+                sufficient &= self.__same_decisions(exact_differences, reduced_differences,
+                                                    threshold)
+
+            if 'slopes' in feature_names or 'slope_differences' in feature_names:
+                for offset in timestamp_offsets:
+                    # the difference k of a window is divided by its time difference k - offset
+                    row_count = time_differences.shape[0] - offset
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        exact_slopes = exact_differences[offset:] / \
+                                       time_differences[0:row_count, np.newaxis]
+                        reduced_slopes = reduced_differences[offset:] / \
+                                         time_differences[0:row_count, np.newaxis]
+                        exact_slope_differences = np.diff(exact_slopes, axis=0)
+                        reduced_slope_differences = np.diff(reduced_slopes, axis=0)
+                    if 'slopes' in feature_names:
+                        sufficient &= self.__same_decisions(exact_slopes, reduced_slopes,
+                                                            threshold)
+                    sufficient &= self.__same_decisions(exact_slope_differences,
+                                                        reduced_slope_differences, threshold)
+
+            # the features that are not elementwise are checked with an error bound
+            if 'min' in feature_names or 'max' in feature_names:
+                sufficient &= value_errors <= self.error_margin * threshold
+            if 'variance' in feature_names:
+                sufficient &= value_errors * (2. * value_ranges + value_errors) <= \
+                              self.error_margin * threshold
+        return sufficient
+
+    def __correlation_exact_columns(self, data, reduced_data, exact_columns, correlation_size,
+                                    correlation_threshold, correlation_mask):
+        '''Returns "exact_columns" extended by the columns that have to be kept
+        in float64 so that no window correlation changes its side of the threshold
+        (see the class description)
+
+        Keyword arguments:
+        data -- an m x n float64 numpy array
+        reduced_data -- "data" rounded to the reduced precision
+        exact_columns -- a Boolean numpy array with the columns kept in float64
+        correlation_size -- number of measurements from which the correlations are calculated
+        correlation_threshold -- threshold used for checking whether two columns are correlated
+        correlation_mask -- an n x n Boolean numpy array with the used pairs of columns or None
+
+        '''
+        exact_columns = exact_columns.copy()
+        column_count = data.shape[1]
+        if correlation_mask is None:
+            correlation_mask = np.ones((column_count, column_count), dtype=bool)
+        window_count = data.shape[0] - correlation_size + 1
+        if window_count <= 0:
+            return exact_columns
+
+        stored_data = reduced_data.astype(float)
+        stored_data[:, exact_columns] = data[:, exact_columns]
+
+        # the windows are checked in chunks; for every chunk, the columns whose
+        # correlations still have to be checked: first all of them, and later the columns
+        # that are kept in float64 since the chunk was checked, since their correlations
+        # with the remaining reduced columns have changed
+        chunk_size = max(1, self.correlation_chunk_elements // (column_count * column_count))
+        chunk_starts = list(range(0, window_count, chunk_size))
+        unchecked_columns = [np.arange(column_count) for _ in chunk_starts]
+        while any(columns.size > 0 for columns in unchecked_columns):
+            for k, start in enumerate(chunk_starts):
+                columns = unchecked_columns[k]
+                unchecked_columns[k] = np.zeros(0, dtype=int)
+                rows = slice(start, min(start + chunk_size, window_count) + correlation_size - 1)
+                while columns.size > 0:
+                    flipped = self.__correlated_rows(data[rows], correlation_size, columns,
+                                                     correlation_threshold) != \
+                              self.__correlated_rows(stored_data[rows], correlation_size, columns,
+                                                     correlation_threshold)
+                    flipped = flipped.any(axis=0) & correlation_mask[columns]
+                    flipped_columns = flipped.any(axis=0)
+                    flipped_columns[columns[flipped.any(axis=1)]] = True
+                    columns = np.where(flipped_columns & ~exact_columns)[0]
+
+                    exact_columns[columns] = True
+                    stored_data[:, columns] = data[:, columns]
+                    for j in range(len(chunk_starts)):
+                        if j != k:
+                            unchecked_columns[j] = np.union1d(unchecked_columns[j], columns)
+        return exact_columns
+
+    @staticmethod
+    def __correlated_rows(data, correlation_size, columns, correlation_threshold):
+        '''Returns a c x len(columns) x n Boolean numpy array in which the element
+        (w, i, j) is True if the absolute Pearson correlation of the columns columns[i]
+        and j in window w of "data" is above "correlation_threshold"; as in the basic
+        monitoring, undefined correlations (of constant columns) count as 1
+
+        Keyword arguments:
+        data -- an m x n float64 numpy array
+        correlation_size -- number of measurements in a window
+        columns -- a numpy array with the indices of the columns whose correlations are returned
+        correlation_threshold -- threshold used for checking whether two columns are correlated
+
+        '''
+        # as in "CorrelationLibrary.pearson_batch", but only for the rows of the given columns
+        windows = np.lib.stride_tricks.sliding_window_view(data, correlation_size,
+                                                           axis=0).transpose(0, 2, 1)
+        centred_data = windows - windows.mean(axis=1)[:, np.newaxis, :]
+        covariances = np.matmul(centred_data[:, :, columns].transpose(0, 2, 1), centred_data)
+        std_devs = np.sqrt(np.einsum('wki,wki->wi', centred_data, centred_data))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlations = np.abs(covariances / std_devs[:, columns, np.newaxis] /
+                                  std_devs[:, np.newaxis, :])
+        np.clip(correlations, 0., 1., out=correlations)
+
+        constant = np.ptp(windows, axis=1) == 0
+        correlations[constant[:, columns, np.newaxis] | constant[:, np.newaxis, :] |
+                     np.isnan(correlations)] = 1.
+        return correlations > correlation_threshold
+
+    @staticmethod
+    def __same_decisions(exact_features, reduced_features, threshold):
+        '''Returns a Boolean numpy array specifying the columns in which the magnitudes
+        of all exact and reduced-precision features lie on the same side of "threshold"
+
+        Keyword arguments:
+        exact_features -- an m' x n numpy array of features of the float64 measurements
+        reduced_features -- an m' x n numpy array of features of the reduced-precision measurements
+        threshold -- a detector threshold
+
+        '''
+        with np.errstate(invalid='ignore'):
+            return np.all((np.abs(exact_features) > threshold) ==
+                          (np.abs(reduced_features) > threshold), axis=0)
+
+class SensorStateView(MutableMapping):
+    '''A dictionary view of a per-sensor numpy array, keyed by sensor name;
+    assignments through the view change the array
+    '''
+    def __init__(self, sensor_names, values):
+        '''
+        Keyword arguments:
+        sensor_names -- a list of sensor names
+        values -- a numpy array with one element per sensor
+        '''
+        ## a list of sensor names
+        self.sensor_names = sensor_names
+
+        ## a dictionary mapping the sensor names to their indices
+        self.sensor_indices = dict((sensor, i) for i, sensor in enumerate(sensor_names))
+
+        ## the per-sensor numpy array
+        self.values = values
+
+    def __getitem__(self, sensor):
+        return self.values[self.sensor_indices[sensor]].item()
+
+    def __setitem__(self, sensor, value):
+        self.values[self.sensor_indices[sensor]] = value
+
+    def __delitem__(self, sensor):
+        raise TypeError('Sensors cannot be removed from a sensor state view')
+
+    def __iter__(self):
+        return iter(self.sensor_names)
+
+    def __len__(self):
+        return len(self.sensor_names)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+class SensorRelationView(Mapping):
+    '''A read-only dictionary view of a Boolean n x n matrix attribute of an object
+    (e.g. "SFDD.correlated_sensor_matrix"), in which each sensor name is mapped
+    to a collection with the sensors of the True elements of its row; the rows
+    are converted when they are accessed, so no per-pair Python objects are kept
+    '''
+    def __init__(self, owner, matrix_name, sensor_names, as_names=False, container=list):
+        '''
+        Keyword arguments:
+        owner -- the object holding the matrix
+        matrix_name -- name of the matrix attribute of "owner"
+        sensor_names -- a list of sensor names
+        as_names -- whether the related sensors are given by name instead of index (default False)
+        container -- type of the returned collections (default list)
+        '''
+        ## the object holding the matrix
+        self.owner = owner
+
+        ## name of the matrix attribute of self.owner
+        self.matrix_name = matrix_name
+
+        ## a list of sensor names
+        self.sensor_names = sensor_names
+
+        ## a dictionary mapping the sensor names to their indices
+        self.sensor_indices = dict((sensor, i) for i, sensor in enumerate(sensor_names))
+
+        ## whether the related sensors are given by name
+        self.as_names = as_names
+
+        ## type of the returned collections
+        self.container = container
+
+    def __getitem__(self, sensor):
+        related = np.where(getattr(self.owner, self.matrix_name)[self.sensor_indices[sensor]])[0]
+        if self.as_names:
+            return self.container(self.sensor_names[j] for j in related)
+        return self.container(int(j) for j in related)
+
+    def __iter__(self):
+        return iter(self.sensor_names)
+
+    def __len__(self):
+        return len(self.sensor_names)
+
+    def __repr__(self):
+        return repr(dict(self))
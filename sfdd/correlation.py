@@ -11,4 +11,245 @@ import numpy as np
 class CorrelationLibrary(object):
     @staticmethod
     def pearson(input_matrix):
-        return np.corrcoef(input_matrix, rowvar=False)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlations = np.atleast_2d(np.corrcoef(input_matrix, rowvar=False))
+
+        # the correlations of constant columns are set to NaN explicitly since,
+        # due to rounding errors in the column means, "np.corrcoef" does not
+        # always produce NaN for them
+        constant_cols = np.where(np.ptp(input_matrix, axis=0) == 0)[0]
+        correlations[constant_cols, :] = np.nan
+        correlations[:, constant_cols] = np.nan
+        return correlations
+
+    @staticmethod
+    def pearson_batch(input_matrices):
+        '''Returns a c x n x n array with the Pearson correlation matrices of
+        a stack of c windows; equivalent to calling "pearson" on every window
+
+        Keyword arguments:
+        input_matrices -- a c x m x n numpy array (e.g. a strided view of a log)
+                          in which the columns of each window represent variables
+
+        '''
+        input_matrices = np.asarray(input_matrices, dtype=float)
+        centred_data = input_matrices - input_matrices.mean(axis=1)[:, np.newaxis, :]
+        covariances = np.matmul(centred_data.transpose(0, 2, 1), centred_data)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std_devs = np.sqrt(np.diagonal(covariances, axis1=1, axis2=2))
+            correlations = covariances / std_devs[:, :, np.newaxis] / std_devs[:, np.newaxis, :]
+        np.clip(correlations, -1., 1., out=correlations)
+
+        constant = np.ptp(input_matrices, axis=1) == 0
+        correlations[constant[:, :, np.newaxis] | constant[:, np.newaxis, :]] = np.nan
+        return correlations
+
+    @staticmethod
+    def rolling_pearson(input_matrix):
+        '''Returns a "PearsonAccumulator" initialised with the rows of "input_matrix",
+        which can then be slid over the data one sample at a time
+
+        Keyword arguments:
+        input_matrix -- an m x n numpy array in which the columns represent variables
+
+        '''
+        accumulator = PearsonAccumulator(input_matrix.shape[1])
+        accumulator.recenter(input_matrix)
+        return accumulator
+
+    @staticmethod
+    def correlated_pairs(input_matrix, threshold, mask=None, block_size=256):
+        '''Returns the pairs of distinct columns of "input_matrix" whose absolute
+        Pearson correlation is above "threshold" as a compressed sparse row adjacency
+        (indptr, indices): the columns correlated to column i are
+        indices[indptr[i]:indptr[i+1]], in increasing order. As in "SFDD",
+        constant columns (whose correlations are undefined) are considered
+        to be correlated to all other columns.
+
+        The correlations are calculated for blocks of "block_size" rows at a time
+        and, within a block, only for the columns that are allowed by "mask",
+        so the full n x n correlation matrix is never held in memory.
+
+        Keyword arguments:
+        input_matrix -- an m x n numpy array in which the columns represent variables
+        threshold -- correlation magnitude above which two columns are correlated
+        mask -- an optional n x n Boolean numpy array; only the pairs (i, j)
+                for which mask[i, j] is True are considered (default None)
+        block_size -- number of rows of the correlation matrix calculated at once (default 256)
+
+        '''
+        input_matrix = np.asarray(input_matrix, dtype=float)
+        column_count = input_matrix.shape[1]
+
+        constant = np.ptp(input_matrix, axis=0) == 0 if input_matrix.shape[0] > 0 \
+                   else np.ones(column_count, dtype=bool)
+
+        # with unit-norm centred columns, the correlations are plain dot products
+        normalised_data = input_matrix - input_matrix.mean(axis=0)
+        norms = np.sqrt(np.einsum('ij,ij->j', normalised_data, normalised_data))
+        norms[constant] = 1.
+        normalised_data /= norms
+
+        pair_counts = np.zeros(column_count, dtype=np.intp)
+        index_blocks = list()
+        for start in range(0, column_count, block_size):
+            end = min(start + block_size, column_count)
+            if mask is None:
+                columns = np.arange(column_count)
+            else:
+                columns = np.where(mask[start:end].any(axis=0))[0]
+            if columns.size == 0:
+                continue
+
+            # the columns are only gathered if that saves most of the products,
+            # since the gathered copy has as many rows as the data
+            if 2 * columns.size < column_count:
+                correlations = np.dot(normalised_data[:, start:end].T, normalised_data[:, columns])
+            else:
+                correlations = np.dot(normalised_data[:, start:end].T, normalised_data)[:, columns]
+            correlated = np.abs(correlations) > threshold
+            correlated |= constant[start:end, np.newaxis] | constant[np.newaxis, columns]
+            correlated &= np.arange(start, end)[:, np.newaxis] != columns[np.newaxis, :]
+            if mask is not None:
+                correlated &= mask[start:end][:, columns]
+
+            block_rows, block_columns = np.nonzero(correlated)
+            pair_counts[start:end] = np.bincount(block_rows, minlength=end-start)
+            index_blocks.append(columns[block_columns])
+
+        indptr = np.zeros(column_count + 1, dtype=np.intp)
+        np.cumsum(pair_counts, out=indptr[1:])
+        indices = np.concatenate(index_blocks) if index_blocks else np.zeros(0, dtype=np.intp)
+        return indptr, indices.astype(np.intp, copy=False)
+
+class PearsonAccumulator(object):
+    '''Running sums, sums of squares and cross-products from which the Pearson
+    correlation matrix of a sliding window can be obtained in O(n^2) per sample
+    instead of O(window_size * n^2) for a full "np.corrcoef"
+
+    The sums are kept relative to a shift vector; re-centering the shift
+    at the current mean keeps the accumulated values small and thus
+    limits the cancellation error of the variance computation.
+
+    '''
+    ## relative tolerance under which a variance is treated as zero
+    variance_tolerance = 1e-10
+
+    def __init__(self, variable_count):
+        '''
+        Keyword arguments:
+        variable_count -- number of variables (columns) n
+        '''
+        ## number of accumulated samples
+        self.count = 0
+
+        ## values subtracted from each sample before accumulation
+        self.shift = np.zeros(variable_count)
+
+        ## a vector with the sums of the shifted samples
+        self.sums = np.zeros(variable_count)
+
+        ## an n x n matrix with the sums of the cross-products of the shifted samples
+        self.cross_products = np.zeros((variable_count, variable_count))
+
+    def add(self, sample):
+        '''Adds a single n-element sample to the accumulator
+
+        Keyword arguments:
+        sample -- a numpy array with one value per variable
+
+        '''
+        x = sample - self.shift
+        self.count += 1
+        self.sums += x
+        self.cross_products += np.outer(x, x)
+
+    def remove(self, sample):
+        '''Removes a previously added n-element sample from the accumulator
+
+        Keyword arguments:
+        sample -- a numpy array with one value per variable
+
+        '''
+        x = sample - self.shift
+        self.count -= 1
+        self.sums -= x
+        self.cross_products -= np.outer(x, x)
+
+    def replace(self, old_sample, new_sample):
+        '''Slides the window by one sample, i.e. removes "old_sample"
+        and adds "new_sample" in a single update
+
+        Keyword arguments:
+        old_sample -- the sample leaving the window
+        new_sample -- the sample entering the window
+
+        '''
+        x_old = old_sample - self.shift
+        x_new = new_sample - self.shift
+        self.sums += x_new - x_old
+        self.cross_products += np.outer(x_new, x_new) - np.outer(x_old, x_old)
+
+    def merge(self, other):
+        '''Adds the samples accumulated by another "PearsonAccumulator" (e.g. one
+        computed over a different data set) to this accumulator
+
+        Keyword arguments:
+        other -- a "PearsonAccumulator" over the same variables
+
+        '''
+        # the sums of the other accumulator are moved to the shift of this one
+        shift_difference = other.shift - self.shift
+        self.cross_products += other.cross_products + \
+                               np.outer(other.sums, shift_difference) + \
+                               np.outer(shift_difference, other.sums) + \
+                               other.count * np.outer(shift_difference, shift_difference)
+        self.sums += other.sums + other.count * shift_difference
+        self.count += other.count
+
+    def recenter(self, input_matrix=None):
+        '''Moves the shift to the current mean. If "input_matrix" is given,
+        the sums are recomputed exactly from its rows, which also discards
+        any rounding error accumulated by the incremental updates
+
+        Keyword arguments:
+        input_matrix -- an optional m x n numpy array with the samples currently in the window
+
+        '''
+        if input_matrix is not None:
+            input_matrix = np.asarray(input_matrix, dtype=float)
+            self.count = input_matrix.shape[0]
+            self.shift = input_matrix.mean(axis=0) if self.count > 0 \
+                         else np.zeros(input_matrix.shape[1])
+            centred_data = input_matrix - self.shift
+            self.sums = centred_data.sum(axis=0)
+            self.cross_products = np.dot(centred_data.T, centred_data)
+        elif self.count > 0:
+            mean_offset = self.sums / self.count
+            self.shift = self.shift + mean_offset
+            self.cross_products = self.cross_products - np.outer(self.sums, mean_offset)
+            self.sums = np.zeros_like(self.sums)
+
+    def correlations(self, constant=None):
+        '''Returns the n x n Pearson correlation matrix of the accumulated samples;
+        as with "np.corrcoef", the rows and columns of constant variables are NaN
+
+        Keyword arguments:
+        constant -- a Boolean numpy array marking the constant variables (e.g. tracked
+                    by a "SampleStream" with the rule of "CorrelationLibrary.pearson");
+                    if not given, the variables whose variance is negligible compared
+                    to their sums of squares are considered constant (default None)
+
+        '''
+        covariance = self.cross_products - np.outer(self.sums, self.sums) / self.count
+        variances = np.diag(covariance).copy()
+        if constant is None:
+            constant = variances <= self.variance_tolerance * np.diag(self.cross_products)
+        variances[constant] = np.nan
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std_devs = np.sqrt(variances)
+            correlations = covariance / std_devs[:, np.newaxis] / std_devs[np.newaxis, :]
+        np.clip(correlations, -1., 1., out=correlations)
+        return correlations
@@ -0,0 +1,241 @@
+'''
+Component-level fault isolation based on the structural model of a system.
+
+An anomalous sensor is explained by a fault of the sensor itself or of any
+of the components it depends on (its ancestors in the structural model).
+The candidate diagnoses of a set of anomalous sensors are the minimal sets
+of components that explain all of them, i.e. the minimal hitting sets of
+the sets of possible explanations of the individual sensors.
+
+The sets are represented as integer bitmasks: for every candidate component,
+the sensors depending on it, and for every sensor, the candidate components
+that explain it, are precomputed once, so a diagnosis only needs bitwise
+operations on a few integers.
+
+'''
+import collections
+import numpy as np
+
+class ComponentDiagnoser(object):
+    '''Maps sets of anomalous sensors to ranked candidate faulty components
+
+    A diagnosis is a list of (components, score) tuples, where "components" is
+    a tuple of component names that together explain all anomalous sensors.
+    The candidates are ranked by their number of components and then by their
+    score, the fraction of the sensors depending on the components that are
+    actually anomalous; a candidate that would also affect many normal sensors
+    is thus less likely than one that only affects the anomalous sensors.
+
+    Since the same sets of anomalous sensors tend to repeat in consecutive
+    windows, the diagnoses of the most recently seen sets are kept in an LRU cache.
+
+    '''
+    def __init__(self, structural_model, sensor_names=None, max_cardinality=3,
+                 include_sensors=True, cache_size=1024):
+        '''
+        Keyword arguments:
+        structural_model -- a "StructuralModel" instance
+        sensor_names -- a list with the names of the monitored sensors, in the order
+                        of the detection results (default None, i.e. the sensors of the model)
+        max_cardinality -- maximum number of components in a candidate (default 3)
+        include_sensors -- whether the sensors themselves are candidate components (default True)
+        cache_size -- maximum number of cached diagnoses; 0 disables the cache (default 1024)
+        '''
+        if sensor_names is None:
+            sensor_names = structural_model.sensors
+
+        ## a list with the names of the monitored sensors
+        self.sensor_names = list(sensor_names)
+
+        ## maximum number of components in a candidate
+        self.max_cardinality = max_cardinality
+
+        ## maximum number of cached diagnoses
+        self.cache_size = cache_size
+
+        model_sensors = set(structural_model.sensors)
+        candidates = [node for node in structural_model.nodes if node not in model_sensors]
+        if include_sensors:
+            candidates.extend(sensor for sensor in self.sensor_names if sensor not in candidates)
+
+        ## a list with the names of the candidate components
+        self.candidates = candidates
+
+        candidate_indices = dict((candidate, i) for i, candidate in enumerate(candidates))
+        sensor_masks = [0] * len(candidates)
+        conflict_masks = [0] * len(self.sensor_names)
+        for i, sensor in enumerate(self.sensor_names):
+            explanations = list()
+            if sensor in structural_model.node_indices:
+                node_ancestors = structural_model.ancestor_matrix[structural_model.node_indices[sensor]]
+                explanations = [structural_model.nodes[j] for j in np.where(node_ancestors)[0]]
+            explanations.append(sensor)
+            for component in explanations:
+                if component in candidate_indices:
+                    j = candidate_indices[component]
+                    sensor_masks[j] |= 1 << i
+                    conflict_masks[i] |= 1 << j
+
+        ## for every candidate component, a bitmask of the monitored sensors depending on it
+        self.sensor_masks = sensor_masks
+
+        ## for every sensor, a bitmask of the candidate components that explain its anomaly
+        self.conflict_masks = conflict_masks
+
+        ## a list with the names of the sensors that no candidate component explains
+        ## (sensors without ancestors if the sensors are not candidates); they are
+        ## ignored by the diagnoses, which explain the other anomalous sensors
+        self.unexplained_sensors = [sensor for sensor, conflict_mask
+                                    in zip(self.sensor_names, conflict_masks)
+                                    if conflict_mask == 0]
+
+        ## an ordered dictionary mapping bitmasks of anomalous sensors to their diagnoses,
+        ## from the least to the most recently used one
+        self.cache = collections.OrderedDict()
+
+        ## number of diagnoses taken from the cache
+        self.cache_hits = 0
+
+        ## number of diagnoses that had to be calculated
+        self.cache_misses = 0
+
+    def diagnose(self, anomalous):
+        '''Returns a ranked list of (components, score) tuples with the candidate
+        diagnoses of a set of anomalous sensors (an empty list if no sensor is anomalous
+        or if none of the anomalous sensors can be explained, see self.unexplained_sensors)
+
+        Keyword arguments:
+        anomalous -- a Boolean numpy array with one element per sensor, which is True for
+                     the anomalous sensors (or a list of the names of the anomalous sensors)
+
+        '''
+        if len(anomalous) == 0 or isinstance(anomalous[0], str):
+            anomalous = np.isin(self.sensor_names, anomalous)
+        return list(self.__diagnosis(self.__sensor_mask(anomalous)))
+
+    def diagnose_batch(self, anomalous):
+        '''Returns a list with the diagnoses (see "diagnose") of c windows
+
+        Keyword arguments:
+        anomalous -- a c x n Boolean numpy array specifying the anomalous sensors
+                     in each window (e.g. returned by "SFDD.detect_log")
+
+        '''
+        return [list(self.__diagnosis(self.__sensor_mask(window_anomalous)))
+                for window_anomalous in anomalous]
+
+    def clear_cache(self):
+        '''Removes all cached diagnoses
+        '''
+        self.cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __sensor_mask(self, anomalous):
+        '''Returns an integer bitmask in which bit i is set if the i-th sensor is anomalous
+
+        Keyword arguments:
+        anomalous -- a Boolean numpy array with one element per sensor
+
+        '''
+        anomalous = np.asarray(anomalous, dtype=bool)[0:len(self.sensor_names)]
+        return int.from_bytes(np.packbits(anomalous, bitorder='little').tobytes(), 'little')
+
+    def __diagnosis(self, anomalous_mask):
+        '''Returns the (possibly cached) diagnosis of a bitmask of anomalous sensors
+
+        Keyword arguments:
+        anomalous_mask -- an integer bitmask of anomalous sensors
+
+        '''
+        if anomalous_mask in self.cache:
+            self.cache_hits += 1
+            self.cache.move_to_end(anomalous_mask)
+            return self.cache[anomalous_mask]
+
+        self.cache_misses += 1
+        diagnosis = self.__rank(anomalous_mask, self.__minimal_hitting_sets(anomalous_mask))
+        if self.cache_size > 0:
+            self.cache[anomalous_mask] = diagnosis
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return diagnosis
+
+    def __minimal_hitting_sets(self, anomalous_mask):
+        '''Returns a list of bitmasks of candidate components with the minimal hitting sets
+        (of at most self.max_cardinality components) of the explanations of the anomalous sensors
+
+        Keyword arguments:
+        anomalous_mask -- an integer bitmask of anomalous sensors
+
+        '''
+        # sensors with the same explanations give the same conflict and a conflict that
+        # contains another one is hit by every set that hits the smaller one; the empty
+        # conflicts of unexplained sensors cannot be hit and would remove all other ones
+        conflicts = sorted(set(self.conflict_masks[i] for i in _bits(anomalous_mask)
+                               if self.conflict_masks[i] != 0), key=_bit_count)
+        minimal_conflicts = list()
+        for conflict in conflicts:
+            if not any(other & conflict == other for other in minimal_conflicts):
+                minimal_conflicts.append(conflict)
+        if not minimal_conflicts:
+            return list()
+
+        # Berge's algorithm: the hitting sets of the first k conflicts are extended
+        # by the elements of conflict k + 1 that they do not hit yet
+        hitting_sets = [0]
+        for conflict in minimal_conflicts:
+            extended_sets = set()
+            for hitting_set in hitting_sets:
+                if hitting_set & conflict:
+                    extended_sets.add(hitting_set)
+                elif _bit_count(hitting_set) < self.max_cardinality:
+                    for component in _bits(conflict):
+                        extended_sets.add(hitting_set | (1 << component))
+
+            hitting_sets = list()
+            for hitting_set in sorted(extended_sets, key=_bit_count):
+                if not any(other & hitting_set == other for other in hitting_sets):
+                    hitting_sets.append(hitting_set)
+        return hitting_sets
+
+    def __rank(self, anomalous_mask, hitting_sets):
+        '''Returns a ranked tuple of (components, score) tuples for the given hitting sets
+
+        Keyword arguments:
+        anomalous_mask -- an integer bitmask of anomalous sensors
+        hitting_sets -- a list of bitmasks of candidate components
+
+        '''
+        diagnosis = list()
+        for hitting_set in hitting_sets:
+            components = list(_bits(hitting_set))
+            affected_sensors = 0
+            for component in components:
+                affected_sensors |= self.sensor_masks[component]
+            diagnosis.append((tuple(sorted(self.candidates[component] for component in components)),
+                              _bit_count(anomalous_mask & affected_sensors) /
+                              float(_bit_count(affected_sensors))))
+        diagnosis.sort(key=lambda candidate: (len(candidate[0]), -candidate[1], candidate[0]))
+        return tuple(diagnosis)
+
+def _bit_count(mask):
+    '''Returns the number of set bits of an integer bitmask
+
+    Keyword arguments:
+    mask -- a non-negative integer
+
+    '''
+    return bin(mask).count('1')
+
+def _bits(mask):
+    '''Yields the indices of the set bits of an integer bitmask in increasing order
+
+    Keyword arguments:
+    mask -- a non-negative integer
+
+    '''
+    while mask:
+        lowest_bit = mask & -mask
+        yield lowest_bit.bit_length() - 1
+        mask ^= lowest_bit
@@ -0,0 +1,316 @@
+'''
+An asyncio service that monitors the sensors of many robots with a single
+shared SFDD model. Samples arrive through an in-process queue ("submit")
+or as JSON lines over a local socket ("serve"); the windows of all robots
+are kept in one preallocated ring buffer, the robots whose windows are ready
+are evaluated together and changes of their anomalous sensors are published
+to the subscribers as events.
+
+'''
+import json
+import asyncio
+import numpy as np
+
+class FleetMonitor(object):
+    '''Monitors a fleet of robots that share a trained "SFDD" manager
+
+    The manager is only read; the window and working state of each robot are
+    kept by the monitor. For each robot, the anomalous sensors after each sample
+    are the same as the ones returned by "SFDD.push" on a separate stream.
+
+    Each published event is a dictionary with the keys 'robot', 'timestamp' and
+    'anomalous_sensors' and is sent whenever the set of anomalous sensors of
+    a robot changes.
+
+    '''
+    ## initial number of robots for which buffers are allocated
+    initial_capacity = 16
+
+    def __init__(self, sfdd_manager, window_size, mode='basic'):
+        '''
+        Keyword arguments:
+        sfdd_manager -- a trained "SFDD" instance shared by all robots
+        window_size -- number of measurements in a window
+        mode -- 'basic' or 'extended' monitoring (default 'basic')
+        '''
+        if mode not in ('basic', 'extended'):
+            raise ValueError('Unknown monitoring mode {0}'.format(mode))
+
+        ## the shared "SFDD" instance
+        self.sfdd_manager = sfdd_manager
+
+        ## number of measurements in a window
+        self.window_size = window_size
+
+        ## monitoring mode ('basic' or 'extended')
+        self.mode = mode
+
+        ## number of monitored sensors
+        self.sensor_count = len(sfdd_manager.sensor_names)
+
+        ## a dictionary mapping robot identifiers to their row in the buffers
+        self.robot_indices = dict()
+
+        ## a list with the identifiers of the robots, ordered by their row in the buffers
+        self.robot_ids = list()
+
+        ## a robots x window_size x n ring buffer with the most recent samples of each robot
+        self.measurements = np.zeros((self.initial_capacity, window_size, self.sensor_count))
+
+        ## a robots x window_size ring buffer with the timestamps of the samples
+        self.timestamps = np.zeros((self.initial_capacity, window_size))
+
+        ## number of samples received from each robot
+        self.sample_counts = np.zeros(self.initial_capacity, dtype=np.int64)
+
+        ## a robots x n Boolean numpy array with the working state of the sensors of each robot
+        self.working = np.ones((self.initial_capacity, self.sensor_count), dtype=bool)
+
+        ## a robots x n Boolean numpy array with the sensors reported as anomalous in the last event
+        self.anomalous = np.zeros((self.initial_capacity, self.sensor_count), dtype=bool)
+
+        ## a list of asyncio queues receiving the published events
+        self.subscribers = list()
+
+        ## an asyncio queue with the incoming (robot_id, timestamp, sample) tuples;
+        ## created in the event loop by "run"
+        self.queue = None
+
+    def add_robot(self, robot_id):
+        '''Allocates the state of a robot if it is not monitored yet
+        and returns the row of the robot in the buffers
+
+        Keyword arguments:
+        robot_id -- a hashable robot identifier
+
+        '''
+        if robot_id in self.robot_indices:
+            return self.robot_indices[robot_id]
+
+        index = len(self.robot_ids)
+        if index == self.measurements.shape[0]:
+            self.__grow(2 * index)
+        self.robot_indices[robot_id] = index
+        self.robot_ids.append(robot_id)
+        return index
+
+    def subscribe(self):
+        '''Returns an asyncio queue to which the published events are added
+        '''
+        events = asyncio.Queue()
+        self.subscribers.append(events)
+        return events
+
+    def anomalous_sensors(self, robot_id):
+        '''Returns a list with the sensors of a robot that are currently anomalous
+
+        Keyword arguments:
+        robot_id -- a robot identifier
+
+        '''
+        index = self.robot_indices[robot_id]
+        return [sensor for i, sensor in enumerate(self.sfdd_manager.sensor_names)
+                if self.anomalous[index, i]]
+
+    def process_samples(self, samples):
+        '''Processes a list of samples and returns a list of the published events.
+        The samples of each robot are processed in order; the i-th samples
+        of all robots are ingested and evaluated together.
+
+        Keyword arguments:
+        samples -- a list of (robot_id, timestamp, sample) tuples, where "sample"
+                   contains (at least) one measurement per sensor
+
+        '''
+        rounds = list()
+        robot_sample_counts = dict()
+        for robot_id, timestamp, sample in samples:
+            sample_round = robot_sample_counts.get(robot_id, 0)
+            robot_sample_counts[robot_id] = sample_round + 1
+            if sample_round == len(rounds):
+                rounds.append(list())
+            rounds[sample_round].append((self.add_robot(robot_id), timestamp, sample))
+
+        events = list()
+        for round_samples in rounds:
+            events.extend(self.__process_round(round_samples))
+        return events
+
+    async def submit(self, robot_id, timestamp, sample):
+        '''Adds a sample of a robot to the input queue; raises a ValueError or TypeError
+        if the sample is invalid (see "__validate_sample"), so that an invalid sample
+        does not stop the monitoring of the other robots when it is processed
+
+        Keyword arguments:
+        robot_id -- a robot identifier
+        timestamp -- time at which the measurements were taken
+        sample -- a list or numpy array with one measurement per sensor
+
+        '''
+        await self.__input_queue().put(self.__validate_sample(robot_id, timestamp, sample))
+
+    async def stop(self):
+        '''Makes "run" return after processing the samples that are already queued
+        '''
+        await self.__input_queue().put(None)
+
+    async def run(self):
+        '''Processes the queued samples until "stop" is called; all samples
+        that are queued when the monitor gets to run are processed in one batch
+        '''
+        queue = self.__input_queue()
+        running = True
+        while running:
+            samples = [await queue.get()]
+            while not queue.empty():
+                samples.append(queue.get_nowait())
+            if None in samples:
+                running = False
+                samples = [sample for sample in samples if sample is not None]
+            self.process_samples(samples)
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        '''Starts a TCP server on a local socket and returns the asyncio server. Each
+        connection sends JSON lines of the form {"robot": ..., "timestamp": ..., "sample": [...]},
+        which are added to the input queue.
+
+        Keyword arguments:
+        host -- address the server binds to (default '127.0.0.1')
+        port -- port the server listens on (default 8765)
+
+        '''
+        return await asyncio.start_server(self.__handle_connection, host, port)
+
+    async def __handle_connection(self, reader, writer):
+        '''Reads JSON lines with samples from a connection until it is closed;
+        a malformed line is answered with a JSON line {"error": ...} and skipped,
+        so that neither the connection nor the monitor are affected by it
+
+        Keyword arguments:
+        reader -- an asyncio.StreamReader of the connection
+        writer -- an asyncio.StreamWriter of the connection
+
+        '''
+        try:
+            line = await reader.readline()
+            while line:
+                try:
+                    robot_id, timestamp, sample = self.__parse_message(line)
+                except (ValueError, KeyError, TypeError) as error:
+                    writer.write((json.dumps({'error': 'Invalid sample: {0}'.format(error)}) +
+                                  '\n').encode('utf-8'))
+                    await writer.drain()
+                else:
+                    await self.submit(robot_id, timestamp, sample)
+                line = await reader.readline()
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def __parse_message(self, line):
+        '''Returns a tuple (robot_id, timestamp, sample) with the contents of a JSON line
+        sent to the server; raises a ValueError, KeyError or TypeError if the line
+        is not a valid sample message
+
+        Keyword arguments:
+        line -- a line received from a connection
+
+        '''
+        message = json.loads(line)
+        if not isinstance(message, dict):
+            raise ValueError('expected a JSON object')
+
+        return self.__validate_sample(message['robot'], message['timestamp'], message['sample'])
+
+    def __validate_sample(self, robot_id, timestamp, sample):
+        '''Returns a tuple (robot_id, timestamp, sample) with a float timestamp and
+        the sample as a float numpy array; raises a ValueError or TypeError if the robot
+        identifier is not hashable, the timestamp is not a number or the sample does not
+        contain at least one numeric measurement per sensor
+
+        Keyword arguments:
+        robot_id -- a robot identifier
+        timestamp -- time at which the measurements were taken
+        sample -- a list or numpy array with one measurement per sensor
+
+        '''
+        hash(robot_id)
+        timestamp = float(timestamp)
+        sample = np.asarray(sample, dtype=float)
+        if sample.ndim != 1 or sample.shape[0] < self.sensor_count:
+            raise ValueError('expected a list of at least {0} measurements'.format(
+                self.sensor_count))
+        return robot_id, timestamp, sample
+
+    def __input_queue(self):
+        '''Returns the input queue, creating it in the running event loop if necessary
+        '''
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        return self.queue
+
+    def __process_round(self, round_samples):
+        '''Ingests at most one sample per robot, evaluates the robots
+        with full windows and returns the resulting events
+
+        Keyword arguments:
+        round_samples -- a list of (robot_index, timestamp, sample) tuples
+
+        '''
+        robots = np.array([robot for robot, _, _ in round_samples], dtype=np.intp)
+        positions = self.sample_counts[robots] % self.window_size
+        self.measurements[robots, positions] = [np.asarray(sample, dtype=float)[0:self.sensor_count]
+                                                for _, _, sample in round_samples]
+        self.timestamps[robots, positions] = [timestamp for _, timestamp, _ in round_samples]
+        self.sample_counts[robots] += 1
+
+        robots = robots[self.sample_counts[robots] >= self.window_size]
+        if robots.size == 0:
+            return list()
+
+        # the windows of the ready robots, ordered from the oldest to the most recent sample
+        order = (self.sample_counts[robots, np.newaxis] +
+                 np.arange(self.window_size)[np.newaxis]) % self.window_size
+        windows = self.measurements[robots[:, np.newaxis], order]
+        window_timestamps = self.timestamps[robots[:, np.newaxis], order]
+
+        if self.mode == 'basic':
+            self.working[robots] = self.sfdd_manager.evaluate_windows(windows, window_timestamps,
+                                                                      self.working[robots])
+            anomalous = ~self.working[robots]
+        else:
+            anomalous = self.sfdd_manager.evaluate_windows(windows, window_timestamps,
+                                                           mode='extended')
+
+        changed = np.where((anomalous != self.anomalous[robots]).any(axis=1))[0]
+        self.anomalous[robots] = anomalous
+
+        events = list()
+        for i in changed:
+            robot = robots[i]
+            events.append({'robot': self.robot_ids[robot],
+                           'timestamp': float(window_timestamps[i, -1]),
+                           'anomalous_sensors': self.anomalous_sensors(self.robot_ids[robot])})
+        for event in events:
+            for subscriber in self.subscribers:
+                subscriber.put_nowait(event)
+        return events
+
+    def __grow(self, capacity):
+        '''Enlarges the buffers so that they can hold "capacity" robots
+
+        Keyword arguments:
+        capacity -- the new number of robots
+
+        '''
+        robot_count = len(self.robot_ids)
+        for name, fill_value in (('measurements', 0.), ('timestamps', 0.), ('sample_counts', 0),
+                                 ('working', True), ('anomalous', False)):
+            old_buffer = getattr(self, name)
+            new_buffer = np.full((capacity,) + old_buffer.shape[1:], fill_value,
+                                 dtype=old_buffer.dtype)
+            new_buffer[0:robot_count] = old_buffer[0:robot_count]
+            setattr(self, name, new_buffer)
@@ -0,0 +1,230 @@
+import json
+import time
+import bisect
+from collections import deque
+import numpy as np
+
+class _NullStage(object):
+    '''A context manager that does nothing; returned for all stages
+    when the instrumentation is disabled
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+## the shared no-op stage
+NULL_STAGE = _NullStage()
+
+class StageStatistics(object):
+    '''Wall time statistics of a single processing stage: call count, total time
+    and a rolling histogram of the durations of the most recent calls
+
+    '''
+    ## upper bounds (in seconds) of the histogram buckets; the last bucket is unbounded
+    bucket_bounds = [x * 10. ** e for e in range(-6, 1) for x in (1., 2., 5.)]
+
+    def __init__(self, rolling_size):
+        '''
+        Keyword arguments:
+        rolling_size -- number of most recent durations kept in the rolling histogram
+        '''
+        ## number of calls
+        self.count = 0
+
+        ## total time of all calls in seconds
+        self.total_time = 0.
+
+        ## the most recent durations in seconds
+        self.recent_durations = deque(maxlen=rolling_size)
+
+        ## the number of recent durations falling in each of the buckets
+        self.histogram = [0] * (len(self.bucket_bounds) + 1)
+
+    def add(self, duration):
+        '''Records the duration of a call
+
+        Keyword arguments:
+        duration -- duration of the call in seconds
+
+        '''
+        self.count += 1
+        self.total_time += duration
+        if len(self.recent_durations) == self.recent_durations.maxlen:
+            oldest_duration = self.recent_durations[0]
+            self.histogram[bisect.bisect_left(self.bucket_bounds, oldest_duration)] -= 1
+        self.recent_durations.append(duration)
+        self.histogram[bisect.bisect_left(self.bucket_bounds, duration)] += 1
+
+    def summary(self):
+        '''Returns a dictionary with the statistics of the stage
+        '''
+        summary = {'count': self.count,
+                   'total_time_s': self.total_time,
+                   'histogram': {'bucket_bounds_s': self.bucket_bounds,
+                                 'counts': list(self.histogram)}}
+        if self.recent_durations:
+            durations = np.array(self.recent_durations)
+            summary['recent_latency_s'] = {'p50': float(np.percentile(durations, 50)),
+                                           'p90': float(np.percentile(durations, 90)),
+                                           'p99': float(np.percentile(durations, 99)),
+                                           'max': float(durations.max())}
+        return summary
+
+class _Stage(object):
+    '''A context manager measuring the wall time of a stage
+    '''
+    def __init__(self, statistics):
+        self.statistics = statistics
+        self.start_time = 0.
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.statistics.add(time.perf_counter() - self.start_time)
+        return False
+
+class Instrumentation(object):
+    '''Optional instrumentation of the SFDD hot path, recording the wall time
+    and call count of each processing stage (e.g. 'correlation', 'patterns',
+    'decisions') and counting the monitored windows, the windows in which each
+    sensor was flagged and the pattern hits of each sensor
+
+    The collected data are available through "stats" and are passed to
+    the registered exporters, i.e. callables taking the instrumentation
+    as an argument, after each monitored window.
+
+    '''
+    def __init__(self, sensor_names, pattern_count, rolling_size=1000):
+        '''
+        Keyword arguments:
+        sensor_names -- a list of sensor names
+        pattern_count -- number of patterns
+        rolling_size -- number of most recent durations per stage kept
+                        for the latency histograms (default 1000)
+        '''
+        ## a list of sensor names
+        self.sensor_names = list(sensor_names)
+
+        ## number of most recent durations per stage kept for the latency histograms
+        self.rolling_size = rolling_size
+
+        ## a dictionary mapping stage names to "StageStatistics" instances
+        self.stages = dict()
+
+        ## number of monitored windows
+        self.window_count = 0
+
+        ## number of windows in which each sensor was flagged as anomalous
+        self.flag_counts = np.zeros(len(sensor_names), dtype=np.int64)
+
+        ## number of windows in which each sensor exhibited each pattern
+        self.pattern_hits = np.zeros((len(sensor_names), pattern_count), dtype=np.int64)
+
+        ## callables that are called with the instrumentation after each monitored window
+        self.exporters = list()
+
+    def stage(self, name):
+        '''Returns a context manager measuring the wall time of the stage "name"
+
+        Keyword arguments:
+        name -- name of a processing stage
+
+        '''
+        if name not in self.stages:
+            self.stages[name] = StageStatistics(self.rolling_size)
+        return _Stage(self.stages[name])
+
+    def record_windows(self, anomalous, patterns):
+        '''Records the results of one or more monitored windows and calls the exporters
+
+        Keyword arguments:
+        anomalous -- a Boolean numpy array of shape (n,) or (c, n) specifying
+                     the sensors flagged as anomalous
+        patterns -- a Boolean numpy array of shape (n, pattern_count) or (c, n, pattern_count)
+                    specifying the patterns exhibited by the sensors
+
+        '''
+        anomalous = np.asarray(anomalous)
+        patterns = np.asarray(patterns)
+        sensor_count = len(self.sensor_names)
+        if anomalous.ndim == 1:
+            self.window_count += 1
+            self.flag_counts += anomalous[0:sensor_count]
+            self.pattern_hits += patterns[0:sensor_count]
+        else:
+            self.window_count += anomalous.shape[0]
+            self.flag_counts += anomalous[:, 0:sensor_count].sum(axis=0)
+            self.pattern_hits += patterns[:, 0:sensor_count].sum(axis=0)
+
+        for exporter in self.exporters:
+            exporter(self)
+
+    def add_exporter(self, exporter):
+        '''Registers a callable that is called with the instrumentation
+        after each monitored window
+
+        Keyword arguments:
+        exporter -- a callable taking an "Instrumentation" instance
+
+        '''
+        self.exporters.append(exporter)
+
+    def stats(self):
+        '''Returns a dictionary with all collected statistics
+        '''
+        return {'windows': self.window_count,
+                'stages': dict((name, statistics.summary())
+                               for name, statistics in self.stages.items()),
+                'sensors_flagged': dict(zip(self.sensor_names, self.flag_counts.tolist())),
+                'pattern_hits': dict(zip(self.sensor_names, self.pattern_hits.tolist()))}
+
+    def reset(self):
+        '''Discards all collected statistics
+        '''
+        self.stages = dict()
+        self.window_count = 0
+        self.flag_counts[:] = 0
+        self.pattern_hits[:] = 0
+
+class PeriodicJsonExporter(object):
+    '''An exporter writing the statistics of an "Instrumentation"
+    to a JSON file at most once every "interval" seconds
+
+    '''
+    def __init__(self, file_name, interval=10.):
+        '''
+        Keyword arguments:
+        file_name -- name of the JSON file that is (over)written
+        interval -- minimum time between two exports in seconds (default 10)
+        '''
+        ## name of the JSON file
+        self.file_name = file_name
+
+        ## minimum time between two exports in seconds
+        self.interval = interval
+
+        ## time of the last export
+        self.last_export_time = None
+
+    def __call__(self, instrumentation):
+        now = time.time()
+        if self.last_export_time is not None and now - self.last_export_time < self.interval:
+            return
+        self.last_export_time = now
+        self.export(instrumentation)
+
+    def export(self, instrumentation):
+        '''Writes the statistics of "instrumentation" to the JSON file
+
+        Keyword arguments:
+        instrumentation -- an "Instrumentation" instance
+
+        '''
+        statistics = instrumentation.stats()
+        statistics['time'] = self.last_export_time
+        with open(self.file_name, 'w') as stats_file:
+            json.dump(statistics, stats_file, indent=2)
@@ -0,0 +1,242 @@
+import os
+import json
+import tempfile
+import numpy as np
+
+class LogReader(object):
+    '''Reads semicolon-separated robot logs whose first line is a header
+    with the column names ("timestamp; robot_pos_x; ...").
+
+    The text is parsed in chunks of lines only once; the parsed values are then
+    stored in a binary columnar cache (a .npy file next to the log, or in a given
+    cache directory), which is memory-mapped by subsequent reads. The cache is
+    recreated whenever the size or modification time of the log changes.
+
+    '''
+    ## name of the timestamp column
+    timestamp_column = 'timestamp'
+
+    ## prefixes tried, in order, when looking for the log column of a sensor
+    name_prefixes = ('', 'robot_', 'sensed_')
+
+    ## extension of the cached data file
+    cache_extension = '.sfdd-cache.npy'
+
+    ## extension of the file describing the cached data
+    cache_info_extension = '.sfdd-cache.json'
+
+    def __init__(self, log_file_name, cache_directory=None, use_cache=True, chunk_size=10000):
+        '''
+        Keyword arguments:
+        log_file_name -- path to a semicolon-separated log file
+        cache_directory -- directory in which the cache is stored; the directory
+                           of the log file is used if not given (default None)
+        use_cache -- whether the binary cache should be used (default True)
+        chunk_size -- number of lines parsed at once (default 10000)
+        '''
+        ## path to the log file
+        self.log_file_name = log_file_name
+
+        ## whether the binary cache is used
+        self.use_cache = use_cache
+
+        ## number of lines parsed at once
+        self.chunk_size = chunk_size
+
+        if cache_directory is None:
+            cache_directory = os.path.dirname(os.path.abspath(log_file_name))
+        cache_base_name = os.path.join(cache_directory, os.path.basename(log_file_name))
+
+        ## path to the cached data file
+        self.cache_file_name = cache_base_name + self.cache_extension
+
+        ## path to the file describing the cached data
+        self.cache_info_file_name = cache_base_name + self.cache_info_extension
+
+        ## a list of the column names in the header of the log
+        self.column_names = self.__read_header()
+
+    def read(self):
+        '''Returns a (read-only, memory-mapped if the cache is used) m x c numpy array
+        with all columns of the log, in the order of self.column_names;
+        missing values are NaN
+        '''
+        if not self.use_cache:
+            return self.__parse(np.empty(self.__data_shape()))
+
+        if not self.__cache_valid():
+            self.__write_cache()
+        return np.load(self.cache_file_name, mmap_mode='r')
+
+    def column_indices(self, sensor_names, column_map=None):
+        '''Returns a list with the indices of the log columns corresponding to "sensor_names".
+        A sensor is mapped to the column given in "column_map" or otherwise to the first
+        column whose name is the sensor name preceded by one of self.name_prefixes
+
+        Keyword arguments:
+        sensor_names -- a list of sensor names
+        column_map -- an optional dictionary mapping sensor names to log column names
+
+        '''
+        if column_map is None:
+            column_map = dict()
+
+        indices = list()
+        for sensor in sensor_names:
+            if sensor in column_map:
+                candidates = [column_map[sensor]]
+            else:
+                candidates = [prefix + sensor for prefix in self.name_prefixes]
+
+            column_names = [name for name in candidates if name in self.column_names]
+            if not column_names:
+                raise KeyError('No column found for sensor {0} in {1}'.format(
+                    sensor, self.log_file_name))
+            indices.append(self.column_names.index(column_names[0]))
+        return indices
+
+    def read_sensors(self, sensor_names, column_map=None):
+        '''Returns a tuple (timestamps, data), where "timestamps" is a numpy array with
+        the timestamps of the log and "data" is an m x n numpy array whose columns
+        contain the measurements of the sensors in "sensor_names"
+
+        Keyword arguments:
+        sensor_names -- a list of sensor names
+        column_map -- an optional dictionary mapping sensor names to log column names
+
+        '''
+        data = self.read()
+        timestamps = np.array(data[:, self.column_names.index(self.timestamp_column)])
+        return timestamps, np.array(data[:, self.column_indices(sensor_names, column_map)])
+
+    def __read_header(self):
+        '''Returns a list of the column names in the first line of the log
+        '''
+        with open(self.log_file_name, 'r') as log_file:
+            header = log_file.readline()
+        return [name.strip() for name in header.strip().rstrip(';').split(';')]
+
+    def __data_shape(self):
+        '''Returns the number of data rows and columns of the log;
+        the rows are counted without being parsed
+        '''
+        row_count = 0
+        with open(self.log_file_name, 'rb') as log_file:
+            log_file.readline()
+            for line in log_file:
+                if line.strip():
+                    row_count += 1
+        return (row_count, len(self.column_names))
+
+    def __parse(self, data):
+        '''Parses the log chunk by chunk into "data" and returns it
+
+        Keyword arguments:
+        data -- a preallocated m x c numpy array (possibly memory-mapped)
+
+        '''
+        column_count = data.shape[1]
+        row = 0
+        with open(self.log_file_name, 'r') as log_file:
+            log_file.readline()
+            lines = list()
+            for line in log_file:
+                line = line.strip()
+                if line:
+                    lines.append(line)
+                if len(lines) == self.chunk_size:
+                    row += self.__parse_chunk(lines, data[row:row+len(lines)], column_count)
+                    lines = list()
+            if lines:
+                row += self.__parse_chunk(lines, data[row:row+len(lines)], column_count)
+        return data
+
+    def __parse_chunk(self, lines, data, column_count):
+        '''Parses the given lines into "data" and returns the number of parsed lines;
+        lines with fewer values than there are columns are padded with NaN
+
+        Keyword arguments:
+        lines -- a list of stripped log lines
+        data -- a len(lines) x column_count numpy array
+        column_count -- number of columns
+
+        '''
+        # fast path: all lines have the same number of values, so the whole
+        # chunk can be converted by numpy's C parser in a single call
+        delimiter_count = lines[0].rstrip(';').count(';')
+        value_count = delimiter_count + 1
+        same_length = all(line.rstrip(';').count(';') == delimiter_count for line in lines)
+        if same_length and value_count <= column_count:
+            values = np.fromstring(' '.join(lines).replace(';', ' '), dtype=float, sep=' ')
+        if same_length and value_count <= column_count and \
+           values.size == len(lines) * value_count:
+            data[:, 0:value_count] = values.reshape(len(lines), value_count)
+            data[:, value_count:] = np.nan
+            return len(lines)
+
+        data[:] = np.nan
+        for i, line in enumerate(lines):
+            row = line.rstrip(';').split(';')[0:column_count]
+            data[i, 0:len(row)] = [float(x) if x.strip() else np.nan for x in row]
+        return len(lines)
+
+    def __source_info(self):
+        '''Returns a dictionary identifying the current version of the log file
+        '''
+        stat = os.stat(self.log_file_name)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                'columns': self.column_names}
+
+    def __cache_valid(self):
+        '''Returns True if the cache exists and was created from the current log file
+        '''
+        if not os.path.isfile(self.cache_file_name) or \
+           not os.path.isfile(self.cache_info_file_name):
+            return False
+        with open(self.cache_info_file_name, 'r') as info_file:
+            try:
+                cache_info = json.load(info_file)
+            except ValueError:
+                return False
+        return cache_info == self.__source_info()
+
+    def __write_cache(self):
+        '''Parses the log directly into a memory-mapped .npy file, so that only
+        one chunk of text is held in memory, and records the version of the log;
+        both files are written under unique temporary names and then renamed,
+        so that concurrent readers of the same log do not overwrite each other's files
+        '''
+        temporary_file_name = self.__temporary_file_name(self.cache_file_name)
+        try:
+            data = np.lib.format.open_memmap(temporary_file_name, mode='w+',
+                                             dtype=float, shape=self.__data_shape())
+            self.__parse(data)
+            data.flush()
+            del data
+            os.replace(temporary_file_name, self.cache_file_name)
+        finally:
+            if os.path.exists(temporary_file_name):
+                os.remove(temporary_file_name)
+
+        temporary_file_name = self.__temporary_file_name(self.cache_info_file_name)
+        try:
+            with open(temporary_file_name, 'w') as info_file:
+                json.dump(self.__source_info(), info_file)
+            os.replace(temporary_file_name, self.cache_info_file_name)
+        finally:
+            if os.path.exists(temporary_file_name):
+                os.remove(temporary_file_name)
+
+    @staticmethod
+    def __temporary_file_name(file_name):
+        '''Creates an empty file with a unique name in the directory of "file_name"
+        (so that it can be renamed to "file_name" atomically) and returns its name
+
+        Keyword arguments:
+        file_name -- name of the file that is replaced by the temporary file
+
+        '''
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(file_name),
+                                         prefix=os.path.basename(file_name) + '.',
+                                         suffix='.tmp', delete=False) as temporary_file:
+            return temporary_file.name
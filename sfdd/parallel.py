@@ -0,0 +1,334 @@
+'''
+Multi-process detection in which each worker process owns a partition of
+the sensors. The process that receives the samples writes them into a ring
+buffer in shared memory; the workers read their columns of the current window
+directly from the buffer, calculate the patterns (and, in the basic mode,
+the correlations) of their sensors and write their decisions into a shared
+output array. Only the model is sent to the workers, once, when they are
+started; the window data is never pickled.
+
+Each window is processed in two phases separated by a barrier:
+1. every worker calculates the patterns of its sensors and, in the basic mode,
+   the normalised correlation data of its sensors
+2. every worker calculates the rows of the correlation matrix of its sensors
+   and decides which of its sensors are anomalous, which needs the patterns
+   of all sensors
+
+'''
+import multiprocessing
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+
+class SharedArrays(object):
+    '''numpy arrays that are laid out in a single shared memory block,
+    which can be attached to by name from other processes
+    '''
+    ## alignment (in bytes) of the arrays in the block
+    alignment = 64
+
+    def __init__(self, specs, name=None):
+        '''Creates a new shared memory block if "name" is None and attaches to
+        the existing block "name" otherwise
+
+        Keyword arguments:
+        specs -- a list of (array name, shape, dtype) tuples
+        name -- name of an existing shared memory block (default None)
+        '''
+        offsets = list()
+        size = 0
+        for _, shape, dtype in specs:
+            offsets.append(size)
+            array_size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            size += -(-array_size // self.alignment) * self.alignment
+
+        ## the array specifications
+        self.specs = specs
+
+        ## True if the block was created by this instance (and thus has to be unlinked by it)
+        self.owner = name is None
+
+        ## the shared memory block
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner,
+                                                 size=max(size, 1))
+
+        ## a dictionary mapping the array names to numpy arrays backed by the block
+        self.arrays = dict()
+        for (array_name, shape, dtype), offset in zip(specs, offsets):
+            self.arrays[array_name] = np.ndarray(shape, dtype=dtype, buffer=self.memory.buf,
+                                                 offset=offset)
+            if self.owner:
+                self.arrays[array_name].fill(0)
+
+    @property
+    def name(self):
+        '''Name of the shared memory block
+        '''
+        return self.memory.name
+
+    def close(self):
+        '''Releases the arrays and detaches from the block; the block
+        is also removed if it was created by this instance
+        '''
+        self.arrays = dict()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+class ParallelDetector(object):
+    '''Monitors a stream of samples with a trained "SFDD" manager using several
+    worker processes. After each sample, the anomalous sensors are the same
+    as the ones returned by "SFDD.push" in the extended mode. In the basic mode,
+    they are only the same up to rounding of the correlations (a known limitation,
+    see "_correlation_rows"), so a correlation within rounding error
+    of the threshold can be decided differently.
+
+    The detector should be closed (or used as a context manager) so that
+    the workers are stopped and the shared memory is released.
+
+    '''
+    ## indices of the control values in the shared control array
+    sample_count_index = 0
+    stop_index = 1
+
+    def __init__(self, sfdd_manager, window_size, mode='basic', process_count=None):
+        '''Starts the worker processes
+
+        Keyword arguments:
+        sfdd_manager -- a trained "SFDD" instance
+        window_size -- number of measurements in a window
+        mode -- 'basic' or 'extended' monitoring (default 'basic')
+        process_count -- number of worker processes (default None, i.e. one per CPU,
+                         but not more than the number of sensors)
+        '''
+        if mode not in ('basic', 'extended'):
+            raise ValueError('Unknown monitoring mode {0}'.format(mode))
+
+        ## the "SFDD" instance
+        self.sfdd_manager = sfdd_manager
+
+        ## number of measurements in a window
+        self.window_size = window_size
+
+        ## monitoring mode ('basic' or 'extended')
+        self.mode = mode
+
+        ## number of monitored sensors
+        self.sensor_count = len(sfdd_manager.sensor_names)
+
+        if process_count is None:
+            process_count = multiprocessing.cpu_count()
+        process_count = max(1, min(process_count, self.sensor_count))
+
+        ## number of measurements used for the correlations (only in the basic mode)
+        self.correlation_size = int(window_size / 2) if mode == 'basic' else 0
+
+        # the ring buffer holds every sample twice (at i and i + window_size),
+        # so that each window is a contiguous slice of the buffer
+        specs = [('measurements', (2 * window_size, self.sensor_count), np.float64),
+                 ('timestamps', (2 * window_size,), np.float64),
+                 ('control', (2,), np.int64),
+                 ('normalised_data', (self.correlation_size, self.sensor_count), np.float64),
+                 ('constant', (self.sensor_count,), np.bool_),
+                 ('patterns', (self.sensor_count, sfdd_manager.pattern_count), np.bool_),
+                 ('working', (self.sensor_count,), np.bool_),
+                 ('anomalous', (self.sensor_count,), np.bool_)]
+
+        ## the shared arrays
+        self.shared_arrays = SharedArrays(specs)
+        self.shared_arrays.arrays['working'].fill(True)
+
+        ## a list of contiguous sensor partitions, given as slices, one per worker
+        self.partitions = [slice(int(partition[0]), int(partition[-1]) + 1)
+                           for partition in np.array_split(np.arange(self.sensor_count),
+                                                           process_count)]
+
+        context = multiprocessing.get_context()
+
+        ## barrier at which the workers wait for a new window (shared with this process)
+        self.start_barrier = context.Barrier(process_count + 1)
+
+        ## barrier that separates the two phases of the workers
+        self.phase_barrier = context.Barrier(process_count)
+
+        ## barrier at which this process waits for the results of the workers
+        self.done_barrier = context.Barrier(process_count + 1)
+
+        ## the worker processes
+        self.workers = list()
+        for partition in self.partitions:
+            worker = context.Process(target=_detection_worker,
+                                     args=(sfdd_manager, self.shared_arrays.name, specs,
+                                           window_size, mode, partition, self.start_barrier,
+                                           self.phase_barrier, self.done_barrier))
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def push(self, timestamp, sample):
+        '''Adds a single measurement vector to the ring buffer, waits for the workers
+        to evaluate the current window and returns a list of anomalous sensors.
+        An empty list is returned until the buffer contains a full window.
+
+        Keyword arguments:
+        timestamp -- time at which the measurements were taken
+        sample -- a numpy array with (at least) one measurement per sensor
+
+        '''
+        arrays = self.shared_arrays.arrays
+        control = arrays['control']
+        sample_count = int(control[self.sample_count_index])
+        position = sample_count % self.window_size
+
+        sample = np.asarray(sample, dtype=float)[0:self.sensor_count]
+        arrays['measurements'][position] = sample
+        arrays['measurements'][position + self.window_size] = sample
+        arrays['timestamps'][position] = timestamp
+        arrays['timestamps'][position + self.window_size] = timestamp
+        control[self.sample_count_index] = sample_count + 1
+        if sample_count + 1 < self.window_size:
+            return list()
+
+        try:
+            self.start_barrier.wait()
+            self.done_barrier.wait()
+        except threading.BrokenBarrierError:
+            raise RuntimeError('A detection worker failed')
+        return [sensor for sensor, anomalous in zip(self.sfdd_manager.sensor_names,
+                                                    arrays['anomalous']) if anomalous]
+
+    def close(self):
+        '''Stops the workers and releases the shared memory
+        '''
+        if not self.workers:
+            return
+        self.shared_arrays.arrays['control'][self.stop_index] = 1
+        try:
+            self.start_barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        for worker in self.workers:
+            worker.join()
+        self.workers = list()
+        self.shared_arrays.close()
+
+def _detection_worker(sfdd_manager, memory_name, specs, window_size, mode, partition,
+                      start_barrier, phase_barrier, done_barrier):
+    '''Evaluates the windows of the ring buffer for the sensors in "partition"
+    until the stop flag is set (see "ParallelDetector")
+
+    Keyword arguments:
+    sfdd_manager -- a trained "SFDD" instance
+    memory_name -- name of the shared memory block
+    specs -- the specifications of the shared arrays
+    window_size -- number of measurements in a window
+    mode -- 'basic' or 'extended' monitoring
+    partition -- a slice with the sensors of the worker
+    start_barrier -- barrier at which the worker waits for a new window
+    phase_barrier -- barrier between the two phases
+    done_barrier -- barrier at which the results are handed over
+
+    '''
+    shared_arrays = SharedArrays(specs, memory_name)
+    try:
+        _evaluate_windows(sfdd_manager, shared_arrays.arrays, window_size, mode, partition,
+                          start_barrier, phase_barrier, done_barrier)
+    except threading.BrokenBarrierError:
+        pass
+    except BaseException:
+        # the other processes are released instead of waiting forever
+        for barrier in (start_barrier, phase_barrier, done_barrier):
+            barrier.abort()
+        raise
+    shared_arrays.close()
+
+def _evaluate_windows(sfdd_manager, arrays, window_size, mode, partition,
+                      start_barrier, phase_barrier, done_barrier):
+    '''The window loop of "_detection_worker"; the views of the shared arrays
+    only live in this function so that the memory block can be closed afterwards
+
+    Keyword arguments:
+    sfdd_manager -- a trained "SFDD" instance
+    arrays -- a dictionary with the shared arrays
+    window_size -- number of measurements in a window
+    mode -- 'basic' or 'extended' monitoring
+    partition -- a slice with the sensors of the worker
+    start_barrier -- barrier at which the worker waits for a new window
+    phase_barrier -- barrier between the two phases
+    done_barrier -- barrier at which the results are handed over
+
+    '''
+    control = arrays['control']
+    correlation_size = arrays['normalised_data'].shape[0]
+    while True:
+        start_barrier.wait()
+        if control[ParallelDetector.stop_index]:
+            break
+
+        # views of the current window; nothing is copied
+        start = int(control[ParallelDetector.sample_count_index]) % window_size
+        window = arrays['measurements'][start:start+window_size]
+        window_timestamps = arrays['timestamps'][start:start+window_size]
+
+        arrays['patterns'][partition] = \
+            sfdd_manager.pattern_registry.evaluate(window[correlation_size:, partition],
+                                                   window_timestamps)
+        if mode == 'basic':
+            arrays['normalised_data'][:, partition], arrays['constant'][partition] = \
+                _normalise_columns(window[0:correlation_size, partition])
+        phase_barrier.wait()
+
+        patterns = arrays['patterns'][np.newaxis]
+        if mode == 'basic':
+            correlations = _correlation_rows(arrays['normalised_data'], arrays['constant'],
+                                             partition)
+            working = sfdd_manager.decide_basic(patterns, correlations[np.newaxis],
+                                                arrays['working'][partition],
+                                                sensor_indices=partition)[0]
+            arrays['working'][partition] = working
+            arrays['anomalous'][partition] = ~working
+        else:
+            arrays['anomalous'][partition] = \
+                sfdd_manager.decide_extended(patterns, sensor_indices=partition)[0]
+        done_barrier.wait()
+
+def _normalise_columns(correlation_data):
+    '''Returns a tuple (normalised_data, constant), where "normalised_data" contains
+    the centred columns of "correlation_data" scaled to unit norm and "constant"
+    is a Boolean numpy array marking the constant columns (which are only centred)
+
+    Keyword arguments:
+    correlation_data -- an m x k numpy array with the correlation part of a window
+
+    '''
+    centred_data = correlation_data - correlation_data.mean(axis=0)
+    norms = np.sqrt(np.einsum('ij,ij->j', centred_data, centred_data))
+    constant = np.ptp(correlation_data, axis=0) == 0
+    norms[constant] = 1.
+    return centred_data / norms, constant
+
+def _correlation_rows(normalised_data, constant, rows):
+    '''Returns the rows of the absolute correlation matrix of a window; with unit-norm
+    centred columns, the correlations are plain dot products. The values are only
+    the same as the ones of "SFDD.push" up to rounding, since the serial path
+    calculates the whole matrix from its sums of cross products; as there,
+    the correlations of constant columns are 1.
+
+    Keyword arguments:
+    normalised_data -- an m x n numpy array returned by "_normalise_columns" for all columns
+    constant -- a Boolean numpy array marking the constant columns
+    rows -- a slice with the rows of the returned correlations
+
+    '''
+    correlations = np.abs(np.dot(normalised_data[:, rows].T, normalised_data))
+    np.clip(correlations, 0., 1., out=correlations)
+    correlations[constant[rows]] = 1.
+    correlations[:, constant] = 1.
+    return correlations
@@ -47,3 +47,426 @@ class PatternLibrary(object):
                     return False
             prev_slope = slope
         return slope_changed
+
+    @staticmethod
+    def stuck_at_all(data, threshold=1e-3):
+        '''Returns a Boolean numpy array with one element per column of "data",
+        which is True for the columns whose consecutive elements are all
+        close to each other; vectorised equivalent of calling "stuck_at"
+        on every column
+
+        Keyword arguments:
+        data -- a (...) x m x n numpy array in which the columns represent sensors and
+                the rows are sensor measurements in m consecutive time steps
+        threshold -- threshold used for element equality checking (default 1e-3)
+
+        '''
+        return PatternLibrary.stuck_at_features(WindowFeatures(data), threshold)
+
+    @staticmethod
+    def drift_all(data, timesteps, threshold=1e-3):
+        '''Returns a Boolean numpy array with one element per column of "data",
+        which is True for the columns that exhibit a drift, i.e. whose slope
+        changes above the given threshold exactly once; vectorised equivalent
+        of calling "drift" on every column
+
+        Keyword arguments:
+        data -- a (...) x m x n numpy array in which the columns represent sensors and
+                the rows are sensor measurements in m consecutive time steps
+        timesteps -- a numpy array of at least m timestamps at which the measurements
+                     were made (or a (...) x m array with one row of timestamps per window)
+        threshold -- threshold used for element equality checking (default 1e-3)
+
+        '''
+        return PatternLibrary.drift_features(WindowFeatures(data, timesteps), threshold)
+
+    @staticmethod
+    def stuck_at_features(features, threshold=1e-3):
+        '''Detector of the stuck-at pattern (see "stuck_at_all") working on
+        the shared 'differences' feature of a "WindowFeatures" instance
+
+        Keyword arguments:
+        features -- a "WindowFeatures" instance
+        threshold -- threshold used for element equality checking (default 1e-3)
+
+        '''
+        return ~np.any(np.abs(features.get('differences')) > threshold, axis=-2)
+
+    @staticmethod
+    def drift_features(features, threshold=1e-3):
+        '''Detector of the drift pattern (see "drift_all") working on
+        the shared 'slope_differences' feature of a "WindowFeatures" instance
+
+        Keyword arguments:
+        features -- a "WindowFeatures" instance
+        threshold -- threshold used for element equality checking (default 1e-3)
+
+        '''
+        with np.errstate(invalid='ignore'):
+            slope_changes = np.abs(features.get('slope_differences')) > threshold
+        return np.count_nonzero(slope_changes, axis=-2) == 1
+
+class WindowFeatures(object):
+    '''Features of one or more windows of sensor measurements that are shared
+    by the pattern detectors; every feature is calculated at most once,
+    either when it is first requested or by "calculate"
+
+    '''
+    ## names of the available features
+    feature_names = ('differences', 'slopes', 'slope_differences', 'variance', 'min', 'max')
+
+    def __init__(self, data, timesteps=None):
+        '''
+        Keyword arguments:
+        data -- a (...) x m x n numpy array in which the columns represent sensors and
+                the rows are sensor measurements in m consecutive time steps
+        timesteps -- a numpy array of at least m timestamps at which the measurements
+                     were made (or a (...) x m array with one row of timestamps per window);
+                     only required for the slope features (default None)
+        '''
+        ## the window measurements
+        self.data = np.asarray(data)
+
+        ## the timestamps of the measurements or None if they are not known
+        self.timesteps = timesteps
+
+        ## a dictionary with the features that have already been calculated
+        self.__features = dict()
+
+    def calculate(self, feature_names):
+        '''Calculates the given features if they have not been calculated yet
+
+        Keyword arguments:
+        feature_names -- a list of feature names (see self.feature_names)
+
+        '''
+        for feature_name in feature_names:
+            self.get(feature_name)
+
+    def get(self, feature_name):
+        '''Returns a feature of the windows; each feature is a (...) x m' x n numpy array
+        ('differences', 'slopes' and 'slope_differences', with the differences taken
+        over the measurements) or a (...) x n numpy array ('variance', 'min' and 'max')
+
+        Keyword arguments:
+        feature_name -- name of the feature (see self.feature_names)
+
+        '''
+        if feature_name not in self.__features:
+            self.__features[feature_name] = self.__calculate(feature_name)
+        return self.__features[feature_name]
+
+    def __calculate(self, feature_name):
+        '''Calculates the feature called "feature_name"
+
+        Keyword arguments:
+        feature_name -- name of the feature (see self.feature_names)
+
+        '''
+        if feature_name == 'differences':
+            return np.diff(self.data, axis=-2)
+        elif feature_name == 'slopes':
+            if self.timesteps is None:
+                raise ValueError('Timestamps are required for calculating slopes')
+
+            # as in "PatternLibrary.drift", only the first m timestamps are used
+            measurement_count = self.data.shape[-2]
+            timesteps = np.asarray(self.timesteps)[..., :measurement_count]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return self.get('differences') / np.diff(timesteps, axis=-1)[..., np.newaxis]
+        elif feature_name == 'slope_differences':
+            slopes = self.get('slopes')
+            if slopes.shape[-2] < 2:
+                return np.zeros(slopes.shape[:-2] + (0,) + slopes.shape[-1:])
+            with np.errstate(invalid='ignore'):
+                return np.diff(slopes, axis=-2)
+        elif feature_name == 'variance':
+            return np.var(self.data, axis=-2)
+        elif feature_name == 'min':
+            return np.min(self.data, axis=-2)
+        elif feature_name == 'max':
+            return np.max(self.data, axis=-2)
+        raise ValueError('Unknown window feature {0}'.format(feature_name))
+
+class PatternRegistry(object):
+    '''An ordered collection of pattern detectors; the index of a detector
+    in the registry is the index of its pattern in the pattern arrays of "SFDD"
+
+    A detector is a function taking a "WindowFeatures" instance and a threshold
+    and returning a Boolean numpy array with one element per sensor (and window);
+    each detector declares the window features it uses, which are calculated
+    once per window for all sensors and shared by all detectors.
+
+    '''
+    def __init__(self):
+        ## a list of (name, detector, feature_names, threshold) tuples in pattern order
+        self.detectors = list()
+
+    @staticmethod
+    def default():
+        '''Returns a registry with the patterns of the original method,
+        namely stuck-at (pattern 0) and drift (pattern 1)
+        '''
+        registry = PatternRegistry()
+        registry.register('stuck_at', PatternLibrary.stuck_at_features, ['differences'])
+        registry.register('drift', PatternLibrary.drift_features,
+                          ['differences', 'slopes', 'slope_differences'])
+        return registry
+
+    def register(self, name, detector, feature_names, threshold=1e-3):
+        '''Adds a pattern detector to the end of the registry
+
+        Keyword arguments:
+        name -- a unique name of the pattern
+        detector -- a function detector(features, threshold) returning a Boolean numpy array
+                    specifying which sensors exhibit the pattern (see "PatternLibrary.drift_features")
+        feature_names -- a list with the names of the window features used by the detector
+        threshold -- threshold passed to the detector (default 1e-3)
+
+        '''
+        if name in self.names:
+            raise ValueError('A pattern called {0} is already registered'.format(name))
+        for feature_name in feature_names:
+            if feature_name not in WindowFeatures.feature_names:
+                raise ValueError('Unknown window feature {0}'.format(feature_name))
+        self.detectors.append((name, detector, tuple(feature_names), threshold))
+
+    @property
+    def names(self):
+        '''A tuple with the names of the registered patterns in pattern order
+        '''
+        return tuple(name for name, _, _, _ in self.detectors)
+
+    @property
+    def pattern_count(self):
+        '''Number of registered patterns
+        '''
+        return len(self.detectors)
+
+    def feature_names(self):
+        '''Returns a list with the window features used by at least one detector
+        '''
+        feature_names = list()
+        for _, _, detector_features, _ in self.detectors:
+            for feature_name in detector_features:
+                if feature_name not in feature_names:
+                    feature_names.append(feature_name)
+        return feature_names
+
+    def evaluate(self, data, timesteps, tolerance=None):
+        '''Returns a (...) x n x self.pattern_count Boolean numpy array specifying
+        which of the registered patterns are exhibited by the sensors
+
+        Keyword arguments:
+        data -- a (...) x m x n numpy array in which the columns represent sensors and
+                the rows are sensor measurements in m consecutive time steps
+        timesteps -- a numpy array of at least m timestamps at which the measurements
+                     were made (or a (...) x m array with one row of timestamps per window)
+        tolerance -- a threshold passed to all detectors instead of their
+                     registered thresholds (default None)
+
+        '''
+        return self.evaluate_features(WindowFeatures(data, timesteps), tolerance)
+
+    def evaluate_features(self, features, tolerance=None):
+        '''Returns the patterns of the windows described by a "WindowFeatures" instance
+        (see "evaluate"); the same features can be evaluated with several tolerances
+
+        Keyword arguments:
+        features -- a "WindowFeatures" instance
+        tolerance -- a threshold passed to all detectors instead of their
+                     registered thresholds (default None)
+
+        '''
+        features.calculate(self.feature_names())
+
+        patterns = np.zeros(features.data.shape[:-2] + features.data.shape[-1:] +
+                            (self.pattern_count,), dtype=bool)
+        for p, (_, detector, _, threshold) in enumerate(self.detectors):
+            patterns[..., p] = detector(features, threshold if tolerance is None else tolerance)
+        return patterns
+
+class RunningPatterns(object):
+    '''Per-sensor running state from which the stuck-at and drift patterns
+    of the last "window_size" measurements of a stream are obtained
+    in constant time per sample, i.e. independently of the window size
+
+    The stuck-at pattern is tracked through the length of the current run of
+    measurement differences below the threshold; the drift pattern through
+    the number of slope changes within the window, maintained with a ring
+    of slope-change flags.
+
+    '''
+    ## names of the patterns that can be tracked incrementally
+    supported_patterns = ('stuck_at', 'drift')
+
+    def __init__(self, sensor_count, window_size, thresholds=None):
+        '''
+        Keyword arguments:
+        sensor_count -- number of sensors n
+        window_size -- number of consecutive measurements in which patterns are looked for
+        thresholds -- a dictionary mapping the names in self.supported_patterns to the
+                      thresholds used for element equality checking; 1e-3 is used
+                      for the patterns that are not given (default None)
+        '''
+        ## number of consecutive measurements in which patterns are looked for
+        self.window_size = window_size
+
+        ## a dictionary with the threshold used for element equality checking for each pattern
+        self.thresholds = dict((pattern_name, 1e-3) for pattern_name in self.supported_patterns)
+        if thresholds is not None:
+            self.thresholds.update(thresholds)
+
+        ## per sensor, the number of consecutive differences below the threshold
+        self.stuck_run_lengths = np.zeros(sensor_count, dtype=int)
+
+        ## per sensor, the most recent slope (NaN if not known yet)
+        self.last_slopes = np.full(sensor_count, np.nan)
+
+        ## a ring with the slope-change flags of the last "window_size - 2" slope pairs
+        self.slope_changes = np.zeros((max(window_size - 2, 1), sensor_count), dtype=bool)
+
+        ## position in self.slope_changes that will be overwritten next
+        self.slope_change_position = 0
+
+        ## per sensor, the number of slope changes in self.slope_changes
+        self.slope_change_counts = np.zeros(sensor_count, dtype=int)
+
+    def update(self, differences, time_difference):
+        '''Updates the running state with a new sample
+
+        Keyword arguments:
+        differences -- a numpy array with the difference between the new
+                       and the previous measurement of each sensor
+        time_difference -- time between the two measurements used for the slopes
+                           (NaN if not available)
+
+        '''
+        stuck = ~(np.abs(differences) > self.thresholds['stuck_at'])
+        self.stuck_run_lengths += 1
+        self.stuck_run_lengths[~stuck] = 0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slopes = differences / time_difference
+            changes = np.abs(slopes - self.last_slopes) > self.thresholds['drift']
+        self.last_slopes = slopes
+
+        position = self.slope_change_position
+        self.slope_change_counts += changes
+        self.slope_change_counts -= self.slope_changes[position]
+        self.slope_changes[position] = changes
+        self.slope_change_position = (position + 1) % self.slope_changes.shape[0]
+
+    @staticmethod
+    def registry_thresholds(pattern_registry):
+        '''Returns a dictionary with the thresholds of the patterns of a "PatternRegistry"
+        if all of them can be tracked incrementally, i.e. if they are detected with
+        the stuck-at and drift detectors of "PatternLibrary"; returns None otherwise
+
+        Keyword arguments:
+        pattern_registry -- a "PatternRegistry"
+
+        '''
+        running_detectors = {'stuck_at': PatternLibrary.stuck_at_features,
+                             'drift': PatternLibrary.drift_features}
+        thresholds = dict()
+        for name, detector, _, threshold in pattern_registry.detectors:
+            if running_detectors.get(name) is not detector:
+                return None
+            thresholds[name] = threshold
+        return thresholds
+
+    def stuck_at(self):
+        '''Returns a Boolean numpy array specifying which sensors were stuck
+        during the last "window_size" measurements
+        '''
+        return self.stuck_run_lengths >= self.window_size - 1
+
+    def drift(self):
+        '''Returns a Boolean numpy array specifying which sensors exhibited
+        a drift during the last "window_size" measurements
+        '''
+        if self.window_size < 3:
+            return np.zeros_like(self.slope_change_counts, dtype=bool)
+        return self.slope_change_counts == 1
+
+    def patterns(self, pattern_names):
+        '''Returns an n x len(pattern_names) Boolean numpy array specifying which of the
+        given patterns were exhibited by the sensors during the last "window_size" measurements
+
+        Keyword arguments:
+        pattern_names -- a list of names from self.supported_patterns
+
+        '''
+        patterns = np.zeros((self.stuck_run_lengths.shape[0], len(pattern_names)), dtype=bool)
+        for p, pattern_name in enumerate(pattern_names):
+            if pattern_name == 'stuck_at':
+                patterns[:, p] = self.stuck_at()
+            elif pattern_name == 'drift':
+                patterns[:, p] = self.drift()
+            else:
+                raise ValueError('Pattern {0} cannot be tracked incrementally'.format(pattern_name))
+        return patterns
+
+class PatternCodes(object):
+    '''Conversions between Boolean pattern arrays, with one element per pattern,
+    and compact integer codes in which bit p is set if pattern p is exhibited;
+    with up to seven patterns, the codes take a single byte (int8) per sensor
+    '''
+    @staticmethod
+    def dtype(pattern_count):
+        '''Returns the smallest signed integer type that can hold the codes of "pattern_count" patterns
+
+        Keyword arguments:
+        pattern_count -- number of patterns
+
+        '''
+        for code_type in (np.int8, np.int16, np.int32, np.int64):
+            if pattern_count < 8 * np.dtype(code_type).itemsize:
+                return code_type
+        raise ValueError('Too many patterns for integer codes: {0}'.format(pattern_count))
+
+    @staticmethod
+    def encode(patterns):
+        '''Returns a (...) integer numpy array with the codes of a (...) x pattern_count
+        Boolean numpy array of patterns
+
+        Keyword arguments:
+        patterns -- a (...) x pattern_count Boolean numpy array
+
+        '''
+        patterns = np.asarray(patterns, dtype=bool)
+        code_type = PatternCodes.dtype(patterns.shape[-1])
+        codes = np.zeros(patterns.shape[:-1], dtype=code_type)
+        for p in range(patterns.shape[-1]):
+            codes |= patterns[..., p].astype(code_type) << p
+        return codes
+
+    @staticmethod
+    def decode(codes, pattern_count):
+        '''Returns a (...) x pattern_count Boolean numpy array with the patterns
+        represented by a (...) integer numpy array of codes
+
+        Keyword arguments:
+        codes -- an integer numpy array of pattern codes
+        pattern_count -- number of patterns
+
+        '''
+        codes = np.asarray(codes)
+        return (codes[..., np.newaxis] >> np.arange(pattern_count, dtype=codes.dtype)) & 1 == 1
+
+    @staticmethod
+    def first_pattern(codes):
+        '''Returns an int32 numpy array with the index of the first pattern
+        in each code (-1 for codes without patterns)
+
+        Keyword arguments:
+        codes -- an integer numpy array of pattern codes
+
+        '''
+        codes = np.asarray(codes).astype(np.int64)
+        lowest_bits = codes & -codes
+        first_patterns = np.full(codes.shape, -1, dtype=np.int32)
+        has_pattern = lowest_bits > 0
+        first_patterns[has_pattern] = np.log2(lowest_bits[has_pattern]).astype(np.int32)
+        return first_patterns
@@ -0,0 +1,289 @@
+import os
+import json
+import bisect
+import numpy as np
+from sfdd.patterns import PatternCodes
+
+class FaultIntervalStore(object):
+    '''An append-only store of detection results in which the anomalous/normal state
+    of each sensor is run-length encoded into fault intervals (start time, end time,
+    sensor, pattern). An interval covers consecutive windows in which a sensor is
+    anomalous with the same active pattern; its end time is the end time of the last
+    such window. The pattern is -1 if the sensor is anomalous without exhibiting
+    any of the patterns (e.g. in the basic monitoring).
+
+    The closed intervals are appended to a binary file of fixed-size records;
+    the sensor and pattern names are stored in a JSON file next to it.
+    Per sensor, the intervals are disjoint and ordered in time, so time-range
+    queries only need a binary search per sensor.
+
+    '''
+    ## data type of the records in the interval file
+    record_dtype = np.dtype([('start', '<f8'), ('end', '<f8'), ('sensor', '<i4'), ('pattern', '<i4')])
+
+    ## extension of the file with the sensor and pattern names
+    info_extension = '.json'
+
+    ## state code of a sensor that is not anomalous
+    normal_state = -2
+
+    def __init__(self, file_name, sensor_names=None, pattern_names=None):
+        '''Opens the store in "file_name" for appending, creating it if it does not exist
+
+        Keyword arguments:
+        file_name -- name of the interval file
+        sensor_names -- a list of sensor names; required when a new store is created
+                        and checked against the store otherwise (default None)
+        pattern_names -- a list of pattern names stored together with the intervals;
+                         checked against the store if it exists (default None)
+        '''
+        ## name of the interval file
+        self.file_name = file_name
+
+        ## name of the file with the sensor and pattern names
+        self.info_file_name = file_name + self.info_extension
+
+        if os.path.isfile(self.file_name) and os.path.isfile(self.info_file_name):
+            with open(self.info_file_name, 'r') as info_file:
+                info = json.load(info_file)
+            if sensor_names is not None and list(sensor_names) != info['sensor_names']:
+                raise ValueError('{0} contains the results of different sensors'.format(file_name))
+            if pattern_names is not None and list(pattern_names) != info['pattern_names']:
+                raise ValueError('{0} contains the results of different patterns'.format(file_name))
+            records = np.fromfile(self.file_name, dtype=self.record_dtype)
+        else:
+            if sensor_names is None:
+                raise ValueError('The sensor names are required for creating {0}'.format(file_name))
+            info = {'sensor_names': list(sensor_names),
+                    'pattern_names': list(pattern_names) if pattern_names is not None else None}
+            with open(self.info_file_name, 'w') as info_file:
+                json.dump(info, info_file)
+            open(self.file_name, 'wb').close()
+            records = np.zeros(0, dtype=self.record_dtype)
+
+        ## a list of sensor names
+        self.sensor_names = info['sensor_names']
+
+        ## a list of pattern names or None if not known
+        self.pattern_names = info['pattern_names']
+
+        sensor_count = len(self.sensor_names)
+
+        ## per sensor, a list with the start times of its closed intervals
+        self.interval_starts = [list() for _ in range(sensor_count)]
+
+        ## per sensor, a list with the end times of its closed intervals
+        self.interval_ends = [list() for _ in range(sensor_count)]
+
+        ## per sensor, a list with the patterns of its closed intervals
+        self.interval_patterns = [list() for _ in range(sensor_count)]
+
+        ## the current state of each sensor: self.normal_state or the pattern of its open interval
+        self.states = np.full(sensor_count, self.normal_state, dtype=np.int32)
+
+        ## start times of the open intervals (NaN for sensors in the normal state)
+        self.open_starts = np.full(sensor_count, np.nan)
+
+        ## end time of the last appended window (NaN if nothing has been appended);
+        ## for a reopened store, the end time of the last stored interval, so that
+        ## the appended results still have to follow the stored ones
+        self.last_timestamp = np.nan
+        if records.shape[0] > 0:
+            self.last_timestamp = float(records['end'].max())
+
+        order = np.lexsort((records['start'], records['sensor']))
+        self.__index(records[order])
+
+        ## the interval file, opened for appending
+        self.interval_file = open(self.file_name, 'ab')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def append(self, timestamp, anomalous, patterns=None):
+        '''Appends the result of a single window
+
+        Keyword arguments:
+        timestamp -- end time of the window
+        anomalous -- a Boolean numpy array with one element per sensor, which is True
+                     for the sensors that are anomalous in the window (or a list of
+                     the names of the anomalous sensors)
+        patterns -- an optional n x pattern_count Boolean numpy array with the patterns
+                    exhibited by the sensors in the window, or a numpy array with
+                    their pattern codes (see "PatternCodes") (default None)
+
+        '''
+        if len(anomalous) == 0 or isinstance(anomalous[0], str):
+            anomalous = np.isin(self.sensor_names, anomalous)
+        self.append_batch([timestamp], np.asarray(anomalous, dtype=bool)[np.newaxis],
+                          None if patterns is None else np.asarray(patterns)[np.newaxis])
+
+    def append_batch(self, timestamps, anomalous, patterns=None):
+        '''Appends the results of c consecutive windows (e.g. returned by "SFDD.detect_log")
+
+        Keyword arguments:
+        timestamps -- a numpy array with the end times of the windows
+        anomalous -- a c x n Boolean numpy array specifying the anomalous sensors in each window
+        patterns -- an optional c x n x pattern_count Boolean numpy array with
+                    the patterns exhibited by the sensors in each window, or a c x n
+                    numpy array with their pattern codes (see "PatternCodes") (default None)
+
+        '''
+        timestamps = np.asarray(timestamps, dtype=float)
+        anomalous = np.asarray(anomalous, dtype=bool)[:, 0:len(self.sensor_names)]
+        if timestamps.shape[0] == 0:
+            return
+        if timestamps[0] < self.last_timestamp or np.any(np.diff(timestamps) < 0):
+            raise ValueError('The results have to be appended in time order')
+
+        # state of each sensor in each window: the active pattern if the sensor
+        # is anomalous (-1 without a pattern) and self.normal_state otherwise
+        states = np.full(anomalous.shape, -1, dtype=np.int32)
+        if patterns is not None and np.ndim(patterns) == 2:
+            codes = np.asarray(patterns)[:, 0:anomalous.shape[1]]
+            first_patterns = PatternCodes.first_pattern(codes)
+            has_pattern = first_patterns >= 0
+            states[has_pattern] = first_patterns[has_pattern]
+        elif patterns is not None:
+            patterns = np.asarray(patterns, dtype=bool)[:, 0:anomalous.shape[1]]
+            has_pattern = patterns.any(axis=2)
+            states[has_pattern] = np.argmax(patterns, axis=2)[has_pattern]
+        states[~anomalous] = self.normal_state
+
+        # the intervals change where the state of a sensor changes; the changes are
+        # ordered by sensor and then by window so that the start of each closed interval
+        # is the time of the previous change of the same sensor
+        extended_states = np.vstack((self.states[np.newaxis], states))
+        extended_times = np.concatenate(([self.last_timestamp], timestamps))
+        change_sensors, change_windows = np.nonzero((extended_states[1:] !=
+                                                     extended_states[:-1]).T)
+        old_states = extended_states[change_windows, change_sensors]
+        new_states = extended_states[change_windows + 1, change_sensors]
+
+        first_change = np.ones(change_sensors.shape[0], dtype=bool)
+        first_change[1:] = change_sensors[1:] != change_sensors[:-1]
+        previous_change_times = np.concatenate(([np.nan], timestamps[change_windows[:-1]]))
+        interval_starts = np.where(first_change, self.open_starts[change_sensors],
+                                   previous_change_times)
+
+        closed = old_states != self.normal_state
+        records = np.zeros(np.count_nonzero(closed), dtype=self.record_dtype)
+        records['start'] = interval_starts[closed]
+        records['end'] = extended_times[change_windows[closed]]
+        records['sensor'] = change_sensors[closed]
+        records['pattern'] = old_states[closed]
+        self.__index(records)
+        self.interval_file.write(records.tobytes())
+
+        last_change = np.ones(change_sensors.shape[0], dtype=bool)
+        last_change[:-1] = change_sensors[:-1] != change_sensors[1:]
+        last_sensors = change_sensors[last_change]
+        self.open_starts[last_sensors] = np.where(new_states[last_change] != self.normal_state,
+                                                  timestamps[change_windows[last_change]], np.nan)
+        self.states = extended_states[-1].copy()
+        self.last_timestamp = timestamps[-1]
+
+    def flush(self):
+        '''Writes the closed intervals to the interval file
+        '''
+        self.interval_file.flush()
+
+    def close(self):
+        '''Closes the open intervals at the time of the last window and closes the file
+        '''
+        if self.interval_file.closed:
+            return
+        open_sensors = np.where(self.states != self.normal_state)[0]
+        records = np.zeros(open_sensors.shape[0], dtype=self.record_dtype)
+        records['start'] = self.open_starts[open_sensors]
+        records['end'] = self.last_timestamp
+        records['sensor'] = open_sensors
+        records['pattern'] = self.states[open_sensors]
+        self.__index(records)
+        self.interval_file.write(records.tobytes())
+        self.interval_file.close()
+
+        self.states[:] = self.normal_state
+        self.open_starts[:] = np.nan
+
+    def intervals(self, start_time=-np.inf, end_time=np.inf, sensor_names=None):
+        '''Returns a list of (start time, end time, sensor name, pattern) tuples,
+        ordered by start time, with the fault intervals that overlap [start_time, end_time];
+        open intervals end at the time of the last appended window. The pattern
+        is given by its name if the pattern names are known.
+
+        Keyword arguments:
+        start_time -- start of the queried time range (default -inf)
+        end_time -- end of the queried time range (default inf)
+        sensor_names -- an optional list of the sensors of interest (default None, i.e. all sensors)
+
+        '''
+        if sensor_names is None:
+            sensor_indices = range(len(self.sensor_names))
+        else:
+            sensor_indices = [self.sensor_names.index(sensor) for sensor in sensor_names]
+
+        intervals = list()
+        for i in sensor_indices:
+            first = bisect.bisect_left(self.interval_ends[i], start_time)
+            last = bisect.bisect_right(self.interval_starts[i], end_time)
+            for j in range(first, last):
+                intervals.append((self.interval_starts[i][j], self.interval_ends[i][j],
+                                  self.sensor_names[i],
+                                  self.__pattern_name(self.interval_patterns[i][j])))
+
+            if self.states[i] != self.normal_state and self.open_starts[i] <= end_time \
+               and self.last_timestamp >= start_time:
+                intervals.append((float(self.open_starts[i]), float(self.last_timestamp),
+                                  self.sensor_names[i], self.__pattern_name(self.states[i])))
+        intervals.sort(key=lambda interval: interval[0])
+        return intervals
+
+    def faulty_sensors(self, start_time, end_time):
+        '''Returns a list of the sensors that were anomalous at some point in [start_time, end_time]
+
+        Keyword arguments:
+        start_time -- start of the queried time range
+        end_time -- end of the queried time range
+
+        '''
+        faulty_sensors = list()
+        for i, sensor in enumerate(self.sensor_names):
+            first = bisect.bisect_left(self.interval_ends[i], start_time)
+            if first < len(self.interval_starts[i]) and self.interval_starts[i][first] <= end_time:
+                faulty_sensors.append(sensor)
+            elif self.states[i] != self.normal_state and self.open_starts[i] <= end_time \
+                 and self.last_timestamp >= start_time:
+                faulty_sensors.append(sensor)
+        return faulty_sensors
+
+    def __index(self, records):
+        '''Adds closed intervals to the per-sensor lists
+
+        Keyword arguments:
+        records -- a numpy array of self.record_dtype ordered by sensor and start time
+
+        '''
+        for record in records.tolist():
+            start, end, sensor, pattern = record
+            self.interval_starts[sensor].append(start)
+            self.interval_ends[sensor].append(end)
+            self.interval_patterns[sensor].append(pattern)
+
+    def __pattern_name(self, pattern):
+        '''Returns the name of a pattern index if the pattern names are known
+        and the index itself otherwise (None for -1)
+
+        Keyword arguments:
+        pattern -- a pattern index
+
+        '''
+        if pattern < 0:
+            return None
+        if self.pattern_names is None:
+            return int(pattern)
+        return self.pattern_names[pattern]
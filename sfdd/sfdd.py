@@ -1,7 +1,10 @@
-import yaml
+import zipfile
 import numpy as np
 from sfdd.correlation import CorrelationLibrary
-from sfdd.patterns import PatternLibrary
+from sfdd.patterns import PatternRegistry, RunningPatterns, PatternCodes
+from sfdd.compact import CompactLog, SensorStateView, SensorRelationView
+from sfdd.streaming import SampleStream
+from sfdd.instrumentation import NULL_STAGE
 
 class SFDD(object):
     '''An interface implementing the sensor-based fault detection method described in
@@ -13,12 +16,43 @@ class SFDD(object):
     Contact -- aleksandar.mitrevski@h-brs.de, youssef-mahmoud.youssef@h-brs.de
 
     '''
-    def __init__(self, sensor_names, structural_model, correlation_threshold, pattern_count):
+    ## version of the binary model format written by "save_model"
+    model_format_version = 2
+
+    ## names of the model arrays that "load_model" can memory-map
+    mapped_model_arrays = ('correlated_sensor_matrix', 'independence_matrix', 'pattern_pair_table')
+
+    def __init__(self, sensor_names, structural_model, correlation_threshold, pattern_count=None,
+                 instrumentation=None, sparse_correlations=False,
+                 pattern_registry=None, incremental_decisions=False, compact=False):
         '''
         sensor_names -- a list of sensor names
         structural_model -- a networkx.DiGraph instance representing a system
         correlation_threshold -- threshold used for checking whether two sensors are correlated
-        pattern_count -- number of different data trends to check for
+        pattern_count -- number of different data trends to check for; has to match
+                         the number of patterns in "pattern_registry" if given (default None)
+        instrumentation -- an optional "Instrumentation" instance recording stage timings
+                           and detection counts; nothing is recorded if None (default None)
+        sparse_correlations -- if True, only the correlations between structurally independent
+                               sensors are calculated, block-wise and without building dense
+                               correlation matrices; in the basic monitoring, only the sensors
+                               exhibiting the same pattern are correlated. Only the Pearson
+                               computation is sparse: the correlated sensors, the independence
+                               matrix and the pattern pairs are still stored in dense
+                               arrays (default False)
+        pattern_registry -- a "PatternRegistry" with the detectors of the data trends;
+                            the stuck-at and drift detectors are used if None (default None)
+        incremental_decisions -- if True, the extended decisions of "monitor_sensors_extended"
+                                 and "push" are only recomputed for the sensors whose patterns
+                                 changed since the previous window and for their correlated
+                                 neighbours, and the basic decisions only compare
+                                 the correlations of the sensors exhibiting a pattern;
+                                 "invalidate_decision_caches" has to be called after
+                                 in-place changes of the model arrays (default False)
+        compact -- if True, the patterns of "detect_log" and self.window_patterns
+                   are given as integer codes (see "PatternCodes") instead of Boolean
+                   arrays; this is the only change, recorded logs can be stored
+                   in single precision with "compact_log" in both modes (default False)
         '''
         ## a list of sensor names
         self.sensor_names = sensor_names
@@ -26,113 +60,443 @@ class SFDD(object):
         ## a networkx.DiGraph instance representing the structural model of a system
         self.structural_model = structural_model
 
-        ## a dictionary in which each key is a sensor name and each value
-        ## is a set of sensor indices corresponding to the sensors
+        ## an n x n Boolean numpy array in which the element (i, j) is True
+        ## if sensor j does not depend on the same component as sensor i
+        self.independence_matrix = self.structural_model.independence_matrix(self.sensor_names)
+
+        ## whether the patterns are given as integer codes
+        self.compact = compact
+
+        ## a dictionary view of self.independence_matrix in which each key is a sensor name
+        ## and each value is a set of sensor indices corresponding to the sensors
         ## that do not depend on the same component as the sensor in question
-        self.independent_sensors = dict()
-        for sensor in self.sensor_names:
-            independent_sensors = self.structural_model.find_independent_sensors(sensor, self.sensor_names)
-            sensor_indices = set()
-            for other_sensor in independent_sensors:
-                sensor_indices.add(self.sensor_names.index(other_sensor))
-            self.independent_sensors[sensor] = sensor_indices
+        self.independent_sensors = SensorRelationView(self, 'independence_matrix',
+                                                      self.sensor_names, container=set)
 
         ## threshold used for checking whether two sensors are correlated
         self.correlation_threshold = correlation_threshold
 
+        ## a "PatternRegistry" with the detectors of the data trends
+        self.pattern_registry = pattern_registry
+        if self.pattern_registry is None:
+            self.pattern_registry = PatternRegistry.default()
+
+        if pattern_count is not None and pattern_count != self.pattern_registry.pattern_count:
+            raise ValueError('pattern_count is {0}, but {1} patterns are registered'.format(
+                pattern_count, self.pattern_registry.pattern_count))
+
         ## number of different data trends to check for
-        self.pattern_count = pattern_count
-
-        ### a dictionary in which each key is a sensor name and each value
-        ### is a list of names corresponding to the sensors
-        ### that are correlated to the sensor specified by the key
-        self.correlated_sensors = dict()
-        for sensor in self.sensor_names:
-            self.correlated_sensors[sensor] = list()
-
-        ### a dictionary in which each key is a sensor name and each value
-        ### is a list of indices corresponding to the sensors
-        ### that are correlated to the sensor specified by the key
-        self.correlated_sensor_indices = dict()
-        for sensor in self.sensor_names:
-            self.correlated_sensor_indices[sensor] = list()
-
-        ### a dictionary in which each key is a sensor name and each value
-        ### is a list of lists [[x], [other-sensor-name], [y]],
-        ### where [x] is a pattern exhibited by the sensor specified by the key
-        ### and [y] is a pattern exhibited at the same time by the sensor
-        ### specified by [other-sensor-name]
-        self.sensor_pattern_pairs = dict()
-
-        ### a dictionary in which each key is a sensor name and each value
-        ### is a Boolean value specifying whether the sensor is thought to be working
-        self.sensor_working = dict()
-        for sensor in self.sensor_names:
-            self.sensor_working[sensor] = True
-
-    def learn_correlations(self, data, correlation_file_name):
-        # we find all pairwise correlations between the sensor measurements
-        # and take their absolute values since we are only interested
-        # in the magnitude of the correlations, not their signs
-        correlations = np.abs(CorrelationLibrary.pearson(data))
+        self.pattern_count = self.pattern_registry.pattern_count
+
+        ## an n x n Boolean numpy array in which the element (i, j) is True
+        ## if sensor j has been found to be correlated to sensor i
+        self.correlated_sensor_matrix = np.zeros((len(self.sensor_names), len(self.sensor_names)),
+                                                 dtype=bool)
+
+        ### a dictionary view of self.correlated_sensor_matrix in which each key is
+        ### a sensor name and each value is a list of names corresponding to the sensors
+        ### that are correlated to the sensor specified by the key;
+        ### self.correlated_sensor_indices contains the indices of the same sensors;
+        ### since both are derived from the matrix, they cannot get out of sync with it
+        self.correlated_sensors = SensorRelationView(self, 'correlated_sensor_matrix',
+                                                     self.sensor_names, as_names=True)
+        self.correlated_sensor_indices = SensorRelationView(self, 'correlated_sensor_matrix',
+                                                            self.sensor_names)
+
+        ## an n x pattern_count x n x pattern_count Boolean numpy array in which
+        ## the element (i, x, j, y) is True if pattern x of sensor i has been observed
+        ## together with pattern y of the correlated sensor j in a fault-free data set;
+        ## "sensor_pattern_pairs" provides a dictionary view of the same data
+        self.pattern_pair_table = np.zeros((len(self.sensor_names), self.pattern_count,
+                                            len(self.sensor_names), self.pattern_count),
+                                           dtype=bool)
+
+        ## a Boolean numpy array specifying whether each sensor is thought to be working
+        self.working_state = np.ones(len(self.sensor_names), dtype=bool)
+
+        ### a dictionary view of self.working_state in which each key is a sensor name and
+        ### each value is a Boolean value specifying whether the sensor is thought to be working
+        self.sensor_working = SensorStateView(self.sensor_names, self.working_state)
+
+        ## a "SampleStream" used by "push"; allocated at the first sample after "start_stream"
+        self.__stream = None
+
+        ## number of measurements in the windows of the stream
+        self.__stream_window_size = None
+
+        ## monitoring mode of the stream ('basic' or 'extended')
+        self.__stream_mode = None
+
+        ## thresholds of the patterns tracked incrementally by the stream or None
+        ## if the registered patterns are evaluated on the whole window
+        self.__stream_thresholds = None
+
+        ## an "Instrumentation" instance or None if the instrumentation is disabled
+        self.instrumentation = instrumentation
+
+        ## whether only the structurally relevant correlations are calculated
+        self.sparse_correlations = sparse_correlations
+
+        ## an n x pattern_count Boolean numpy array with the patterns exhibited by the sensors
+        ## in the last window evaluated by "monitor_sensors_basic", "monitor_sensors_extended"
+        ## or "push" (None before the first window); in the compact mode, a numpy array
+        ## with the pattern code of each sensor
+        self.window_patterns = None
+
+        ## whether the single-window decisions are only recomputed for the changed sensors
+        self.incremental_decisions = incremental_decisions
+
+        ## the inputs and results of the previous extended decisions, used by the incremental
+        ## evaluation: a tuple (correlated independent sensors, sensors with patterns,
+        ## active patterns, anomalous sensors); discarded by "invalidate_decision_caches"
+        self.__extended_decision_cache = None
+
+    def learn_correlations(self, data, correlation_file_name=None):
+        '''Finds the sensors that are correlated in the fault-free data set "data".
+        If sparse correlations are enabled, only the pairs of structurally
+        independent sensors are considered, since the other ones are not
+        used by the decisions; the pairs are then stored in the dense
+        self.correlated_sensor_matrix.
+
+        Keyword arguments:
+        data -- an m x n numpy array in which the columns represent sensors and
+                the rows are sensor measurements in m consecutive time steps
+        correlation_file_name -- name of a YAML file to which the correlated
+                                 sensors are written (default None, in which
+                                 case no file is written)
+
+        '''
+        if not self.sparse_correlations:
+            self.set_correlations(CorrelationLibrary.pearson(data), correlation_file_name)
+            return
+
+        sensor_count = len(self.sensor_names)
+        indptr, indices = CorrelationLibrary.correlated_pairs(data[:, 0:sensor_count],
+                                                              self.correlation_threshold,
+                                                              mask=self.independence_matrix)
+        correlated_sensor_matrix = np.zeros((sensor_count, sensor_count), dtype=bool)
+        correlated_sensor_matrix[np.repeat(np.arange(sensor_count), np.diff(indptr)),
+                                 indices] = True
+        self.correlated_sensor_matrix = correlated_sensor_matrix
+
+        if correlation_file_name is not None:
+            self.export_correlations(correlation_file_name)
+
+    def set_correlations(self, correlations, correlation_file_name=None):
+        '''Stores the pairs of sensors whose correlation magnitude is above
+        self.correlation_threshold as correlated sensors
+
+        Keyword arguments:
+        correlations -- an n x n numpy array of Pearson correlations between the sensors
+                        (e.g. obtained from "CorrelationLibrary.pearson")
+        correlation_file_name -- name of a YAML file to which the correlated
+                                 sensors are written (default None, in which
+                                 case no file is written)
+
+        '''
+        sensor_count = len(self.sensor_names)
+
+        # we take the absolute values of the correlations since we are only
+        # interested in the magnitude of the correlations, not their signs
+        correlations = np.abs(correlations[0:sensor_count, 0:sensor_count])
 
         nan_rows, nan_cols = np.where(np.isnan(correlations))
         correlations[nan_rows, nan_cols] = 1.
 
-        for i in range(correlations.shape[0]):
-            sensor_name = self.sensor_names[i]
-            correlated_sensor_idx = np.where(correlations[i] > self.correlation_threshold)[0]
-            for idx in correlated_sensor_idx:
-                if i != idx:
-                    self.correlated_sensors[sensor_name].append(self.sensor_names[idx])
-                    self.correlated_sensor_indices[sensor_name].append(idx)
+        correlated_sensor_matrix = correlations > self.correlation_threshold
+        np.fill_diagonal(correlated_sensor_matrix, False)
+        self.correlated_sensor_matrix = correlated_sensor_matrix
 
-        with open(correlation_file_name, 'w') as data_stream:
-            yaml.dump(self.correlated_sensors, data_stream, default_flow_style=False)
+        if correlation_file_name is not None:
+            self.export_correlations(correlation_file_name)
 
-    def find_normal_patterns(self, data, timestamps, pattern_file_name, window_size=-1):
-        for sensor in self.sensor_names:
-            self.sensor_pattern_pairs[sensor] = list()
+    def save_model(self, model_file_name):
+        '''Saves the trained model (correlated sensors, independence matrix, pattern pairs
+        and thresholds) to a binary .npz file that can be loaded with "load_model";
+        the arrays are stored as raw, uncompressed .npy members, so that the Boolean
+        matrices can be memory-mapped directly from the file
 
-        for i in range(data.shape[0]-window_size):
-            investigated_data = data[i:i+window_size, :]
+        Keyword arguments:
+        model_file_name -- name of the model file
 
-            # we find which patterns are exhibited by the sensors
-            patterns = self.__calculate_patterns(investigated_data, timestamps)
-            for j, sensor in enumerate(self.sensor_names):
-                # we skip the current sensor if it does not seem
-                # to exhibit any of the patterns we are looking for
-                if not np.any(patterns[j]):
-                    continue
-
-                correlated_sensor_idx = self.correlated_sensor_indices[sensor]
-
-                # patterns are mutually exclusive, so there can be
-                # only one pattern active at a time
-                active_pattern_idx = int(np.where(patterns[j])[0][0])
-
-                # we check if any of the patterns exhibited by the current sensor
-                # appears together with a pattern exhibited by any of the correlated sensors
-                # that depend on independent components; if we find such a pattern,
-                # a list [[x], [other-sensor-idx], [y]] is added to
-                # self.sensor_pattern_pairs[sensor], where [x] and [y] are the
-                # IDs of the patterns exhibited by sensor and [other-sensor-idx] respectively
-                for sensor_idx in correlated_sensor_idx:
-                    if sensor_idx not in self.independent_sensors[sensor] \
-                    or not np.any(patterns[sensor_idx]):
-                        continue
-
-                    active_corr_sensor_pattern_idx = int(np.where(patterns[sensor_idx])[0][0])
-                    corr_sensor_name = self.sensor_names[sensor_idx]
-                    pattern_tuple = [active_pattern_idx,
-                                     corr_sensor_name,
-                                     active_corr_sensor_pattern_idx]
-                    if pattern_tuple not in self.sensor_pattern_pairs[sensor]:
-                        self.sensor_pattern_pairs[sensor].append(pattern_tuple)
+        '''
+        with open(model_file_name, 'wb') as model_file:
+            np.savez(model_file,
+                     format_version=np.array(self.model_format_version),
+                     sensor_names=np.array(self.sensor_names),
+                     structural_model_fingerprint=np.array(self.structural_model.fingerprint()),
+                     correlation_threshold=np.array(self.correlation_threshold),
+                     pattern_count=np.array(self.pattern_count),
+                     pattern_names=np.array(self.pattern_registry.names),
+                     correlated_sensor_matrix=self.correlated_sensor_matrix,
+                     independence_matrix=self.independence_matrix,
+                     pattern_pair_table=self.pattern_pair_table)
+
+    def load_model(self, model_file_name, mmap_mode=None):
+        '''Loads a model saved with "save_model"; raises a ValueError if the model was
+        trained for different sensors or with a different structural model
+
+        Keyword arguments:
+        model_file_name -- name of the model file
+        mmap_mode -- if given ('r' or 'c', as for "np.memmap"), the Boolean matrices
+                     (see self.mapped_model_arrays) are memory-mapped from the file
+                     instead of being read, so that several processes loading
+                     the same model share its pages (default None)
+
+        '''
+        with np.load(model_file_name) as model_data:
+            if int(model_data['format_version']) != self.model_format_version:
+                raise ValueError('Unsupported model format in {0}'.format(model_file_name))
+            if list(model_data['sensor_names']) != list(self.sensor_names):
+                raise ValueError('{0} was trained for different sensors'.format(model_file_name))
+            if str(model_data['structural_model_fingerprint']) != \
+               self.structural_model.fingerprint():
+                raise ValueError('{0} was trained with a different structural model'.format(
+                    model_file_name))
+            if int(model_data['pattern_count']) != self.pattern_count:
+                raise ValueError('{0} was trained with a different number of patterns'.format(
+                    model_file_name))
+            if 'pattern_names' in model_data and \
+               tuple(model_data['pattern_names']) != self.pattern_registry.names:
+                raise ValueError('{0} was trained with different patterns'.format(model_file_name))
+
+            self.correlation_threshold = float(model_data['correlation_threshold'])
+
+            if mmap_mode is not None:
+                model_arrays = self.__map_arrays(model_file_name, self.mapped_model_arrays,
+                                                 mmap_mode)
+            else:
+                model_arrays = dict((name, model_data[name]) for name in self.mapped_model_arrays)
+
+        # the dictionary views are derived from the matrices and the setters
+        # of the matrices discard the results cached for the previous model
+        self.independence_matrix = model_arrays['independence_matrix']
+        self.pattern_pair_table = model_arrays['pattern_pair_table']
+        self.correlated_sensor_matrix = model_arrays['correlated_sensor_matrix']
+
+    @staticmethod
+    def __map_arrays(model_file_name, array_names, mmap_mode):
+        '''Returns a dictionary with memory-mapped numpy arrays of the given uncompressed
+        .npy members of an .npz file; the data of such a member is stored contiguously
+        in the file, after its local zip header and its .npy header
+
+        Keyword arguments:
+        model_file_name -- name of an .npz file
+        array_names -- names of the arrays that are mapped
+        mmap_mode -- mode of the memory maps ('r' or 'c')
 
+        '''
+        arrays = dict()
+        with zipfile.ZipFile(model_file_name) as archive, open(model_file_name, 'rb') as model_file:
+            for array_name in array_names:
+                member = archive.getinfo(array_name + '.npy')
+                if member.compress_type != zipfile.ZIP_STORED:
+                    raise ValueError('{0} in {1} is compressed and cannot be mapped'.format(
+                        array_name, model_file_name))
+
+                # the name and extra field lengths of the local header may differ
+                # from the ones in the central directory
+                model_file.seek(member.header_offset + 26)
+                name_length, extra_length = np.frombuffer(model_file.read(4), dtype='<u2')
+                model_file.seek(member.header_offset + 30 + int(name_length) + int(extra_length))
+
+                version = np.lib.format.read_magic(model_file)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(model_file)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(model_file)
+                arrays[array_name] = np.memmap(model_file_name, dtype=dtype, mode=mmap_mode,
+                                               offset=model_file.tell(), shape=shape,
+                                               order='F' if fortran_order else 'C')
+        return arrays
+
+    def find_normal_patterns(self, data, timestamps, pattern_file_name=None, window_size=-1):
+        '''Finds the pairs of patterns that are exhibited at the same time by correlated
+        sensors depending on independent components in the fault-free data set "data"
+        and stores them in self.pattern_pair_table
+
+        Keyword arguments:
+        data -- an m x n numpy array in which the columns represent sensors and
+                the rows are sensor measurements in m consecutive time steps
+        timestamps -- a numpy array of timestamps; as in the original implementation,
+                      the slopes of each window are calculated with the first
+                      "window_size" timestamps
+        pattern_file_name -- name of a YAML file to which the pattern pairs are written
+                             (default None, in which case no file is written)
+        window_size -- number of measurements in a window; the whole data set is
+                       used as a single window if -1 (default -1)
+
+        '''
+        self.pattern_pair_table = self.find_pattern_pairs(data, timestamps, window_size)
+
+        if pattern_file_name is not None:
+            self.export_pattern_pairs(pattern_file_name)
+
+    def find_pattern_pairs(self, data, timestamps, window_size=-1, correlated_sensor_matrix=None,
+                           pattern_tolerance=None):
+        '''Returns an n x self.pattern_count x n x self.pattern_count Boolean numpy array
+        with the pattern pairs found in "data" (see "find_normal_patterns") without
+        modifying self.pattern_pair_table; the tables of several data sets
+        can be combined with a logical or
+
+        Keyword arguments:
+        data -- an m x n numpy array in which the columns represent sensors and
+                the rows are sensor measurements in m consecutive time steps
+        timestamps -- a numpy array of timestamps
+        window_size -- number of measurements in a window; the whole data set is
+                       used as a single window if -1 (default -1)
+        correlated_sensor_matrix -- an n x n Boolean numpy array with the correlated sensors
+                                    used instead of self.correlated_sensor_matrix, or a stack
+                                    of such arrays of shape (..., n, n), in which case a table
+                                    of shape (..., n, self.pattern_count, n, self.pattern_count)
+                                    is returned for each of them (default None)
+        pattern_tolerance -- a threshold passed to all pattern detectors instead of
+                             their registered thresholds (default None)
+
+        '''
+        sensor_count = len(self.sensor_names)
+        if correlated_sensor_matrix is None:
+            correlated_sensor_matrix = self.correlated_sensor_matrix
+        correlated_sensor_matrix = np.asarray(correlated_sensor_matrix, dtype=bool)
+        stack_shape = correlated_sensor_matrix.shape[:-2]
+        correlated = (correlated_sensor_matrix & self.independence_matrix).reshape(
+            (-1, sensor_count, sensor_count))
+        pattern_pair_table = np.zeros((correlated.shape[0],) + self.pattern_pair_table.shape,
+                                      dtype=bool)
+
+        data = np.asarray(data, dtype=float)[:, 0:sensor_count]
+        if window_size == -1:
+            window_size = data.shape[0]
+            window_count = 1
+        else:
+            window_count = max(data.shape[0] - window_size, 0)
+
+        # window_count x window_size x n strided view of the data
+        if window_count > 0:
+            windows = np.lib.stride_tricks.sliding_window_view(data, window_size, axis=0)
+            windows = windows.transpose(0, 2, 1)[0:window_count]
+            window_timestamps = np.asarray(timestamps, dtype=float)[np.newaxis, 0:window_size]
+
+        chunk_size = self.__default_chunk_size(window_size)
+        for start in range(0, window_count, chunk_size):
+            patterns = self.pattern_registry.evaluate(windows[start:start+chunk_size],
+                                                      window_timestamps, pattern_tolerance)
+            has_pattern = patterns.any(axis=2)
+
+            # patterns are mutually exclusive, so there can be
+            # only one pattern active at a time
+            active_pattern = np.argmax(patterns, axis=2)
+
+            # a pattern pair (x, y) is recorded for sensor i and every
+            # correlated sensor j that depends on independent components
+            # whenever i exhibits x and j exhibits y in the same window
+            table_idx, window_idx, sensor_idx, other_sensor_idx = np.nonzero(
+                correlated[:, np.newaxis] &
+                has_pattern[np.newaxis, :, :, np.newaxis] &
+                has_pattern[np.newaxis, :, np.newaxis, :])
+            pattern_pair_table[table_idx,
+                               sensor_idx,
+                               active_pattern[window_idx, sensor_idx],
+                               other_sensor_idx,
+                               active_pattern[window_idx, other_sensor_idx]] = True
+        return pattern_pair_table.reshape(stack_shape + self.pattern_pair_table.shape)
+
+    def export_correlations(self, correlation_file_name):
+        '''Writes the correlated sensors to a YAML file
+
+        Keyword arguments:
+        correlation_file_name -- name of a YAML file
+
+        '''
+        import yaml
+        with open(correlation_file_name, 'w') as data_stream:
+            yaml.dump(dict(self.correlated_sensors), data_stream, default_flow_style=False)
+
+    def export_pattern_pairs(self, pattern_file_name):
+        '''Writes the dictionary view of the pattern pairs to a YAML file
+
+        Keyword arguments:
+        pattern_file_name -- name of a YAML file
+
+        '''
+        import yaml
         with open(pattern_file_name, 'w') as data_stream:
             yaml.dump(self.sensor_pattern_pairs, data_stream, default_flow_style=False)
 
+    @property
+    def sensor_pattern_pairs(self):
+        '''A dictionary view of self.pattern_pair_table in which each key is a sensor
+        name and each value is a list of lists [[x], [other-sensor-name], [y]],
+        where [x] is a pattern exhibited by the sensor specified by the key
+        and [y] is a pattern exhibited at the same time by the sensor
+        specified by [other-sensor-name]
+        '''
+        sensor_pattern_pairs = dict()
+        for i, sensor in enumerate(self.sensor_names):
+            sensor_pattern_pairs[sensor] = [[int(pattern), self.sensor_names[other_sensor],
+                                             int(other_pattern)]
+                                            for pattern, other_sensor, other_pattern
+                                            in zip(*np.nonzero(self.pattern_pair_table[i]))]
+        return sensor_pattern_pairs
+
+    @sensor_pattern_pairs.setter
+    def sensor_pattern_pairs(self, sensor_pattern_pairs):
+        sensor_indices = dict((sensor, i) for i, sensor in enumerate(self.sensor_names))
+        self.pattern_pair_table[:] = False
+        for sensor, pattern_pairs in sensor_pattern_pairs.items():
+            for pattern, other_sensor, other_pattern in pattern_pairs:
+                self.pattern_pair_table[sensor_indices[sensor], pattern,
+                                        sensor_indices[other_sensor], other_pattern] = True
+        self.invalidate_decision_caches()
+
+    @property
+    def correlated_sensor_matrix(self):
+        '''An n x n Boolean numpy array in which the element (i, j) is True
+        if sensor j has been found to be correlated to sensor i; assigning
+        a new array discards the cached incremental decisions, while
+        "invalidate_decision_caches" has to be called after in-place changes
+        '''
+        return self.__correlated_sensor_matrix
+
+    @correlated_sensor_matrix.setter
+    def correlated_sensor_matrix(self, correlated_sensor_matrix):
+        self.__correlated_sensor_matrix = correlated_sensor_matrix
+        self.invalidate_decision_caches()
+
+    @property
+    def independence_matrix(self):
+        '''An n x n Boolean numpy array in which the element (i, j) is True
+        if sensor j does not depend on the same component as sensor i;
+        see "correlated_sensor_matrix" for the cached decisions
+        '''
+        return self.__independence_matrix
+
+    @independence_matrix.setter
+    def independence_matrix(self, independence_matrix):
+        self.__independence_matrix = independence_matrix
+        self.invalidate_decision_caches()
+
+    @property
+    def pattern_pair_table(self):
+        '''An n x pattern_count x n x pattern_count Boolean numpy array in which
+        the element (i, x, j, y) is True if pattern x of sensor i has been observed
+        together with pattern y of the correlated sensor j in a fault-free data set;
+        see "correlated_sensor_matrix" for the cached decisions
+        '''
+        return self.__pattern_pair_table
+
+    @pattern_pair_table.setter
+    def pattern_pair_table(self, pattern_pair_table):
+        self.__pattern_pair_table = pattern_pair_table
+        self.invalidate_decision_caches()
+
+    def invalidate_decision_caches(self):
+        '''Discards the results cached by the incremental decisions; has to be called
+        after self.correlated_sensor_matrix, self.independence_matrix or
+        self.pattern_pair_table are modified in place
+        '''
+        self.__extended_decision_cache = None
+
     def monitor_sensors_extended(self, data, timestamps, window_size=-1):
         '''Returns a list of anomalous sensors, namely sensors for which the following holds:
         1. they exhibit one of the patterns that we are looking for and
@@ -148,39 +512,11 @@ class SFDD(object):
                        correlations between sensors (default -1)
 
         '''
-        # we find which patterns are exhibited by the sensors
-        patterns = self.__calculate_patterns(data, timestamps)
-
-        anomalous_sensors = list()
-        for i, sensor in enumerate(self.sensor_names):
-            # we skip the current sensor if it does not seem
-            # to exhibit any of the patterns we are looking for
-            if not np.any(patterns[i]):
-                continue
-
-            correlated_sensor_idx = self.correlated_sensor_indices[sensor]
-
-            # patterns are mutually exclusive, so there can be
-            # only one pattern active at a time
-            active_pattern_idx = int(np.where(patterns[i])[0][0])
-
-            # we check if any of the patterns exhibited by the current sensor
-            # appears together with a pattern exhibited by any of the correlated sensors
-            # that depend on independent components; the sensor is considered anomalous
-            # if that is not the case
-            for j in correlated_sensor_idx:
-                if j not in self.independent_sensors[sensor] or not np.any(patterns[j]):
-                    continue
-
-                active_corr_sensor_pattern_idx = int(np.where(patterns[j])[0][0])
-                corr_sensor_name = self.sensor_names[j]
-                pattern_tuple = [active_pattern_idx,
-                                 corr_sensor_name,
-                                 active_corr_sensor_pattern_idx]
-                if pattern_tuple not in self.sensor_pattern_pairs[sensor]:
-                    anomalous_sensors.append(sensor)
-                    break
-        return anomalous_sensors
+        with self.__stage('window'):
+            # we find which patterns are exhibited by the sensors
+            with self.__stage('patterns'):
+                patterns = self.__calculate_patterns(data, timestamps)
+            return self.__extended_decisions(patterns)
 
     def monitor_sensors_basic(self, data, timestamps, window_size=-1):
         '''Returns a list of anomalous sensors, namely sensors for which the following holds:
@@ -202,55 +538,655 @@ class SFDD(object):
         correlation_data = data[0:window_size]
         investigated_data = data[window_size:]
 
-        # we find all pairwise correlations between the sensor measurements
-        # and take their absolute values since we are only interested
-        # in the magnitude of the correlations, not their signs
-        correlations = np.abs(CorrelationLibrary.pearson(correlation_data))
+        with self.__stage('window'):
+            # we find which patterns are exhibited by the sensors
+            with self.__stage('patterns'):
+                patterns = self.__calculate_patterns(investigated_data, timestamps)
 
-        nan_rows, nan_cols = np.where(np.isnan(correlations))
-        correlations[nan_rows, nan_cols] = 1.
+            # we find which patterns are also exhibited by correlated independent sensors
+            with self.__stage('correlation'):
+                if self.sparse_correlations:
+                    confirmed = self.__sparse_confirmed_patterns(correlation_data, patterns)
+                else:
+                    # we find all pairwise correlations between the sensor measurements
+                    # and take their absolute values since we are only interested
+                    # in the magnitude of the correlations, not their signs
+                    correlations = np.abs(CorrelationLibrary.pearson(correlation_data))
 
-        # we find which patterns are exhibited by the sensors
-        patterns = self.__calculate_patterns(investigated_data, timestamps)
+                    nan_rows, nan_cols = np.where(np.isnan(correlations))
+                    correlations[nan_rows, nan_cols] = 1.
+                    confirmed = self.__window_confirmed_patterns(patterns, correlations)
 
-        anomalous_sensors = list()
-        for i, sensor in enumerate(self.sensor_names):
-            # we skip the current sensor if it does not seem
-            # to exhibit any of the patterns we are looking for
-            if not np.any(patterns[i]):
-                self.sensor_working[sensor] = True
-                continue
+            return self.__basic_decisions(patterns, confirmed)
+
+    def detect_log(self, data, timestamps, window_size, mode='basic', chunk_size=None,
+                   return_patterns=False):
+        '''Runs the monitoring on every window of a recorded log and returns a tuple
+        (faults, end_times), where "faults" is a Boolean numpy array of shape
+        (num_windows, num_sensors) whose rows are the results of the corresponding
+        monitoring method called on the window data[i:i+window_size] and "end_times"
+        contains the timestamps of the last measurement of each window.
+
+        The windows are strided views of the log, and the patterns, correlations
+        and decisions are evaluated for chunks of windows at a time. In the basic mode,
+        the state of self.sensor_working is carried over between windows as if the
+        windows were passed to "monitor_sensors_basic" one after the other.
+
+        Keyword arguments:
+        data -- an m x n numpy array in which the columns represent sensors and
+                the rows are sensor measurements in m consecutive time steps
+                (or a "CompactLog", which is read one chunk at a time)
+        timestamps -- a numpy array with the m timestamps at which the measurements were taken
+        window_size -- number of measurements in a window
+        mode -- 'basic' or 'extended' (default 'basic')
+        chunk_size -- number of windows evaluated at once; chosen automatically
+                      so that a chunk takes a few tens of megabytes if not given
+        return_patterns -- if True, a num_windows x num_sensors x self.pattern_count
+                           Boolean numpy array with the patterns exhibited by the sensors
+                           in each window is returned as a third element; in the compact
+                           mode, a num_windows x num_sensors numpy array of pattern codes
+                           is returned instead (default False)
+
+        '''
+        if mode not in ('basic', 'extended'):
+            raise ValueError('Unknown monitoring mode {0}'.format(mode))
+
+        sensor_count = len(self.sensor_names)
+        if not isinstance(data, CompactLog):
+            data = np.asarray(data, dtype=float)
+        timestamps = np.asarray(timestamps, dtype=float)
+        if data.shape[1] < sensor_count:
+            raise ValueError('The data contain fewer columns than there are sensors')
 
-            correlated_sensor_idx = set(np.where(correlations[i] > self.correlation_threshold)[0])
-            active_pattern_indices = np.where(patterns[i])[0]
+        window_count = max(data.shape[0] - window_size + 1, 0)
+        faults = np.zeros((window_count, sensor_count), dtype=bool)
+        end_times = timestamps[window_size-1:window_size-1+window_count].copy()
+        window_patterns = None
+        if return_patterns and self.compact:
+            window_patterns = np.zeros((window_count, sensor_count),
+                                       dtype=PatternCodes.dtype(self.pattern_count))
+        elif return_patterns:
+            window_patterns = np.zeros((window_count, sensor_count, self.pattern_count),
+                                       dtype=bool)
+        if window_count == 0:
+            return (faults, end_times, window_patterns) if return_patterns else (faults, end_times)
 
-            # we check if any of the patterns exhibited by the current sensor
-            # are also exhibited by any of the correlated sensors that depend on
-            # independent components; the sensor is considered anomalous if that is the case
-            for pattern_idx in active_pattern_indices:
-                # we get the indices of all sensors that exhibit the same pattern
-                pattern_sensors = set(np.where(patterns[:, pattern_idx])[0])
+        if chunk_size is None:
+            chunk_size = self.__default_chunk_size(window_size)
 
-                # we find the indices of the correlated sensors that exhibit the same pattern
-                correlated_pattern_sensors = set(correlated_sensor_idx).intersection(pattern_sensors)
+        working = self.working_state.copy()
+        for start in range(0, window_count, chunk_size):
+            end = min(start + chunk_size, window_count)
+            windows, window_timestamps = self.__log_windows(data, timestamps, window_size,
+                                                            start, end)
+            if mode == 'basic':
+                working_history, patterns = self.__detect_basic_chunk(windows, window_timestamps,
+                                                                      working)
+                faults[start:end] = ~working_history
+                working = working_history[-1]
+            else:
+                with self.__stage('patterns'):
+                    patterns = self.__calculate_patterns_batch(windows, window_timestamps)
+                with self.__stage('decisions'):
+                    faults[start:end] = self.__extended_decisions_batch(patterns)
+                self.__record_windows(faults[start:end], patterns)
 
-                # if none of the correlated sensors that exhibit the same pattern
-                # depend on other components, the current sensor is considered anomalous
-                if not correlated_pattern_sensors.intersection(self.independent_sensors[sensor]):
-                    self.sensor_working[sensor] = not self.sensor_working[sensor]
-                    break
+            if return_patterns:
+                window_patterns[start:end] = PatternCodes.encode(patterns) if self.compact \
+                                             else patterns
+        if mode == 'basic':
+            self.working_state[:] = working
+        return (faults, end_times, window_patterns) if return_patterns else (faults, end_times)
+
+    def compact_log(self, data, timestamps, window_size, mode='basic'):
+        '''Returns a "CompactLog" with the measurements of a recorded log in single precision,
+        in which the columns whose patterns (or, in the basic mode, whose correlated
+        sensors) would be changed by the reduced precision (in the windows of the given
+        size and mode) are kept in double precision;
+        the returned log can be passed to "detect_log" instead of "data"
+
+        Keyword arguments:
+        data -- an m x n numpy array in which the columns represent sensors and
+                the rows are sensor measurements in m consecutive time steps
+        timestamps -- a numpy array with the m timestamps at which the measurements were taken
+        window_size -- number of measurements in a window
+        mode -- 'basic' or 'extended' (default 'basic')
+
+        '''
+        # in the basic mode, the patterns are looked for in the second part of the window,
+        # but the slopes use the first timestamps of the window; the correlations of the
+        # first part of the window are only compared for structurally independent sensors
+        correlation_size = int(window_size / 2) if mode == 'basic' else 0
+        data = np.asarray(data, dtype=float)[:, 0:len(self.sensor_names)]
+        return CompactLog(timestamps, data, self.pattern_registry, (correlation_size,),
+                          correlation_size=correlation_size,
+                          correlation_threshold=self.correlation_threshold,
+                          correlation_mask=self.independence_matrix)
+
+    def evaluate_windows(self, windows, window_timestamps, working=None, mode='basic'):
+        '''Evaluates c unrelated windows (e.g. the current windows of different robots
+        monitored with the same model) at once, without changing the state of the manager.
+        In the basic mode, returns a c x n Boolean numpy array with the working state
+        of the sensors after each window, where window i starts from the state working[i];
+        in the extended mode, returns a c x n Boolean numpy array specifying
+        the anomalous sensors in each window.
+
+        Keyword arguments:
+        windows -- a c x m x n numpy array of windows, each of which is evaluated
+                   as in the corresponding monitoring method
+        window_timestamps -- a c x m numpy array with the timestamps of the windows
+        working -- a c x n Boolean numpy array with the working state of the sensors
+                   before each window; required in the basic mode (default None)
+        mode -- 'basic' or 'extended' (default 'basic')
+
+        '''
+        if mode not in ('basic', 'extended'):
+            raise ValueError('Unknown monitoring mode {0}'.format(mode))
+
+        sensor_count = len(self.sensor_names)
+        windows = np.asarray(windows, dtype=float)[:, :, 0:sensor_count]
+        window_timestamps = np.asarray(window_timestamps, dtype=float)
+        if mode == 'extended':
+            with self.__stage('patterns'):
+                patterns = self.__calculate_patterns_batch(windows, window_timestamps)
+            with self.__stage('decisions'):
+                anomalous = self.__extended_decisions_batch(patterns)
+            self.__record_windows(anomalous, patterns)
+            return anomalous
+
+        if working is None:
+            raise ValueError('The working state of the sensors is required in the basic mode')
+
+        # the decisions of a sensor only depend on its own state, so the windows
+        # are evaluated as a single window in which every (window, sensor) pair
+        # is treated as a separate sensor
+        patterns, confirmed = self.__basic_window_evidence(windows, window_timestamps)
+        window_count = patterns.shape[0]
+        with self.__stage('decisions'):
+            working = self.__basic_decisions_batch(
+                patterns.reshape(1, window_count * sensor_count, self.pattern_count),
+                confirmed.reshape(1, window_count * sensor_count, self.pattern_count),
+                np.asarray(working, dtype=bool).reshape(-1))[0]
+            working = working.reshape(window_count, sensor_count)
+        self.__record_windows(~working, patterns)
+        return working
+
+    def decide_basic(self, patterns, correlations, working, correlation_threshold=None,
+                     sensor_indices=None):
+        '''Returns a c x n Boolean numpy array with the working state of the sensors
+        after each of c consecutive windows with precomputed patterns and correlations,
+        starting from the state "working"; the decisions are the ones of
+        "monitor_sensors_basic", but self.sensor_working is not modified
+
+        Keyword arguments:
+        patterns -- a c x n x self.pattern_count Boolean numpy array of window patterns
+        correlations -- a c x n x n numpy array with the absolute sensor correlations
+                        of each window, in which undefined correlations are set to 1
+        working -- a Boolean numpy array with the working state of the sensors before the first window
+        correlation_threshold -- threshold used instead of self.correlation_threshold (default None)
+        sensor_indices -- if given, only the decisions of these s sensors are made; "correlations"
+                          then only contains their rows (c x s x n), "working" has s elements
+                          and a c x s array is returned (default None)
+
+        '''
+        sensor_count = len(self.sensor_names)
+        patterns = patterns[:, 0:sensor_count]
+        if sensor_indices is None:
+            confirmed = self.__confirmed_patterns(patterns, correlations, correlation_threshold)
+            sensor_patterns = patterns
+        else:
+            if correlation_threshold is None:
+                correlation_threshold = self.correlation_threshold
+            correlated_independent = (correlations[..., 0:sensor_count] > correlation_threshold) & \
+                                     self.independence_matrix[sensor_indices]
+            confirmed = np.matmul(correlated_independent, patterns)
+            sensor_patterns = patterns[:, sensor_indices]
+        return self.__basic_decisions_batch(sensor_patterns, confirmed,
+                                            np.asarray(working, dtype=bool))
+
+    def decide_extended(self, patterns, correlated_sensor_matrix=None, pattern_pair_table=None,
+                        sensor_indices=None):
+        '''Returns a c x n Boolean numpy array specifying the anomalous sensors
+        in each of c windows with precomputed patterns, as in "monitor_sensors_extended"
+
+        Keyword arguments:
+        patterns -- a c x n x self.pattern_count Boolean numpy array of window patterns
+        correlated_sensor_matrix -- correlated sensors used instead of
+                                    self.correlated_sensor_matrix (default None)
+        pattern_pair_table -- pattern pairs used instead of self.pattern_pair_table (default None)
+        sensor_indices -- if given, only the decisions of these s sensors are made
+                          and a c x s array is returned (default None)
+
+        '''
+        return self.__extended_decisions_batch(patterns[:, 0:len(self.sensor_names)],
+                                               correlated_sensor_matrix, pattern_pair_table,
+                                               sensor_indices)
+
+    def start_stream(self, window_size, mode='basic'):
+        '''Prepares the streaming interface ("push") for monitoring
+        with windows of "window_size" measurements
+
+        Keyword arguments:
+        window_size -- number of measurements in a window
+        mode -- 'basic' for the decisions of "monitor_sensors_basic" (using the first half
+                of each window for the correlations) or 'extended' for the decisions
+                of "monitor_sensors_extended" (default 'basic')
+
+        '''
+        if mode not in ('basic', 'extended'):
+            raise ValueError('Unknown monitoring mode {0}'.format(mode))
+        self.__stream_mode = mode
+        self.__stream_window_size = window_size
+        self.__stream = None
+
+    def push(self, timestamp, sample):
+        '''Adds a single measurement vector to the stream started with "start_stream"
+        and returns a list of anomalous sensors; the result is the same as the one
+        of the corresponding monitoring method called on the current window,
+        but only a constant amount of work per sensor is done for the patterns
+        and the correlations are updated incrementally. An empty list is returned
+        until the stream contains a full window.
+
+        Keyword arguments:
+        timestamp -- time at which the measurements were taken
+        sample -- a numpy array with one measurement per column of the monitored data
+
+        '''
+        if self.__stream_window_size is None:
+            raise RuntimeError('start_stream has to be called before push')
+
+        # the ring buffer is allocated once the number of columns is known; the patterns
+        # are only tracked incrementally if the registry contains the stuck-at and drift
+        # detectors of "PatternLibrary", with the thresholds given in the registry
+        if self.__stream is None:
+            window_size = self.__stream_window_size
+            correlation_size = int(window_size / 2) if self.__stream_mode == 'basic' else 0
+            self.__stream_thresholds = RunningPatterns.registry_thresholds(self.pattern_registry)
+            self.__stream = SampleStream(len(sample), window_size, correlation_size,
+                                         track_correlations=not self.sparse_correlations,
+                                         pattern_thresholds=self.__stream_thresholds)
+
+        stream = self.__stream
+        with self.__stage('window'):
+            with self.__stage('ingest'):
+                stream.push(timestamp, sample)
+            if not stream.is_full():
+                return list()
+
+            with self.__stage('patterns'):
+                if self.__stream_thresholds is not None:
+                    patterns = stream.running_patterns.patterns(self.pattern_registry.names)
+                else:
+                    # the patterns of other detectors are looked for in the whole pattern
+                    # part of the window, using the first timestamps of the window
+                    window, window_timestamps = stream.window()
+                    patterns = self.pattern_registry.evaluate(window[stream.correlation_size:],
+                                                              window_timestamps)
+
+            if self.__stream_mode == 'extended':
+                return self.__extended_decisions(patterns)
+
+            with self.__stage('correlation'):
+                if self.sparse_correlations:
+                    confirmed = self.__sparse_confirmed_patterns(stream.correlation_data(),
+                                                                 patterns)
                 else:
-                    self.sensor_working[sensor] = True
+                    correlations = np.abs(stream.correlations())
+                    nan_rows, nan_cols = np.where(np.isnan(correlations))
+                    correlations[nan_rows, nan_cols] = 1.
+                    confirmed = self.__window_confirmed_patterns(patterns, correlations)
+            return self.__basic_decisions(patterns, confirmed)
+
+    def __extended_decisions(self, patterns):
+        '''Returns a list of sensors whose patterns have not been observed
+        together with the patterns of their correlated independent sensors
+        in the fault-free data set (see "monitor_sensors_extended")
+
+        Keyword arguments:
+        patterns -- an n x self.pattern_count Boolean numpy array representing
+                    the patterns exhibited by the sensors
+
+        '''
+        sensor_count = len(self.sensor_names)
+        with self.__stage('decisions'):
+            if self.incremental_decisions:
+                anomalous = self.__incremental_extended_decisions(patterns[0:sensor_count])
+            else:
+                anomalous = self.__extended_decisions_batch(patterns[np.newaxis,
+                                                                     0:sensor_count])[0]
+        self.__record_windows(anomalous, patterns)
+        self.__set_window_patterns(patterns[0:sensor_count])
+        return [sensor for i, sensor in enumerate(self.sensor_names) if anomalous[i]]
+
+    def __basic_decisions(self, patterns, confirmed):
+        '''Updates self.sensor_working given the patterns exhibited by the sensors
+        and the patterns confirmed by their correlated independent sensors and
+        returns a list of the sensors that are currently considered anomalous
+        (see "monitor_sensors_basic")
+
+        Keyword arguments:
+        patterns -- an n x self.pattern_count Boolean numpy array representing
+                    the patterns exhibited by the sensors
+        confirmed -- an n x self.pattern_count Boolean numpy array in which the element (i, p)
+                     is True if a correlated independent sensor of sensor i exhibits pattern p
 
-        for sensor in self.sensor_names:
-            if not self.sensor_working[sensor]:
-                anomalous_sensors.append(sensor)
+        '''
+        sensor_count = len(self.sensor_names)
+        with self.__stage('decisions'):
+            working = self.__basic_decisions_batch(patterns[np.newaxis, 0:sensor_count],
+                                                   confirmed[np.newaxis, 0:sensor_count],
+                                                   self.working_state)[0]
+            self.working_state[:] = working
+            anomalous_sensors = [sensor for i, sensor in enumerate(self.sensor_names)
+                                 if not working[i]]
+        self.__record_windows(~working, patterns)
+        self.__set_window_patterns(patterns[0:sensor_count])
         return anomalous_sensors
 
+    def __detect_basic_chunk(self, windows, window_timestamps, working):
+        '''Returns a tuple (working_history, patterns), where "working_history" is
+        a c x n Boolean numpy array with the values of self.sensor_working after each
+        of c consecutive windows evaluated as in "monitor_sensors_basic" and "patterns"
+        contains the patterns exhibited by the sensors in the windows
+
+        Keyword arguments:
+        windows -- a c x m x n numpy array of windows
+        window_timestamps -- a c x m numpy array with the timestamps of the windows
+        working -- a Boolean numpy array with the working state of the sensors before the first window
+
+        '''
+        patterns, confirmed = self.__basic_window_evidence(windows, window_timestamps)
+        with self.__stage('decisions'):
+            working_history = self.__basic_decisions_batch(patterns, confirmed, working)
+        self.__record_windows(~working_history, patterns)
+        return working_history, patterns
+
+    def __basic_window_evidence(self, windows, window_timestamps):
+        '''Returns a tuple (patterns, confirmed) of c x n x self.pattern_count Boolean
+        numpy arrays with the patterns exhibited by the sensors in each of c windows
+        and the patterns confirmed by their correlated independent sensors
+        (see "__confirmed_patterns"); as in "monitor_sensors_basic", the first half
+        of each window is used for the correlations
+
+        Keyword arguments:
+        windows -- a c x m x n numpy array of windows
+        window_timestamps -- a c x m numpy array with the timestamps of the windows
+
+        '''
+        correlation_size = int(windows.shape[1] / 2)
+        with self.__stage('patterns'):
+            patterns = self.__calculate_patterns_batch(windows[:, correlation_size:],
+                                                       window_timestamps)
+
+        with self.__stage('correlation'):
+            if self.sparse_correlations:
+                confirmed = np.zeros((patterns.shape[0], len(self.sensor_names),
+                                      self.pattern_count), dtype=bool)
+                for w in range(windows.shape[0]):
+                    confirmed[w] = self.__sparse_confirmed_patterns(windows[w, 0:correlation_size],
+                                                                    patterns[w])
+            else:
+                correlations = np.abs(CorrelationLibrary.pearson_batch(windows[:, 0:correlation_size]))
+                correlations[np.isnan(correlations)] = 1.
+                confirmed = self.__confirmed_patterns(patterns, correlations)
+        return patterns, confirmed
+
+    def __confirmed_patterns(self, patterns, correlations, correlation_threshold=None):
+        '''Returns a Boolean numpy array of the same shape as "patterns" in which
+        the element (..., i, p) is True if a correlated independent sensor
+        of sensor i exhibits pattern p
+
+        Keyword arguments:
+        patterns -- an n x self.pattern_count or c x n x self.pattern_count
+                    Boolean numpy array of window patterns
+        correlations -- an n x n or c x n x n numpy array with the absolute sensor correlations
+        correlation_threshold -- threshold used instead of self.correlation_threshold (default None)
+
+        '''
+        if correlation_threshold is None:
+            correlation_threshold = self.correlation_threshold
+
+        sensor_count = len(self.sensor_names)
+        correlated_independent = (correlations[..., 0:sensor_count, 0:sensor_count] >
+                                  correlation_threshold) & self.independence_matrix
+        return np.matmul(correlated_independent, patterns[..., 0:sensor_count, :])
+
+    def __window_confirmed_patterns(self, patterns, correlations):
+        '''Returns the patterns confirmed by correlated independent sensors in a single
+        window (see "__confirmed_patterns"). If incremental decisions are enabled,
+        only the rows of the sensors that exhibit a pattern are computed, since the
+        decisions of the other sensors do not depend on the confirmed patterns,
+        and only the correlations between these sensors are compared to the threshold.
+
+        Keyword arguments:
+        patterns -- an n x self.pattern_count Boolean numpy array of window patterns
+        correlations -- an n x n numpy array with the absolute sensor correlations
+
+        '''
+        if not self.incremental_decisions:
+            return self.__confirmed_patterns(patterns, correlations)
+
+        sensor_count = len(self.sensor_names)
+        patterns = patterns[0:sensor_count]
+        confirmed = np.zeros(patterns.shape, dtype=bool)
+        pattern_sensors = np.where(patterns.any(axis=1))[0]
+        if pattern_sensors.size > 0:
+            block = np.ix_(pattern_sensors, pattern_sensors)
+            correlated_independent = (correlations[block] > self.correlation_threshold) & \
+                                     self.independence_matrix[block]
+            confirmed[pattern_sensors] = np.matmul(correlated_independent,
+                                                   patterns[pattern_sensors])
+        return confirmed
+
+    def __incremental_extended_decisions(self, patterns):
+        '''Returns the same array as "__extended_decisions_batch" for a single window,
+        but only evaluates the sensors whose active pattern changed since the previous
+        window and the sensors to which they are correlated
+
+        Keyword arguments:
+        patterns -- an n x self.pattern_count Boolean numpy array of window patterns
+
+        '''
+        has_pattern = patterns.any(axis=1)
+        active_pattern = np.argmax(patterns, axis=1)
+
+        # the cache is discarded by "invalidate_decision_caches" whenever the model changes
+        cache = self.__extended_decision_cache
+        if cache is None:
+            correlated = self.correlated_sensor_matrix & self.independence_matrix
+            dirty = np.ones(patterns.shape[0], dtype=bool)
+            anomalous = np.zeros(patterns.shape[0], dtype=bool)
+        else:
+            correlated, previous_has_pattern, previous_active_pattern, anomalous = cache
+            changed = (has_pattern != previous_has_pattern) | \
+                      (active_pattern != previous_active_pattern)
+            dirty = changed | correlated[:, changed].any(axis=1)
+
+        if dirty.any():
+            anomalous = anomalous.copy()
+            rows = np.where(dirty)[0]
+            sensor_idx = np.arange(patterns.shape[0])
+            known_pairs = self.pattern_pair_table[rows[:, np.newaxis],
+                                                  active_pattern[rows][:, np.newaxis],
+                                                  sensor_idx[np.newaxis, :],
+                                                  active_pattern[np.newaxis, :]]
+            unknown_pairs = correlated[rows] & has_pattern[np.newaxis, :] & ~known_pairs
+            anomalous[rows] = has_pattern[rows] & unknown_pairs.any(axis=1)
+
+        self.__extended_decision_cache = (correlated, has_pattern, active_pattern, anomalous)
+        return anomalous
+
+    def __sparse_confirmed_patterns(self, correlation_data, patterns):
+        '''Returns the same array as "__confirmed_patterns", but only calculates
+        the correlations between the independent sensors that exhibit the same pattern
+
+        Keyword arguments:
+        correlation_data -- an m x n numpy array with the measurements used for the correlations
+        patterns -- an n x self.pattern_count Boolean numpy array of window patterns
+
+        '''
+        sensor_count = len(self.sensor_names)
+        confirmed = np.zeros((sensor_count, patterns.shape[1]), dtype=bool)
+        for p in range(patterns.shape[1]):
+            pattern_sensors = np.where(patterns[0:sensor_count, p])[0]
+            if pattern_sensors.size < 2:
+                continue
+
+            indptr, _ = CorrelationLibrary.correlated_pairs(
+                correlation_data[:, pattern_sensors], self.correlation_threshold,
+                mask=self.independence_matrix[np.ix_(pattern_sensors, pattern_sensors)])
+            confirmed[pattern_sensors, p] = np.diff(indptr) > 0
+        return confirmed
+
+    def __basic_decisions_batch(self, patterns, confirmed, working):
+        '''Returns a c x n Boolean numpy array with the values of self.sensor_working
+        after each of c consecutive windows evaluated as in "monitor_sensors_basic"
+
+        Keyword arguments:
+        patterns -- a c x n x self.pattern_count Boolean numpy array of window patterns
+        confirmed -- a c x n x self.pattern_count Boolean numpy array in which the element
+                     (w, i, p) is True if a correlated independent sensor of sensor i
+                     exhibits pattern p in window w (see "__confirmed_patterns")
+        working -- a Boolean numpy array with the working state of the sensors before the first window
+
+        '''
+        failed = patterns & ~confirmed
+
+        # as in "__basic_decisions", the active patterns are checked in order; the state
+        # is toggled if the first active pattern is not confirmed, set to False if a later
+        # active pattern is not confirmed and set to True if all of them are confirmed
+        any_failed = failed.any(axis=2)
+        first_failed = np.argmax(failed, axis=2)
+        active_before = np.cumsum(patterns, axis=2) - patterns
+        earlier_confirmed = np.take_along_axis(active_before, first_failed[..., np.newaxis],
+                                               axis=2)[..., 0] > 0
+        toggle = any_failed & ~earlier_confirmed
+        reset_value = ~any_failed
+
+        # the state after window w is the value of the last reset before w,
+        # negated once for each toggle since that reset
+        window_indices = np.arange(patterns.shape[0])[:, np.newaxis]
+        last_reset = np.maximum.accumulate(np.where(~toggle, window_indices, -1), axis=0)
+        toggle_counts = np.cumsum(toggle, axis=0)
+        sensor_indices = np.arange(toggle.shape[1])[np.newaxis]
+        reset_toggle_counts = np.where(last_reset >= 0,
+                                       toggle_counts[np.maximum(last_reset, 0), sensor_indices], 0)
+        base_value = np.where(last_reset >= 0,
+                              reset_value[np.maximum(last_reset, 0), sensor_indices],
+                              working[np.newaxis])
+        return base_value ^ ((toggle_counts - reset_toggle_counts) % 2 == 1)
+
+    def __extended_decisions_batch(self, patterns, correlated_sensor_matrix=None,
+                                   pattern_pair_table=None, sensor_indices=None):
+        '''Returns a c x n Boolean numpy array specifying which sensors are
+        considered anomalous in each of c windows by "monitor_sensors_extended"
+
+        Keyword arguments:
+        patterns -- a c x n x self.pattern_count Boolean numpy array of window patterns
+        correlated_sensor_matrix -- correlated sensors used instead of
+                                    self.correlated_sensor_matrix (default None)
+        pattern_pair_table -- pattern pairs used instead of self.pattern_pair_table (default None)
+        sensor_indices -- if given, only the decisions of these sensors are made (default None)
+
+        '''
+        if correlated_sensor_matrix is None:
+            correlated_sensor_matrix = self.correlated_sensor_matrix
+        if pattern_pair_table is None:
+            pattern_pair_table = self.pattern_pair_table
+
+        sensor_count = len(self.sensor_names)
+        has_pattern = patterns.any(axis=2)
+
+        # patterns are mutually exclusive, so only the first active one is considered
+        active_pattern = np.argmax(patterns, axis=2)
+
+        sensor_idx = np.arange(sensor_count)
+        row_idx = sensor_idx if sensor_indices is None else sensor_idx[sensor_indices]
+        correlated = correlated_sensor_matrix[row_idx] & self.independence_matrix[row_idx]
+
+        # a single gather gives, for every window and sensor pair (i, j),
+        # whether the current pattern pair of i and j is a known one
+        known_pairs = pattern_pair_table[row_idx[np.newaxis, :, np.newaxis],
+                                         active_pattern[:, row_idx, np.newaxis],
+                                         sensor_idx[np.newaxis, np.newaxis, :],
+                                         active_pattern[:, np.newaxis, :]]
+        unknown_pairs = correlated[np.newaxis] & has_pattern[:, np.newaxis, :] & ~known_pairs
+        return has_pattern[:, row_idx] & unknown_pairs.any(axis=2)
+
+    def __stage(self, name):
+        '''Returns a context manager timing the processing stage "name"
+        if the instrumentation is enabled and a no-op one otherwise
+
+        Keyword arguments:
+        name -- name of a processing stage
+
+        '''
+        if self.instrumentation is None:
+            return NULL_STAGE
+        return self.instrumentation.stage(name)
+
+    def __record_windows(self, anomalous, patterns):
+        '''Passes the results of one or more windows to the instrumentation if it is enabled
+
+        Keyword arguments:
+        anomalous -- a Boolean numpy array of shape (n,) or (c, n) specifying
+                     the sensors flagged as anomalous
+        patterns -- a Boolean numpy array with the corresponding sensor patterns
+
+        '''
+        if self.instrumentation is not None:
+            self.instrumentation.record_windows(anomalous, patterns)
+
+    def __log_windows(self, data, timestamps, window_size, start, end):
+        '''Returns a tuple (windows, window_timestamps) of strided views with the windows
+        start, ..., end - 1 of a log, of shape c x window_size x n and c x window_size;
+        the windows only contain the columns that correspond to sensors
+
+        Keyword arguments:
+        data -- an m x n numpy array or a "CompactLog" with the measurements of the log
+        timestamps -- a numpy array with the m timestamps of the log
+        window_size -- number of measurements in a window
+        start -- index of the first window
+        end -- index after the last window
+
+        '''
+        sensor_count = len(self.sensor_names)
+        end_row = end + window_size - 1
+        if isinstance(data, CompactLog):
+            chunk_data = data.read(start, end_row, sensor_count)
+        else:
+            chunk_data = data[start:end_row, 0:sensor_count]
+        windows = np.lib.stride_tricks.sliding_window_view(chunk_data, window_size, axis=0)
+        window_timestamps = np.lib.stride_tricks.sliding_window_view(timestamps[start:end_row],
+                                                                     window_size)
+        return windows.transpose(0, 2, 1), window_timestamps
+
+    def __set_window_patterns(self, patterns):
+        '''Stores the patterns of the last window in self.window_patterns,
+        as pattern codes in the compact mode
+
+        Keyword arguments:
+        patterns -- an n x self.pattern_count Boolean numpy array
+
+        '''
+        self.window_patterns = PatternCodes.encode(patterns) if self.compact else patterns
+
+    def __default_chunk_size(self, window_size):
+        '''Returns the number of windows that are evaluated at once in the batch methods,
+        chosen so that the per-chunk arrays take a few tens of megabytes
+
+        Keyword arguments:
+        window_size -- number of measurements in a window
+
+        '''
+        sensor_count = len(self.sensor_names)
+        return max(1, (1 << 22) // (sensor_count * (sensor_count + window_size)))
+
     def __calculate_patterns(self, data, timestamps):
         '''Returns an n x self.pattern_count Boolean numpy array
         in which each row represents a sensor and the columns represent
         whether the sensor exhibits each individual pattern
+        (evaluated with the detectors of self.pattern_registry)
 
         Keyword arguments:
         data -- an m x n numpy array in which the columns represent sensors and
@@ -258,8 +1194,15 @@ class SFDD(object):
         timestamps -- a list of timestamps at which the measurements were taken
 
         '''
-        patterns = np.zeros((data.shape[1], self.pattern_count), dtype=bool)
-        for i, measurements in enumerate(data.T):
-            patterns[i, 0] = PatternLibrary.stuck_at(measurements)
-            patterns[i, 1] = PatternLibrary.drift(measurements, timestamps)
-        return patterns
+        return self.pattern_registry.evaluate(data, timestamps)
+
+    def __calculate_patterns_batch(self, windows, window_timestamps):
+        '''Returns a c x n x self.pattern_count Boolean numpy array with
+        the patterns exhibited by the sensors in each of c windows
+
+        Keyword arguments:
+        windows -- a c x m x n numpy array of windows
+        window_timestamps -- a c x m numpy array with the timestamps of the windows
+
+        '''
+        return self.pattern_registry.evaluate(windows, window_timestamps)
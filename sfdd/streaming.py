@@ -0,0 +1,140 @@
+import numpy as np
+from sfdd.correlation import PearsonAccumulator
+from sfdd.patterns import RunningPatterns
+
+class SampleStream(object):
+    '''A preallocated ring buffer holding the last "window_size" samples of a stream,
+    together with the running state needed for obtaining the patterns and the
+    correlations of the current window in constant time per sample
+
+    As in "SFDD.monitor_sensors_basic", the first "correlation_size" rows
+    of the window are used for calculating correlations and the remaining
+    rows for looking for patterns; the slopes of the patterns are calculated
+    using the first timestamps of the window.
+
+    '''
+    def __init__(self, column_count, window_size, correlation_size=0, track_correlations=True,
+                 pattern_thresholds=None):
+        '''
+        Keyword arguments:
+        column_count -- number of values in each sample
+        window_size -- number of samples in a window
+        correlation_size -- number of samples at the beginning of the window
+                            that are used for calculating correlations (default 0)
+        track_correlations -- if False, no running correlation statistics are kept
+                              and only "correlation_data" is available (default True)
+        pattern_thresholds -- thresholds of the patterns tracked by self.running_patterns
+                              (see "RunningPatterns"); 1e-3 if not given (default None)
+        '''
+        ## number of samples in a window
+        self.window_size = window_size
+
+        ## number of samples used for calculating correlations
+        self.correlation_size = correlation_size
+
+        ## number of samples in which patterns are looked for
+        self.pattern_size = window_size - correlation_size
+
+        ## a window_size x column_count ring buffer with the most recent samples
+        self.measurements = np.zeros((window_size, column_count))
+
+        ## a ring buffer with the timestamps of the samples in self.measurements
+        self.timestamps = np.zeros(window_size)
+
+        ## total number of samples pushed to the stream
+        self.sample_count = 0
+
+        ## a "RunningPatterns" instance tracking the patterns of the last self.pattern_size samples
+        self.running_patterns = RunningPatterns(column_count, self.pattern_size,
+                                                pattern_thresholds)
+
+        ## a "PearsonAccumulator" over the correlation part of the window
+        ## or None if the correlations are not tracked
+        self.accumulator = PearsonAccumulator(column_count) if track_correlations else None
+
+        ## number of incremental correlation updates since the last exact recomputation
+        self.correlation_update_count = 0
+
+        ## per column, the number of consecutive samples of the correlation part
+        ## that are equal to the preceding one; a column is constant in the correlation
+        ## part if all of them are, as with the rule of "CorrelationLibrary.pearson"
+        self.equal_run_lengths = np.zeros(column_count, dtype=int)
+
+    def push(self, timestamp, sample):
+        '''Adds a sample to the stream, overwriting the oldest one
+
+        Keyword arguments:
+        timestamp -- time at which the sample was taken
+        sample -- a numpy array with one measurement per column
+
+        '''
+        t = self.sample_count
+        position = t % self.window_size
+        leaving_sample = self.measurements[position].copy()
+        previous_sample = self.measurements[(t - 1) % self.window_size].copy()
+
+        self.measurements[position] = sample
+        self.timestamps[position] = timestamp
+        self.sample_count += 1
+
+        if t > 0:
+            # the slopes of the pattern part are calculated with the timestamps
+            # self.correlation_size samples earlier, as in "monitor_sensors_basic"
+            time_difference = np.nan
+            if t - self.correlation_size - 1 >= 0 and self.correlation_size + 1 < self.window_size:
+                time_difference = self.timestamps[(t - self.correlation_size) % self.window_size] - \
+                                  self.timestamps[(t - self.correlation_size - 1) % self.window_size]
+            self.running_patterns.update(self.measurements[position] - previous_sample,
+                                         time_difference)
+
+        if self.accumulator is not None and self.correlation_size > 0 and t >= self.pattern_size:
+            entering_sample = self.measurements[(t - self.pattern_size) % self.window_size]
+            if self.accumulator.count > 0:
+                preceding_sample = self.measurements[(t - self.pattern_size - 1) % self.window_size]
+                self.equal_run_lengths += 1
+                self.equal_run_lengths[entering_sample != preceding_sample] = 0
+
+            if self.accumulator.count == 0:
+                self.accumulator.recenter(entering_sample[np.newaxis])
+            elif t >= self.window_size:
+                self.accumulator.replace(leaving_sample, entering_sample)
+                self.correlation_update_count += 1
+            else:
+                self.accumulator.add(entering_sample)
+
+            # the statistics are recomputed exactly once per correlation window
+            # so that the rounding error of the updates does not build up
+            if self.correlation_update_count >= self.correlation_size:
+                self.accumulator.recenter(self.correlation_data())
+                self.correlation_update_count = 0
+
+    def is_full(self):
+        '''Returns True if the stream contains at least "window_size" samples
+        '''
+        return self.sample_count >= self.window_size
+
+    def window(self):
+        '''Returns a copy of the samples currently in the window and their
+        timestamps, ordered from the oldest to the most recent one
+        '''
+        order = np.arange(self.sample_count - self.window_size, self.sample_count) % self.window_size
+        return self.measurements[order], self.timestamps[order]
+
+    def correlation_data(self):
+        '''Returns a copy of the samples in the correlation part of the window
+        '''
+        start = self.sample_count - self.window_size
+        order = np.arange(start, start + self.correlation_size) % self.window_size
+        return self.measurements[order]
+
+    def constant_columns(self):
+        '''Returns a Boolean numpy array specifying the columns whose values
+        are all equal in the correlation part of the window
+        '''
+        return self.equal_run_lengths >= self.correlation_size - 1
+
+    def correlations(self):
+        '''Returns the Pearson correlation matrix of the correlation part of the window;
+        the rows and columns of constant columns are NaN
+        '''
+        return self.accumulator.correlations(self.constant_columns())
@@ -1,6 +1,6 @@
-import oyaml as yaml
-import networkx as nx
-from networkx.algorithms.dag import ancestors
+import json
+import hashlib
+import numpy as np
 
 class ComponentTypeEnum(object):
     '''Constants specifying the component types in a system
@@ -32,19 +32,44 @@ class ComponentParams(object):
 class StructuralModel(object):
     '''A directed graph-based representation of a system's structural model
 
+    A model can be compiled (see "compile") into a frozen .npz file with the sensors,
+    the nodes, the edges and the precomputed ancestor and independence matrices.
+    Loading a compiled model does not parse YAML and does not import networkx;
+    the graph itself is only built when self.structural_model is accessed.
+
     Author -- Alex Mitrevski
     Contact -- aleksandar.mitrevski@h-brs.de, youssef-mahmoud.youssef@h-brs.de
 
     '''
+    ## extension of compiled structural models
+    compiled_extension = '.npz'
+
+    ## version of the compiled model format written by "compile"
+    compiled_format_version = 1
+
     def __init__(self, model_config_path):
         '''
         Keyword arguments:
         structural_model -- a YAML file describing the structural model of a system
+                            or a model compiled with "compile" (recognised by its extension)
         '''
-        model_data = self.__read_model_data(model_config_path)
-
         ## a networkx.DiGraph instance representing a structural model
-        self.structural_model = self.__create_model(model_data)
+        ## (None until it is needed if the model was compiled)
+        self.__graph = None
+
+        ## the fingerprint of the model (None until it is calculated)
+        self.__fingerprint = None
+
+        ## an n x n Boolean numpy array with the independence of self.sensors
+        ## (None if it was not precomputed)
+        self.__sensor_independence = None
+
+        if model_config_path.endswith(self.compiled_extension):
+            self.__load_compiled(model_config_path)
+            return
+
+        model_data = self.__read_model_data(model_config_path)
+        self.__graph = self.__create_model(model_data)
 
         ## a list containing the names of the sensors in the system
         self.sensors = list()
@@ -52,6 +77,83 @@ class StructuralModel(object):
             if component.type == ComponentTypeEnum.SENSOR:
                 self.sensors.append(component.name)
 
+        ## a list with the names of all nodes of the structural model
+        self.nodes = list(self.__graph.nodes())
+
+        ## a dictionary mapping node names to their indices in self.nodes
+        self.node_indices = dict((node, i) for i, node in enumerate(self.nodes))
+
+        ## an e x 2 numpy array with the node indices of the edges (parent, child) of the model
+        self.edges = np.array([[self.node_indices[parent], self.node_indices[child]]
+                               for parent, child in self.__graph.edges()],
+                              dtype=np.int32).reshape(-1, 2)
+
+        ## a Boolean numpy array representing the transitive closure of the model,
+        ## in which the element (i, j) is True if node j is an ancestor of node i
+        self.ancestor_matrix = self.__find_ancestors()
+
+    @property
+    def structural_model(self):
+        '''The networkx.DiGraph instance representing the structural model;
+        for a compiled model, it is built from the stored edges when first accessed
+        '''
+        if self.__graph is None:
+            import networkx as nx
+            graph = nx.DiGraph()
+            graph.add_nodes_from(self.nodes)
+            graph.add_edges_from((self.nodes[parent], self.nodes[child])
+                                 for parent, child in self.edges)
+            self.__graph = graph
+        return self.__graph
+
+    @property
+    def components(self):
+        '''A list with the names of the nodes of the model that are not sensors
+        '''
+        sensors = set(self.sensors)
+        return [node for node in self.nodes if node not in sensors]
+
+    def fingerprint(self):
+        '''Returns a hexadecimal digest identifying the sensors and
+        the edges of the structural model
+        '''
+        if self.__fingerprint is None:
+            edges = sorted((self.nodes[parent], self.nodes[child]) for parent, child in self.edges)
+            model_description = json.dumps({'sensors': self.sensors, 'edges': edges})
+            self.__fingerprint = hashlib.sha1(model_description.encode('utf-8')).hexdigest()
+        return self.__fingerprint
+
+    def compile(self, compiled_model_file_name):
+        '''Writes the model to a frozen, self-contained .npz file that can be loaded
+        by passing its name to the constructor; the file contains the sensor order,
+        the nodes and edges, the fingerprint and the precomputed ancestor matrix
+        and independence matrix of the sensors, with the Boolean arrays stored as packed bits
+
+        Keyword arguments:
+        compiled_model_file_name -- name of the compiled model file
+                                    (has to end with self.compiled_extension)
+
+        '''
+        if not compiled_model_file_name.endswith(self.compiled_extension):
+            raise ValueError('The name of a compiled model has to end with {0}'.format(
+                self.compiled_extension))
+
+        # the independence of the sensors can only be precomputed if all of them are in the graph
+        sensor_independence = np.zeros((0, 0), dtype=bool)
+        if all(sensor in self.node_indices for sensor in self.sensors):
+            sensor_independence = self.independence_matrix(self.sensors)
+
+        with open(compiled_model_file_name, 'wb') as model_file:
+            np.savez(model_file,
+                     format_version=np.array(self.compiled_format_version),
+                     sensors=np.array(self.sensors, dtype=str),
+                     nodes=np.array(self.nodes, dtype=str),
+                     edges=self.edges,
+                     fingerprint=np.array(self.fingerprint()),
+                     ancestor_matrix=np.packbits(self.ancestor_matrix),
+                     sensor_independence_shape=np.array(sensor_independence.shape),
+                     sensor_independence=np.packbits(sensor_independence))
+
     def find_independent_sensors(self, sensor, sensor_list):
         '''Returns a list of names of sensors that do not depend
         on the same component as "sensor"
@@ -61,13 +163,67 @@ class StructuralModel(object):
         sensor_list -- a list of sensor names
 
         '''
-        independent_sensors = list()
-        sensor_ancestors = set(ancestors(self.structural_model, sensor))
-        for other_sensor in sensor_list:
-            other_sensor_ancestors = set(ancestors(self.structural_model, other_sensor))
-            if not sensor_ancestors.intersection(other_sensor_ancestors):
-                independent_sensors.append(other_sensor)
-        return independent_sensors
+        independent = self.independence_matrix([sensor], sensor_list)[0]
+        return [other_sensor for i, other_sensor in enumerate(sensor_list) if independent[i]]
+
+    def independence_matrix(self, sensor_list, other_sensor_list=None):
+        '''Returns a Boolean numpy array in which the element (i, j) is True
+        if the i-th sensor in "sensor_list" and the j-th sensor in "other_sensor_list"
+        do not depend on the same component
+
+        Keyword arguments:
+        sensor_list -- a list of sensor names
+        other_sensor_list -- a list of sensor names; "sensor_list" is used if not given
+
+        '''
+        if other_sensor_list is None:
+            if self.__sensor_independence is not None and list(sensor_list) == self.sensors:
+                return self.__sensor_independence.copy()
+            other_sensor_list = sensor_list
+        sensor_ancestors = self.ancestor_matrix[[self.__node_index(x) for x in sensor_list]]
+        other_sensor_ancestors = self.ancestor_matrix[[self.__node_index(x)
+                                                       for x in other_sensor_list]]
+        # the shared ancestors are counted with a floating point product, which
+        # (unlike a Boolean one) uses BLAS; the counts are exact in float32
+        shared_ancestors = np.dot(sensor_ancestors.astype(np.float32),
+                                  other_sensor_ancestors.T.astype(np.float32))
+        return shared_ancestors == 0
+
+    def __node_index(self, node):
+        '''Returns the index of "node" in self.nodes
+
+        Keyword arguments:
+        node -- name of a node in the structural model
+
+        '''
+        if node not in self.node_indices:
+            raise KeyError('The node {0} is not in the structural model'.format(node))
+        return self.node_indices[node]
+
+    def __find_ancestors(self):
+        '''Returns a Boolean numpy array in which the element (i, j) is True
+        if the j-th node in self.nodes is an ancestor of the i-th node;
+        the ancestors of every node are calculated once, in topological order
+        '''
+        import networkx as nx
+        from networkx.algorithms.dag import ancestors
+
+        node_count = len(self.nodes)
+        ancestor_matrix = np.zeros((node_count, node_count), dtype=bool)
+        if not nx.is_directed_acyclic_graph(self.structural_model):
+            for i, node in enumerate(self.nodes):
+                node_ancestors = [self.node_indices[x]
+                                  for x in ancestors(self.structural_model, node)]
+                ancestor_matrix[i, node_ancestors] = True
+            return ancestor_matrix
+
+        for node in nx.topological_sort(self.structural_model):
+            i = self.node_indices[node]
+            for parent in self.structural_model.predecessors(node):
+                j = self.node_indices[parent]
+                ancestor_matrix[i] |= ancestor_matrix[j]
+                ancestor_matrix[i, j] = True
+        return ancestor_matrix
 
     def __read_model_data(self, model_config_path):
         '''Returns a list of "ComponentParams" objects representing
@@ -94,10 +250,9 @@ class StructuralModel(object):
         file_name -- name of a YAML file
 
         '''
-        file_handle = open(file_name, 'r')
-        data = yaml.load(file_handle)
-        file_handle.close()
-        return data
+        import oyaml as yaml
+        with open(file_name, 'r') as file_handle:
+            return yaml.safe_load(file_handle)
 
     def __create_model(self, components):
         '''Returns a networkx.DiGraph object representing the structural model of
@@ -107,8 +262,42 @@ class StructuralModel(object):
         components -- a list of "ComponentParams" objects representing a set of system components
 
         '''
+        import networkx as nx
         model = nx.DiGraph()
         for component in components:
             for parent in component.parents:
                 model.add_edge(parent, component.name)
         return model
+
+    def __load_compiled(self, compiled_model_file_name):
+        '''Loads a model written by "compile"; raises a ValueError if the stored
+        fingerprint does not match the stored sensors and edges
+
+        Keyword arguments:
+        compiled_model_file_name -- name of the compiled model file
+
+        '''
+        with np.load(compiled_model_file_name) as model_data:
+            if int(model_data['format_version']) != self.compiled_format_version:
+                raise ValueError('Unsupported compiled model format in {0}'.format(
+                    compiled_model_file_name))
+            self.sensors = [str(sensor) for sensor in model_data['sensors']]
+            self.nodes = [str(node) for node in model_data['nodes']]
+            self.node_indices = dict((node, i) for i, node in enumerate(self.nodes))
+            self.edges = model_data['edges']
+            if self.fingerprint() != str(model_data['fingerprint']):
+                raise ValueError('The fingerprint in {0} does not match the model'.format(
+                    compiled_model_file_name))
+
+            node_count = len(self.nodes)
+            self.ancestor_matrix = np.unpackbits(model_data['ancestor_matrix'],
+                                                 count=node_count * node_count)
+            self.ancestor_matrix = self.ancestor_matrix.astype(bool).reshape(node_count,
+                                                                             node_count)
+
+            independence_shape = tuple(model_data['sensor_independence_shape'])
+            if independence_shape == (len(self.sensors), len(self.sensors)):
+                sensor_independence = np.unpackbits(model_data['sensor_independence'],
+                                                    count=int(np.prod(independence_shape)))
+                self.__sensor_independence = sensor_independence.astype(bool).reshape(
+                    independence_shape)
@@ -0,0 +1,308 @@
+'''
+Evaluation of a grid of SFDD parameters (correlation thresholds, window sizes
+and pattern tolerances) on a log with known fault intervals. For every window
+size, the log is traversed once: the correlations and the pattern features
+of each window are calculated once and then evaluated with all candidate
+thresholds and tolerances.
+
+'''
+import itertools
+import numpy as np
+from sfdd.correlation import CorrelationLibrary
+from sfdd.patterns import WindowFeatures
+
+def read_fault_intervals(file_name):
+    '''Returns a list of (sensor, start time, end time) tuples read from a semicolon-separated
+    file whose first line is the header "sensor; start; end"
+
+    Keyword arguments:
+    file_name -- name of the fault interval file
+
+    '''
+    fault_intervals = list()
+    with open(file_name, 'r') as interval_file:
+        interval_file.readline()
+        for line in interval_file:
+            if not line.strip():
+                continue
+            sensor, start_time, end_time = [value.strip() for value in line.split(';')]
+            fault_intervals.append((sensor, float(start_time), float(end_time)))
+    return fault_intervals
+
+class DetectionStatistics(object):
+    '''Detection and false alarm counts of one parameter configuration,
+    accumulated over consecutive chunks of windows
+
+    A (window, sensor) pair is labelled as faulty if the time span of the window
+    overlaps a fault interval of the sensor. A fault interval is detected
+    if the sensor is reported as anomalous in at least one of the windows
+    overlapping the interval; the detection delay is the time between the start
+    of the interval and the end of the first such window.
+
+    '''
+    def __init__(self, fault_count):
+        '''
+        Keyword arguments:
+        fault_count -- number of ground-truth fault intervals
+        '''
+        ## number of faulty (window, sensor) pairs reported as anomalous
+        self.true_positives = 0
+
+        ## number of fault-free (window, sensor) pairs reported as anomalous
+        self.false_positives = 0
+
+        ## number of faulty (window, sensor) pairs that were not reported
+        self.false_negatives = 0
+
+        ## number of fault-free (window, sensor) pairs that were not reported
+        self.true_negatives = 0
+
+        ## per fault interval, the end time of the first window in which it was detected (NaN if not detected)
+        self.detection_times = np.full(fault_count, np.nan)
+
+    def add(self, anomalous, faulty, fault_windows, end_times):
+        '''Adds the decisions of a chunk of windows
+
+        Keyword arguments:
+        anomalous -- a c x n Boolean numpy array with the reported anomalous sensors
+        faulty -- a c x n Boolean numpy array with the ground-truth labels
+        fault_windows -- a list with one (first window, last window + 1, sensor index)
+                         tuple per fault interval, with window indices relative to the chunk
+        end_times -- a numpy array with the end times of the windows
+
+        '''
+        self.true_positives += int(np.count_nonzero(anomalous & faulty))
+        self.false_positives += int(np.count_nonzero(anomalous & ~faulty))
+        self.false_negatives += int(np.count_nonzero(~anomalous & faulty))
+        self.true_negatives += int(np.count_nonzero(~anomalous & ~faulty))
+
+        for k, (first_window, last_window, sensor) in enumerate(fault_windows):
+            if first_window >= last_window or not np.isnan(self.detection_times[k]):
+                continue
+            detections = np.where(anomalous[first_window:last_window, sensor])[0]
+            if detections.size > 0:
+                self.detection_times[k] = end_times[first_window + detections[0]]
+
+    def summary(self, fault_intervals):
+        '''Returns a dictionary with the accumulated counts and the derived rates
+
+        Keyword arguments:
+        fault_intervals -- the list of (sensor index, start time, end time) fault intervals
+
+        '''
+        detected = ~np.isnan(self.detection_times)
+        start_times = np.array([start_time for _, start_time, _ in fault_intervals])
+        delays = np.maximum(self.detection_times[detected] - start_times[detected], 0.) \
+                 if detected.any() else np.zeros(0)
+        return {'true_positives': self.true_positives,
+                'false_positives': self.false_positives,
+                'false_negatives': self.false_negatives,
+                'true_negatives': self.true_negatives,
+                'precision': self.__ratio(self.true_positives,
+                                          self.true_positives + self.false_positives),
+                'recall': self.__ratio(self.true_positives,
+                                       self.true_positives + self.false_negatives),
+                'false_alarm_rate': self.__ratio(self.false_positives,
+                                                 self.false_positives + self.true_negatives),
+                'fault_count': len(fault_intervals),
+                'detected_faults': int(np.count_nonzero(detected)),
+                'detection_rate': self.__ratio(int(np.count_nonzero(detected)),
+                                               len(fault_intervals)),
+                'mean_detection_delay': float(delays.mean()) if delays.size > 0 else None}
+
+    @staticmethod
+    def __ratio(numerator, denominator):
+        '''Returns numerator / denominator or None if the denominator is 0
+        '''
+        return float(numerator) / denominator if denominator > 0 else None
+
+class ParameterSweep(object):
+    '''Evaluates SFDD on a log for all combinations of the given correlation
+    thresholds, window sizes and pattern tolerances
+
+    In the basic mode, the correlations of each window are thresholded against
+    all correlation thresholds at once and the working state of the sensors is
+    tracked separately for every configuration. In the extended mode, the model
+    is trained on a fault-free log for all thresholds in a single pass per window
+    size and pattern tolerance (see "SFDD.find_pattern_pairs").
+
+    '''
+    def __init__(self, sfdd_manager, correlation_thresholds, window_sizes,
+                 pattern_tolerances=None, mode='basic', chunk_size=None):
+        '''
+        Keyword arguments:
+        sfdd_manager -- an "SFDD" instance; only its structural information and
+                        pattern detectors are used, its state is not modified
+        correlation_thresholds -- a list of correlation thresholds
+        window_sizes -- a list of window sizes
+        pattern_tolerances -- an optional list of thresholds passed to all pattern
+                              detectors; the registered thresholds are used if None (default None)
+        mode -- 'basic' or 'extended' (default 'basic')
+        chunk_size -- number of windows evaluated at once (default None, in which
+                      case a chunk takes a few tens of megabytes)
+        '''
+        if mode not in ('basic', 'extended'):
+            raise ValueError('Unknown monitoring mode {0}'.format(mode))
+
+        ## the "SFDD" instance whose structure and pattern detectors are used
+        self.sfdd_manager = sfdd_manager
+
+        ## a list of correlation thresholds
+        self.correlation_thresholds = list(correlation_thresholds)
+
+        ## a list of window sizes
+        self.window_sizes = list(window_sizes)
+
+        ## a list of pattern tolerances (None stands for the registered thresholds)
+        self.pattern_tolerances = [None] if pattern_tolerances is None else list(pattern_tolerances)
+
+        ## monitoring mode ('basic' or 'extended')
+        self.mode = mode
+
+        ## number of windows evaluated at once
+        self.chunk_size = chunk_size
+
+    def run(self, data, timestamps, fault_intervals, training_data=None, training_timestamps=None):
+        '''Returns a list with one dictionary per configuration containing the parameters
+        ('correlation_threshold', 'window_size' and 'pattern_tolerance') and
+        the detection statistics of the configuration (see "DetectionStatistics")
+
+        Keyword arguments:
+        data -- an m x n numpy array with the sensor measurements of the evaluated log
+        timestamps -- a numpy array with the m timestamps of the measurements
+        fault_intervals -- a list of (sensor name, start time, end time) tuples
+                           with the ground-truth faults of the log
+        training_data -- fault-free sensor measurements used for training
+                         in the extended mode (default None)
+        training_timestamps -- timestamps of the training measurements (default None)
+
+        '''
+        if self.mode == 'extended' and training_data is None:
+            raise ValueError('Training data are required in the extended mode')
+
+        sensor_count = len(self.sfdd_manager.sensor_names)
+        data = np.asarray(data, dtype=float)[:, 0:sensor_count]
+        timestamps = np.asarray(timestamps, dtype=float)
+        sensor_indices = dict((sensor, i) for i, sensor in enumerate(self.sfdd_manager.sensor_names))
+        fault_intervals = [(sensor_indices[sensor], start_time, end_time)
+                           for sensor, start_time, end_time in fault_intervals]
+
+        if self.mode == 'extended':
+            training_correlations = np.abs(CorrelationLibrary.pearson(
+                np.asarray(training_data, dtype=float)[:, 0:sensor_count]))
+            training_correlations[np.isnan(training_correlations)] = 1.
+
+            # the correlated sensors for each threshold, as in "SFDD.set_correlations"
+            correlated_sensor_matrices = training_correlations[np.newaxis] > \
+                np.array(self.correlation_thresholds)[:, np.newaxis, np.newaxis]
+            correlated_sensor_matrices[:, np.arange(sensor_count), np.arange(sensor_count)] = False
+
+        results = list()
+        for window_size in self.window_sizes:
+            pattern_pair_tables = None
+            if self.mode == 'extended':
+                pattern_pair_tables = [self.sfdd_manager.find_pattern_pairs(
+                                           training_data, training_timestamps, window_size,
+                                           correlated_sensor_matrices, tolerance)
+                                       for tolerance in self.pattern_tolerances]
+            statistics = self.__sweep_window_size(data, timestamps, window_size, fault_intervals,
+                                                  correlated_sensor_matrices
+                                                  if self.mode == 'extended' else None,
+                                                  pattern_pair_tables)
+            for (tolerance, threshold), configuration_statistics in statistics:
+                result = {'correlation_threshold': threshold,
+                          'window_size': window_size,
+                          'pattern_tolerance': tolerance}
+                result.update(configuration_statistics.summary(fault_intervals))
+                results.append(result)
+        return results
+
+    def __sweep_window_size(self, data, timestamps, window_size, fault_intervals,
+                            correlated_sensor_matrices, pattern_pair_tables):
+        '''Evaluates all thresholds and tolerances for a single window size and returns
+        a list of ((tolerance, threshold), "DetectionStatistics") tuples
+
+        Keyword arguments:
+        data -- an m x n numpy array with the sensor measurements
+        timestamps -- a numpy array with the timestamps of the measurements
+        window_size -- number of measurements in a window
+        fault_intervals -- a list of (sensor index, start time, end time) tuples
+        correlated_sensor_matrices -- in the extended mode, a thresholds x n x n Boolean
+                                      numpy array with the correlated sensors for each threshold
+        pattern_pair_tables -- in the extended mode, a list with one stack
+                               of pattern pair tables per tolerance
+
+        '''
+        sensor_count = data.shape[1]
+        configurations = list(itertools.product(range(len(self.pattern_tolerances)),
+                                                range(len(self.correlation_thresholds))))
+        statistics = [DetectionStatistics(len(fault_intervals)) for _ in configurations]
+
+        window_count = max(data.shape[0] - window_size + 1, 0)
+        if window_count == 0:
+            return self.__label_statistics(configurations, statistics)
+
+        windows = np.lib.stride_tricks.sliding_window_view(data, window_size, axis=0)
+        windows = windows.transpose(0, 2, 1)
+        window_timestamps = np.lib.stride_tricks.sliding_window_view(timestamps, window_size)
+        start_times = timestamps[0:window_count]
+        end_times = timestamps[window_size-1:window_size-1+window_count]
+
+        # the windows overlapping each fault interval form a contiguous range
+        # since the start and end times of the windows are non-decreasing
+        fault_ranges = [(np.searchsorted(end_times, start_time, 'left'),
+                         np.searchsorted(start_times, end_time, 'right'), sensor)
+                        for sensor, start_time, end_time in fault_intervals]
+
+        working = [np.ones(sensor_count, dtype=bool) for _ in configurations]
+        correlation_size = int(window_size / 2)
+        chunk_size = self.chunk_size
+        if chunk_size is None:
+            chunk_size = max(1, (1 << 22) // (sensor_count * (sensor_count + window_size)))
+
+        for start in range(0, window_count, chunk_size):
+            end = min(start + chunk_size, window_count)
+            chunk_windows = windows[start:end]
+
+            faulty = np.zeros((end - start, sensor_count), dtype=bool)
+            fault_windows = list()
+            for first_window, last_window, sensor in fault_ranges:
+                first_window = min(max(first_window - start, 0), end - start)
+                last_window = min(max(last_window - start, 0), end - start)
+                faulty[first_window:last_window, sensor] = True
+                fault_windows.append((first_window, last_window, sensor))
+
+            if self.mode == 'basic':
+                correlations = np.abs(CorrelationLibrary.pearson_batch(
+                    chunk_windows[:, 0:correlation_size]))
+                correlations[np.isnan(correlations)] = 1.
+                features = WindowFeatures(chunk_windows[:, correlation_size:],
+                                          window_timestamps[start:end])
+            else:
+                features = WindowFeatures(chunk_windows, window_timestamps[start:end])
+
+            patterns = [self.sfdd_manager.pattern_registry.evaluate_features(features, tolerance)
+                        for tolerance in self.pattern_tolerances]
+            for c, (t, h) in enumerate(configurations):
+                if self.mode == 'basic':
+                    working_history = self.sfdd_manager.decide_basic(
+                        patterns[t], correlations, working[c], self.correlation_thresholds[h])
+                    working[c] = working_history[-1]
+                    anomalous = ~working_history
+                else:
+                    anomalous = self.sfdd_manager.decide_extended(
+                        patterns[t], correlated_sensor_matrices[h], pattern_pair_tables[t][h])
+                statistics[c].add(anomalous, faulty, fault_windows, end_times[start:end])
+        return self.__label_statistics(configurations, statistics)
+
+    def __label_statistics(self, configurations, statistics):
+        '''Returns a list of ((tolerance, threshold), "DetectionStatistics") tuples
+
+        Keyword arguments:
+        configurations -- a list of (tolerance index, threshold index) tuples
+        statistics -- a list with the "DetectionStatistics" of the configurations
+
+        '''
+        return [((self.pattern_tolerances[t], self.correlation_thresholds[h]),
+                 configuration_statistics)
+                for (t, h), configuration_statistics in zip(configurations, statistics)]
@@ -0,0 +1,157 @@
+import multiprocessing
+import numpy as np
+from sfdd.correlation import PearsonAccumulator
+from sfdd.log_reader import LogReader
+
+## the "SFDD" instance used by the worker processes
+_worker_sfdd = None
+
+## a dictionary with the options of the worker processes
+_worker_options = None
+
+def _initialise_worker(sfdd_manager, options):
+    '''Stores the model and the reading options in the globals of a worker process
+
+    Keyword arguments:
+    sfdd_manager -- an "SFDD" instance
+    options -- a dictionary with the keys "window_size", "column_map",
+               "start_row" and "cache_directory"
+
+    '''
+    global _worker_sfdd, _worker_options
+    _worker_sfdd = sfdd_manager
+    _worker_options = options
+
+def _read_log(log_file_name):
+    '''Returns a tuple (timestamps, data) with the sensor measurements of a log file
+
+    Keyword arguments:
+    log_file_name -- path to a log file
+
+    '''
+    log_reader = LogReader(log_file_name, cache_directory=_worker_options['cache_directory'])
+    timestamps, data = log_reader.read_sensors(_worker_sfdd.sensor_names,
+                                               _worker_options['column_map'])
+    start_row = _worker_options['start_row']
+    return timestamps[start_row:], data[start_row:]
+
+def _correlation_statistics(log_file_name):
+    '''Returns a "PearsonAccumulator" with the sufficient statistics
+    of the measurements in a log file
+
+    Keyword arguments:
+    log_file_name -- path to a log file
+
+    '''
+    _, data = _read_log(log_file_name)
+    accumulator = PearsonAccumulator(data.shape[1])
+    accumulator.recenter(data)
+    return accumulator
+
+def _pattern_pairs(task):
+    '''Returns the pattern pair table of a log file (see "SFDD.find_pattern_pairs")
+
+    Keyword arguments:
+    task -- a tuple (log_file_name, correlated_sensor_matrix)
+
+    '''
+    log_file_name, correlated_sensor_matrix = task
+    _worker_sfdd.correlated_sensor_matrix = correlated_sensor_matrix
+    timestamps, data = _read_log(log_file_name)
+    return _worker_sfdd.find_pattern_pairs(data, timestamps, _worker_options['window_size'])
+
+class TrainingPipeline(object):
+    '''Trains an "SFDD" model on many fault-free log files in a process pool
+
+    Each worker reads one log file at a time and produces mergeable partial
+    results: first the sufficient statistics for the Pearson correlations
+    (counts, sums and cross-products), which are merged into the correlations
+    of the whole training set, and then, given the learned correlations,
+    a partial pattern pair table, which is combined with a logical or.
+    The peak memory use per worker is therefore bounded by a single log file.
+
+    Unlike concatenating the logs into one array, no windows are formed
+    across the boundaries of the log files.
+
+    '''
+    def __init__(self, sfdd_manager, window_size, process_count=None, column_map=None,
+                 start_row=0, cache_directory=None):
+        '''
+        Keyword arguments:
+        sfdd_manager -- an "SFDD" instance that is trained
+        window_size -- number of measurements in a window used for finding patterns
+        process_count -- number of worker processes; the number of CPUs is used
+                         if not given and the logs are processed in the current
+                         process if 1 (default None)
+        column_map -- an optional dictionary mapping sensor names to log column names
+        start_row -- number of rows at the beginning of each log that are skipped (default 0)
+        cache_directory -- directory for the binary log caches (see "LogReader")
+        '''
+        ## the "SFDD" instance that is trained
+        self.sfdd_manager = sfdd_manager
+
+        ## number of worker processes
+        self.process_count = process_count
+
+        ## options passed to the worker processes
+        self.options = {'window_size': window_size,
+                        'column_map': column_map,
+                        'start_row': start_row,
+                        'cache_directory': cache_directory}
+
+    def run(self, log_file_names, correlation_file_name=None, pattern_file_name=None):
+        '''Learns the correlations and the normal patterns of self.sfdd_manager
+        from the given log files
+
+        Keyword arguments:
+        log_file_names -- a list of paths to fault-free log files
+        correlation_file_name -- name of a YAML file to which the correlated
+                                 sensors are written (default None)
+        pattern_file_name -- name of a YAML file to which the pattern pairs are written
+                             (default None)
+
+        '''
+        if self.process_count == 1:
+            _initialise_worker(self.sfdd_manager, self.options)
+            self.__train(map, log_file_names, correlation_file_name, pattern_file_name)
+            return
+
+        pool = multiprocessing.Pool(self.process_count, initializer=_initialise_worker,
+                                    initargs=(self.sfdd_manager, self.options))
+        try:
+            self.__train(pool.imap_unordered, log_file_names,
+                         correlation_file_name, pattern_file_name)
+        finally:
+            pool.close()
+            pool.join()
+
+    def __train(self, map_function, log_file_names, correlation_file_name, pattern_file_name):
+        '''Runs the two training phases using "map_function" for distributing the logs
+
+        Keyword arguments:
+        map_function -- a function with the signature of "map"
+        log_file_names -- a list of paths to fault-free log files
+        correlation_file_name -- name of a YAML file for the correlated sensors or None
+        pattern_file_name -- name of a YAML file for the pattern pairs or None
+
+        '''
+        accumulator = None
+        for partial_accumulator in map_function(_correlation_statistics, log_file_names):
+            if accumulator is None:
+                accumulator = partial_accumulator
+            else:
+                accumulator.merge(partial_accumulator)
+        if accumulator is None:
+            raise ValueError('No log files given for training')
+
+        self.sfdd_manager.set_correlations(accumulator.correlations(), correlation_file_name)
+
+        correlated_sensor_matrix = self.sfdd_manager.correlated_sensor_matrix
+        tasks = [(log_file_name, correlated_sensor_matrix) for log_file_name in log_file_names]
+        pattern_pair_table = np.zeros_like(self.sfdd_manager.pattern_pair_table)
+        for partial_table in map_function(_pattern_pairs, tasks):
+            pattern_pair_table |= partial_table
+        self.sfdd_manager.pattern_pair_table = pattern_pair_table
+
+        if pattern_file_name is not None:
+            self.sfdd_manager.export_pattern_pairs(pattern_file_name)
@@ -0,0 +1,70 @@
+from __future__ import print_function
+import json
+import argparse
+
+from sfdd.structural_model import StructuralModel
+from sfdd.log_reader import LogReader
+from sfdd.sfdd import SFDD
+from sfdd.sweep import ParameterSweep, read_fault_intervals
+
+def read_log(log_file_name, sensor_names, start_row):
+    '''Returns a tuple (timestamps, data) with the measurements of a log starting
+    at "start_row"; as in the other examples, the timestamps are relative
+    to the timestamp of the first returned measurement
+
+    Keyword arguments:
+    log_file_name -- path to a log file
+    sensor_names -- a list of sensor names
+    start_row -- index of the first used measurement
+
+    '''
+    timestamps, data = LogReader(log_file_name).read_sensors(sensor_names)
+    return timestamps[start_row:] - timestamps[start_row], data[start_row:]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evaluates a grid of SFDD parameters in one pass '
+                                                 'over a log with known fault intervals')
+    parser.add_argument('structural_model_file')
+    parser.add_argument('test_data_file')
+    parser.add_argument('fault_interval_file',
+                        help='semicolon-separated file with the header "sensor; start; end" '
+                             'listing the ground-truth faults, with times relative to '
+                             'the first used measurement')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.7, 0.8, 0.9])
+    parser.add_argument('--window-sizes', type=int, nargs='+', default=[20])
+    parser.add_argument('--pattern-tolerances', type=float, nargs='+', default=None,
+                        help='thresholds of the pattern detectors; the default ones are used '
+                             'if not given')
+    parser.add_argument('--mode', choices=['basic', 'extended'], default='basic')
+    parser.add_argument('--training-data-file',
+                        help='fault-free log used for training in the extended mode')
+    parser.add_argument('--start-row', type=int, default=15,
+                        help='index of the first used measurement of the logs')
+    parser.add_argument('--output', help='JSON file to which the results are written')
+    args = parser.parse_args()
+
+    structural_model = StructuralModel(args.structural_model_file)
+    sfdd_manager = SFDD(structural_model.sensors, structural_model, args.thresholds[0])
+
+    timestamps, data = read_log(args.test_data_file, structural_model.sensors, args.start_row)
+    training_timestamps, training_data = None, None
+    if args.training_data_file is not None:
+        training_timestamps, training_data = read_log(args.training_data_file,
+                                                      structural_model.sensors, args.start_row)
+
+    sweep = ParameterSweep(sfdd_manager, args.thresholds, args.window_sizes,
+                           args.pattern_tolerances, args.mode)
+    results = sweep.run(data, timestamps, read_fault_intervals(args.fault_interval_file),
+                        training_data, training_timestamps)
+
+    columns = ['correlation_threshold', 'window_size', 'pattern_tolerance', 'precision',
+               'recall', 'false_alarm_rate', 'detection_rate', 'mean_detection_delay']
+    print(' '.join('{0:>21}'.format(column) for column in columns))
+    for result in results:
+        print(' '.join('{0:>21}'.format('-' if result[column] is None else
+                                        '{0:.4g}'.format(result[column]))
+                       for column in columns))
+
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import warnings
+import unittest
+import numpy as np
+
+from sfdd.structural_model import StructuralModel
+from sfdd.correlation import CorrelationLibrary
+from sfdd.streaming import SampleStream
+from sfdd.sfdd import SFDD
+from benchmarks.synthetic import generate_structural_model, generate_signals
+from tests.test_detection import model_file_name, test_log_file_name, read_log
+
+class StreamingCorrelationTest(unittest.TestCase):
+    '''Checks the correlations of a "SampleStream" against "CorrelationLibrary.pearson"
+    '''
+    def test_stream_correlations(self):
+        random_state = np.random.RandomState(0)
+        sample_count = 200
+        data = random_state.normal(0., 1., size=(sample_count, 5))
+        data[:, 1] = 2. * data[:, 0] + random_state.normal(0., 0.1, size=sample_count)
+
+        # a column that is constant in some windows only and a column with
+        # a tiny variance relative to its magnitude, which is not constant
+        data[50:120, 2] = 4.
+        data[:, 3] = 1e6 + random_state.normal(0., 1e-4, size=sample_count)
+        data[:, 4] = 7.
+
+        for window_size in (4, 20):
+            correlation_size = window_size // 2
+            stream = SampleStream(data.shape[1], window_size, correlation_size)
+            for t in range(sample_count):
+                stream.push(float(t), data[t])
+                if not stream.is_full():
+                    continue
+
+                window = data[t-window_size+1:t+1]
+                expected = CorrelationLibrary.pearson(window[0:correlation_size])
+                correlations = stream.correlations()
+                np.testing.assert_array_equal(np.isnan(correlations), np.isnan(expected))
+                np.testing.assert_allclose(correlations[~np.isnan(expected)],
+                                           expected[~np.isnan(expected)], atol=1e-6)
+
+    def test_constant_columns_without_warnings(self):
+        data = np.zeros((20, 3))
+        data[:, 0] = np.arange(20.)
+        data[:, 2] = 3.
+        stream = SampleStream(data.shape[1], 10, 5)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            for t in range(data.shape[0]):
+                stream.push(float(t), data[t])
+                if stream.is_full():
+                    self.assertTrue(np.isnan(stream.correlations()[1:]).all())
+
+            # the zero variances of columns that are not marked as constant
+            self.assertTrue(np.isnan(CorrelationLibrary.rolling_pearson(data).correlations(
+                np.zeros(data.shape[1], dtype=bool))[1:]).all())
+            self.assertTrue(np.isnan(CorrelationLibrary.pearson(data)[1:]).all())
+
+    def test_constant_column_rounding_noise(self):
+        # in the window 339 of the test log (w=20), sensed_angle_joint2 is constant in
+        # the correlation part, but due to rounding errors in the column means,
+        # "np.corrcoef" gives tiny correlations instead of NaN; these used to count
+        # as uncorrelated, while constant columns now count as correlated (NaN -> 1)
+        structural_model = StructuralModel(model_file_name)
+        timestamps, data = read_log(structural_model, test_log_file_name, 400)
+        window_size = 20
+        sensor = structural_model.sensors.index('sensed_angle_joint2')
+        correlation_data = data[339:339+int(window_size/2)]
+        self.assertEqual(np.ptp(correlation_data[:, sensor]), 0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            noise_correlations = np.corrcoef(correlation_data, rowvar=False)[sensor]
+        self.assertTrue(np.isfinite(noise_correlations[0]))
+        self.assertLess(abs(noise_correlations[0]), 1e-10)
+        self.assertTrue(np.isnan(CorrelationLibrary.pearson(correlation_data)[sensor]).all())
+
+        sfdd_manager = SFDD(structural_model.sensors, structural_model, 0.8, 2)
+        anomalous_sensors = [sfdd_manager.monitor_sensors_basic(data[i:i+window_size],
+                                                                timestamps[i:i+window_size])
+                             for i in range(340)]
+        self.assertEqual(anomalous_sensors[339], [])
+
+class SparseCorrelationTest(unittest.TestCase):
+    '''Checks the sparse correlated sensors against the dense correlations
+    masked by the independence matrix
+    '''
+    sensor_count = 300
+    correlation_threshold = 0.99
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.mkdtemp(prefix='sfdd_tests_')
+        try:
+            structural_model_file_name = os.path.join(directory, 'model.yaml')
+            sensor_components = generate_structural_model(structural_model_file_name,
+                                                          cls.sensor_count, 30)
+            cls.structural_model = StructuralModel(structural_model_file_name)
+        finally:
+            shutil.rmtree(directory)
+
+        # the sensors are numbered in the model order, which is not that of the YAML file
+        _, data = generate_signals(sensor_components, 500)
+        sensor_indices = [int(sensor.split('_')[1]) for sensor in cls.structural_model.sensors]
+        cls.data = data[:, sensor_indices]
+        cls.data[:, [3, 299]] = 1.
+
+    def dense_manager(self):
+        sfdd_manager = SFDD(self.structural_model.sensors, self.structural_model,
+                            self.correlation_threshold, 2)
+        sfdd_manager.learn_correlations(self.data)
+        return sfdd_manager
+
+    def test_sparse_learn_correlations(self):
+        # the default block size (256) does not divide the 300 sensors
+        dense_manager = self.dense_manager()
+        sfdd_manager = SFDD(self.structural_model.sensors, self.structural_model,
+                            self.correlation_threshold, 2, sparse_correlations=True)
+        sfdd_manager.learn_correlations(self.data)
+        expected = dense_manager.correlated_sensor_matrix & dense_manager.independence_matrix
+        np.testing.assert_array_equal(sfdd_manager.correlated_sensor_matrix, expected)
+        self.assertTrue(expected[~np.isnan(CorrelationLibrary.pearson(self.data))].any())
+        self.assertTrue((dense_manager.correlated_sensor_matrix & ~expected).any())
+
+    def test_correlated_pairs(self):
+        dense_manager = self.dense_manager()
+        for mask in (None, dense_manager.independence_matrix):
+            expected = dense_manager.correlated_sensor_matrix.copy()
+            if mask is not None:
+                expected &= mask
+            for block_size in (7, 256, 1000):
+                indptr, indices = CorrelationLibrary.correlated_pairs(
+                    self.data, self.correlation_threshold, mask=mask, block_size=block_size)
+                correlated_sensor_matrix = np.zeros_like(expected)
+                correlated_sensor_matrix[np.repeat(np.arange(self.sensor_count),
+                                                   np.diff(indptr)), indices] = True
+                np.testing.assert_array_equal(correlated_sensor_matrix, expected)
+                for i in range(self.sensor_count):
+                    self.assertTrue(np.all(np.diff(indices[indptr[i]:indptr[i+1]]) > 0))
+
+if __name__ == '__main__':
+    unittest.main()
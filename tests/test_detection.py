@@ -0,0 +1,258 @@
+import os
+import json
+import unittest
+import numpy as np
+
+from sfdd.structural_model import StructuralModel
+from sfdd.log_reader import LogReader
+from sfdd.patterns import PatternLibrary, PatternRegistry
+from sfdd.sfdd import SFDD
+from sfdd.parallel import ParallelDetector
+
+package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+model_file_name = os.path.join(package_directory, 'structural_models', 'youBot.yaml')
+training_log_file_name = os.path.join(package_directory, 'test_data',
+                                      '02_11_2016__14_41_32_forward.log')
+test_log_file_name = os.path.join(package_directory, 'test_data', '22_10_2016__14_46_08.log')
+compact_log_file_name = os.path.join(package_directory, 'test_data',
+                                     '18_10_2016__14_12_51_forward.log.csv')
+baseline_file_name = os.path.join(package_directory, 'tests', 'data',
+                                  'baseline_anomalous_sensors.json')
+
+def read_log(structural_model, log_file_name, row_count, baseline_columns=False):
+    '''Returns the timestamps and the sensor measurements of the first "row_count"
+    rows of a log, starting at the 15th measurement as in the example drivers;
+    if "baseline_columns" is True, the sensors are read in model order
+    from the columns starting at column 8, as in the original drivers
+    '''
+    log_reader = LogReader(log_file_name, use_cache=False)
+    column_map = None
+    if baseline_columns:
+        column_map = {sensor: log_reader.column_names[8+i]
+                      for i, sensor in enumerate(structural_model.sensors)}
+    timestamps, data = log_reader.read_sensors(structural_model.sensors, column_map)
+    timestamps = timestamps - timestamps[15]
+    return timestamps[15:15+row_count], data[15:15+row_count]
+
+def anomalous_sensors(sfdd_manager, faults):
+    '''Returns a list of lists with the names of the sensors flagged in each row of "faults"
+    '''
+    return [[sensor for sensor, faulty in zip(sfdd_manager.sensor_names, window_faults) if faulty]
+            for window_faults in faults]
+
+class DetectionTest(unittest.TestCase):
+    '''Checks that the batch, streaming, parallel and incremental detection paths
+    give the same results as the per-window methods "monitor_sensors_basic" and
+    "monitor_sensors_extended", and that these give the anomalous sensors
+    recorded with the original implementation
+    '''
+    window_sizes = (5, 20)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.structural_model = StructuralModel(model_file_name)
+        cls.timestamps, cls.data = read_log(cls.structural_model, test_log_file_name, 1200)
+        cls.training_timestamps, cls.training_data = read_log(cls.structural_model,
+                                                              training_log_file_name, 1500)
+
+    def basic_manager(self, **kwargs):
+        return SFDD(self.structural_model.sensors, self.structural_model, 0.8, 2, **kwargs)
+
+    def extended_manager(self, window_size, **kwargs):
+        sfdd_manager = SFDD(self.structural_model.sensors, self.structural_model, 0.9, 2,
+                            **kwargs)
+        sfdd_manager.learn_correlations(self.training_data)
+        sfdd_manager.find_normal_patterns(self.training_data, self.training_timestamps,
+                                          window_size=window_size)
+        return sfdd_manager
+
+    def monitor(self, sfdd_manager, window_size, mode):
+        '''Returns the anomalous sensors of every window of the test log
+        obtained with the per-window monitoring methods
+        '''
+        monitor_sensors = sfdd_manager.monitor_sensors_basic if mode == 'basic' \
+                          else sfdd_manager.monitor_sensors_extended
+        return [monitor_sensors(self.data[i:i+window_size], self.timestamps[i:i+window_size])
+                for i in range(self.data.shape[0] - window_size + 1)]
+
+    def stream(self, sfdd_manager, window_size, mode):
+        '''Returns the anomalous sensors of every window of the test log obtained with "push"
+        '''
+        sfdd_manager.start_stream(window_size, mode)
+        results = [sfdd_manager.push(timestamp, sample)
+                   for timestamp, sample in zip(self.timestamps, self.data)]
+        return results[window_size-1:]
+
+    def parallel(self, sfdd_manager, window_size, mode):
+        '''Returns the anomalous sensors of every window of the test log
+        obtained with a "ParallelDetector" with two workers
+        '''
+        with ParallelDetector(sfdd_manager, window_size, mode, process_count=2) as detector:
+            results = [detector.push(timestamp, sample)
+                       for timestamp, sample in zip(self.timestamps, self.data)]
+        return results[window_size-1:]
+
+    def test_baseline(self):
+        # tests/data/baseline_anomalous_sensors.json contains the anomalous sensors
+        # that the original per-column and per-window implementation found in every
+        # window of five measurements of the first 1200 rows of the test log, read
+        # with the original columns; with windows of 20 measurements, the original
+        # implementation gave rounding noise instead of NaN for the correlations
+        # of constant columns (see test_constant_column_rounding_noise)
+        with open(baseline_file_name, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+
+        window_size = 5
+        timestamps, data = read_log(self.structural_model, test_log_file_name, 1200,
+                                    baseline_columns=True)
+        training_timestamps, training_data = read_log(self.structural_model,
+                                                      training_log_file_name, 1500,
+                                                      baseline_columns=True)
+        sfdd_manager = self.basic_manager()
+        self.assertEqual([sfdd_manager.monitor_sensors_basic(data[i:i+window_size],
+                                                             timestamps[i:i+window_size])
+                          for i in range(data.shape[0] - window_size + 1)],
+                         baseline['basic_5'])
+
+        sfdd_manager = SFDD(self.structural_model.sensors, self.structural_model, 0.9, 2)
+        sfdd_manager.learn_correlations(training_data)
+        sfdd_manager.find_normal_patterns(training_data, training_timestamps,
+                                          window_size=window_size)
+        self.assertEqual([sfdd_manager.monitor_sensors_extended(data[i:i+window_size],
+                                                                timestamps[i:i+window_size])
+                          for i in range(data.shape[0] - window_size + 1)],
+                         baseline['extended_5'])
+
+    def test_detect_log_basic(self):
+        for window_size in self.window_sizes:
+            expected = self.monitor(self.basic_manager(), window_size, 'basic')
+            sfdd_manager = self.basic_manager()
+            faults, end_times = sfdd_manager.detect_log(self.data, self.timestamps, window_size,
+                                                        chunk_size=97)
+            self.assertEqual(anomalous_sensors(sfdd_manager, faults), expected)
+            np.testing.assert_array_equal(end_times, self.timestamps[window_size-1:])
+            self.assertTrue(any(expected))
+
+    def test_detect_log_extended(self):
+        for window_size in self.window_sizes:
+            sfdd_manager = self.extended_manager(window_size)
+            expected = self.monitor(sfdd_manager, window_size, 'extended')
+            faults, _ = sfdd_manager.detect_log(self.data, self.timestamps, window_size,
+                                                mode='extended', chunk_size=97)
+            self.assertEqual(anomalous_sensors(sfdd_manager, faults), expected)
+            self.assertTrue(any(expected))
+
+    def test_push_basic(self):
+        for window_size in self.window_sizes:
+            sfdd_manager = self.basic_manager()
+            faults, _ = sfdd_manager.detect_log(self.data, self.timestamps, window_size)
+            self.assertEqual(self.stream(self.basic_manager(), window_size, 'basic'),
+                             anomalous_sensors(sfdd_manager, faults))
+
+    def test_push_extended(self):
+        for window_size in self.window_sizes:
+            sfdd_manager = self.extended_manager(window_size)
+            faults, _ = sfdd_manager.detect_log(self.data, self.timestamps, window_size,
+                                                mode='extended')
+            self.assertEqual(self.stream(sfdd_manager, window_size, 'extended'),
+                             anomalous_sensors(sfdd_manager, faults))
+
+    def test_parallel(self):
+        # none of the correlations of the test log lies within rounding error
+        # of the threshold, so the basic decisions are the same as well
+        for window_size in self.window_sizes:
+            self.assertEqual(self.parallel(self.basic_manager(), window_size, 'basic'),
+                             self.stream(self.basic_manager(), window_size, 'basic'))
+            sfdd_manager = self.extended_manager(window_size)
+            self.assertEqual(self.parallel(sfdd_manager, window_size, 'extended'),
+                             self.stream(sfdd_manager, window_size, 'extended'))
+
+    def test_parallel_rounding(self):
+        # a known limitation: the workers calculate the correlations per row, so with
+        # a threshold between the two computed values of a correlation (of sensors 0
+        # and 3 in the window ending at row 1036), one basic decision differs from "push"
+        window_size = 20
+        sfdd_manager = SFDD(self.structural_model.sensors, self.structural_model,
+                            0.9861651013403638, 2)
+        expected = self.stream(sfdd_manager, window_size, 'basic')
+        results = self.parallel(sfdd_manager, window_size, 'basic')
+        self.assertEqual([i for i in range(len(results)) if results[i] != expected[i]],
+                         [1036 - window_size + 1])
+
+    def test_compact_log(self):
+        # in the basic mode, rounding this log to float32 moves some window
+        # correlations to the other side of the threshold
+        timestamps, data = read_log(self.structural_model, compact_log_file_name, 2000)
+        for window_size in self.window_sizes + (50,):
+            for mode in ('basic', 'extended'):
+                if mode == 'basic':
+                    sfdd_manager = self.basic_manager(compact=True)
+                else:
+                    sfdd_manager = self.extended_manager(window_size, compact=True)
+                expected, _ = sfdd_manager.detect_log(data, timestamps, window_size, mode=mode)
+                sfdd_manager.working_state[:] = True
+                compact_log = sfdd_manager.compact_log(data, timestamps, window_size, mode)
+                faults, _ = sfdd_manager.detect_log(compact_log, timestamps, window_size,
+                                                    mode=mode)
+                np.testing.assert_array_equal(faults, expected)
+
+    def test_push_registry_thresholds(self):
+        # the running patterns have to use the registered thresholds; a detector
+        # registered under a built-in name is evaluated on the whole window
+        registry = PatternRegistry()
+        registry.register('stuck_at', PatternLibrary.stuck_at_features, ['differences'], 0.05)
+        registry.register('drift', PatternLibrary.drift_features,
+                          ['differences', 'slopes', 'slope_differences'], 0.5)
+        other_registry = PatternRegistry()
+        other_registry.register('stuck_at', lambda features, threshold:
+                                PatternLibrary.stuck_at_features(features, 10. * threshold),
+                                ['differences'])
+        other_registry.register('drift', PatternLibrary.drift_features,
+                                ['differences', 'slopes', 'slope_differences'])
+
+        for pattern_registry in (registry, other_registry):
+            for window_size in self.window_sizes:
+                sfdd_manager = self.basic_manager(pattern_registry=pattern_registry)
+                faults, _ = sfdd_manager.detect_log(self.data, self.timestamps, window_size)
+                expected = anomalous_sensors(sfdd_manager, faults)
+                self.assertEqual(self.stream(self.basic_manager(pattern_registry=pattern_registry),
+                                             window_size, 'basic'), expected)
+                self.assertNotEqual(expected, self.monitor(self.basic_manager(), window_size,
+                                                           'basic'))
+
+    def test_incremental_decisions(self):
+        for window_size in self.window_sizes:
+            self.assertEqual(self.monitor(self.basic_manager(incremental_decisions=True),
+                                          window_size, 'basic'),
+                             self.monitor(self.basic_manager(), window_size, 'basic'))
+            self.assertEqual(self.stream(self.basic_manager(incremental_decisions=True),
+                                         window_size, 'basic'),
+                             self.stream(self.basic_manager(), window_size, 'basic'))
+
+            sfdd_manager = self.extended_manager(window_size)
+            incremental_manager = self.extended_manager(window_size, incremental_decisions=True)
+            self.assertEqual(self.monitor(incremental_manager, window_size, 'extended'),
+                             self.monitor(sfdd_manager, window_size, 'extended'))
+
+    def test_incremental_model_changes(self):
+        # the cached decisions have to follow both in-place modified and new model arrays;
+        # the same window is evaluated again, so that no sensor is recomputed
+        # because of its own patterns
+        window_size = self.window_sizes[-1]
+        expected_manager = self.extended_manager(window_size)
+        sfdd_manager = self.extended_manager(window_size, incremental_decisions=True)
+        expected = self.monitor(expected_manager, window_size, 'extended')
+        window = next(i for i, anomalous in enumerate(expected) if anomalous)
+        data = self.data[window:window+window_size]
+        timestamps = self.timestamps[window:window+window_size]
+        self.assertEqual(sfdd_manager.monitor_sensors_extended(data, timestamps), expected[window])
+
+        sfdd_manager.pattern_pair_table[:] = True
+        sfdd_manager.invalidate_decision_caches()
+        self.assertEqual(sfdd_manager.monitor_sensors_extended(data, timestamps), [])
+
+        sfdd_manager.pattern_pair_table = expected_manager.pattern_pair_table.copy()
+        self.assertEqual(sfdd_manager.monitor_sensors_extended(data, timestamps), expected[window])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sfdd.structural_model import StructuralModel
+from sfdd.diagnosis import ComponentDiagnoser
+
+model_description = '''system_components:
+    power:
+        type: subsystem
+        parents: []
+    gps:
+        type: sensor
+        parents: [power]
+    compass:
+        type: sensor
+        parents: [power]
+    clock:
+        type: sensor
+        parents: []
+'''
+
+class ComponentDiagnoserTest(unittest.TestCase):
+    '''Checks the diagnoses of anomalous sensors that cannot be explained
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        model_file_name = os.path.join(self.directory, 'model.yaml')
+        with open(model_file_name, 'w') as model_file:
+            model_file.write(model_description)
+        self.structural_model = StructuralModel(model_file_name)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_unexplained_sensors(self):
+        diagnoser = ComponentDiagnoser(self.structural_model, include_sensors=False)
+        self.assertEqual(diagnoser.unexplained_sensors, ['clock'])
+        self.assertEqual(diagnoser.diagnose(['gps', 'clock']), [(('power',), 0.5)])
+        self.assertEqual(diagnoser.diagnose(['gps', 'compass', 'clock']), [(('power',), 1.0)])
+        self.assertEqual(diagnoser.diagnose(['clock']), [])
+
+    def test_sensor_candidates(self):
+        diagnoser = ComponentDiagnoser(self.structural_model)
+        self.assertEqual(diagnoser.unexplained_sensors, [])
+        self.assertEqual(diagnoser.diagnose(['gps', 'clock']), [(('clock', 'gps'), 1.0),
+                                                                (('clock', 'power'), 2 / 3.)])
+
+if __name__ == '__main__':
+    unittest.main()
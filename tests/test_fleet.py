@@ -0,0 +1,107 @@
+import json
+import asyncio
+import unittest
+import numpy as np
+
+from sfdd.structural_model import StructuralModel
+from sfdd.sfdd import SFDD
+from sfdd.fleet import FleetMonitor
+from tests.test_detection import model_file_name, test_log_file_name, read_log
+
+class FleetMonitorTest(unittest.TestCase):
+    '''Checks the results and the socket interface of a "FleetMonitor"
+    '''
+    window_size = 10
+
+    @classmethod
+    def setUpClass(cls):
+        cls.structural_model = StructuralModel(model_file_name)
+        cls.timestamps, cls.data = read_log(cls.structural_model, test_log_file_name, 400)
+
+    def sfdd_manager(self):
+        return SFDD(self.structural_model.sensors, self.structural_model, 0.8, 2)
+
+    def test_robots_match_detect_log(self):
+        faults, _ = self.sfdd_manager().detect_log(self.data, self.timestamps, self.window_size)
+        shifted_faults, _ = self.sfdd_manager().detect_log(self.data[100:], self.timestamps[100:],
+                                                           self.window_size)
+
+        async def monitor():
+            fleet_monitor = FleetMonitor(self.sfdd_manager(), self.window_size)
+            states = {'a': list(), 'b': list()}
+            for i in range(self.data.shape[0]):
+                samples = [('a', self.timestamps[i], self.data[i])]
+                if i >= 100:
+                    samples.append(('b', self.timestamps[i], self.data[i]))
+                fleet_monitor.process_samples(samples)
+                for robot_id, _, _ in samples:
+                    states[robot_id].append(fleet_monitor.anomalous_sensors(robot_id))
+            return states
+
+        states = asyncio.run(monitor())
+        for robot_id, robot_faults in (('a', faults), ('b', shifted_faults)):
+            expected = [[sensor for sensor, faulty in zip(self.structural_model.sensors, row)
+                         if faulty] for row in robot_faults]
+            self.assertEqual(states[robot_id][self.window_size-1:], expected)
+
+    def test_invalid_submit(self):
+        faults, _ = self.sfdd_manager().detect_log(self.data, self.timestamps, self.window_size)
+
+        async def monitor():
+            fleet_monitor = FleetMonitor(self.sfdd_manager(), self.window_size)
+            running = asyncio.ensure_future(fleet_monitor.run())
+            rejected = 0
+            for i in range(self.data.shape[0]):
+                await fleet_monitor.submit('a', self.timestamps[i], self.data[i])
+                for timestamp, sample in (('now', self.data[i]), (self.timestamps[i], [1., 2.]),
+                                          (self.timestamps[i], ['x'] * self.data.shape[1])):
+                    try:
+                        await fleet_monitor.submit('b', timestamp, sample)
+                    except (ValueError, TypeError):
+                        rejected += 1
+                await asyncio.sleep(0)
+            await fleet_monitor.stop()
+            await running
+            return rejected, fleet_monitor.anomalous_sensors('a')
+
+        rejected, anomalous_sensors = asyncio.run(monitor())
+        self.assertEqual(rejected, 3 * self.data.shape[0])
+        self.assertEqual(anomalous_sensors, [sensor for sensor, faulty
+                                             in zip(self.structural_model.sensors, faults[-1])
+                                             if faulty])
+
+    def test_malformed_lines(self):
+        async def exchange():
+            fleet_monitor = FleetMonitor(self.sfdd_manager(), self.window_size)
+            server = await fleet_monitor.serve(port=0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+            replies = list()
+            for line in ('not json', json.dumps({'robot': 'a'}),
+                         json.dumps({'robot': 'a', 'timestamp': 0., 'sample': [1., 2.]})):
+                writer.write((line + '\n').encode('utf-8'))
+                replies.append(json.loads(await reader.readline()))
+
+            # the connection is still usable after the errors
+            sample = {'robot': 'a', 'timestamp': 0., 'sample': list(self.data[0])}
+            writer.write((json.dumps(sample) + '\n').encode('utf-8'))
+            writer.close()
+            await writer.wait_closed()
+
+            async def next_sample():
+                while fleet_monitor.queue is None or fleet_monitor.queue.empty():
+                    await asyncio.sleep(0.01)
+                return fleet_monitor.queue.get_nowait()
+            queued_sample = await asyncio.wait_for(next_sample(), 5.)
+            server.close()
+            await server.wait_closed()
+            return replies, queued_sample
+
+        replies, queued_sample = asyncio.run(exchange())
+        self.assertTrue(all('error' in reply for reply in replies))
+        self.assertEqual(queued_sample[0], 'a')
+        np.testing.assert_array_equal(queued_sample[2], self.data[0])
+
+if __name__ == '__main__':
+    unittest.main()
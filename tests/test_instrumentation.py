@@ -0,0 +1,115 @@
+import unittest
+import numpy as np
+
+from sfdd.structural_model import StructuralModel
+from sfdd.instrumentation import Instrumentation
+from sfdd.sfdd import SFDD
+from tests.test_detection import model_file_name, training_log_file_name, \
+                                 test_log_file_name, read_log, anomalous_sensors
+
+class InstrumentationTest(unittest.TestCase):
+    '''Checks the statistics recorded by an "Instrumentation" and that
+    the detection results do not depend on whether it is given
+    '''
+    window_size = 10
+    chunk_size = 97
+
+    @classmethod
+    def setUpClass(cls):
+        cls.structural_model = StructuralModel(model_file_name)
+        cls.timestamps, cls.data = read_log(cls.structural_model, test_log_file_name, 400)
+        cls.training_timestamps, cls.training_data = read_log(cls.structural_model,
+                                                              training_log_file_name, 400)
+
+    def sfdd_manager(self, mode, instrumentation=None):
+        sfdd_manager = SFDD(self.structural_model.sensors, self.structural_model, 0.8, 2,
+                            instrumentation=instrumentation)
+        if mode == 'extended':
+            sfdd_manager.learn_correlations(self.training_data)
+            sfdd_manager.find_normal_patterns(self.training_data, self.training_timestamps,
+                                              window_size=self.window_size)
+        return sfdd_manager
+
+    def instrumentation(self):
+        instrumentation = Instrumentation(self.structural_model.sensors, 2)
+        exports = list()
+        instrumentation.add_exporter(lambda recorded: exports.append(recorded.window_count))
+        return instrumentation, exports
+
+    def test_detect_log(self):
+        window_count = self.data.shape[0] - self.window_size + 1
+        chunk_count = int(np.ceil(window_count / float(self.chunk_size)))
+        for mode in ('basic', 'extended'):
+            expected, _, patterns = self.sfdd_manager(mode).detect_log(
+                self.data, self.timestamps, self.window_size, mode=mode,
+                chunk_size=self.chunk_size, return_patterns=True)
+
+            instrumentation, exports = self.instrumentation()
+            faults, _ = self.sfdd_manager(mode, instrumentation).detect_log(
+                self.data, self.timestamps, self.window_size, mode=mode,
+                chunk_size=self.chunk_size)
+            np.testing.assert_array_equal(faults, expected)
+
+            stats = instrumentation.stats()
+            self.assertEqual(stats['windows'], window_count)
+            self.assertEqual(exports, [min((k + 1) * self.chunk_size, window_count)
+                                       for k in range(chunk_count)])
+            for stage in ('patterns', 'decisions'):
+                self.assertEqual(stats['stages'][stage]['count'], chunk_count)
+                self.assertGreater(stats['stages'][stage]['total_time_s'], 0.)
+            self.assertEqual(list(stats['sensors_flagged'].values()),
+                             expected.sum(axis=0).tolist())
+            self.assertEqual(list(stats['pattern_hits'].values()),
+                             patterns.sum(axis=0).tolist())
+            self.assertTrue(expected.any())
+
+    def test_stream(self):
+        window_count = self.data.shape[0] - self.window_size + 1
+        for mode in ('basic', 'extended'):
+            sfdd_manager = self.sfdd_manager(mode)
+            faults, _ = sfdd_manager.detect_log(self.data, self.timestamps, self.window_size,
+                                                mode=mode)
+            expected = anomalous_sensors(sfdd_manager, faults)
+
+            instrumentation, exports = self.instrumentation()
+            sfdd_manager = self.sfdd_manager(mode, instrumentation)
+            sfdd_manager.start_stream(self.window_size, mode)
+            results = [sfdd_manager.push(timestamp, sample)
+                       for timestamp, sample in zip(self.timestamps, self.data)]
+            self.assertEqual(results[self.window_size-1:], expected)
+
+            stats = instrumentation.stats()
+            self.assertEqual(stats['windows'], window_count)
+            self.assertEqual(exports, list(range(1, window_count + 1)))
+            self.assertEqual(stats['stages']['ingest']['count'], self.data.shape[0])
+            self.assertEqual(stats['stages']['window']['count'], self.data.shape[0])
+            for stage in ('patterns', 'decisions'):
+                self.assertEqual(stats['stages'][stage]['count'], window_count)
+            self.assertEqual('correlation' in stats['stages'], mode == 'basic')
+            self.assertEqual(list(stats['sensors_flagged'].values()),
+                             faults.sum(axis=0).tolist())
+            self.assertEqual(sum(stats['stages']['window']['histogram']['counts']),
+                             self.data.shape[0])
+
+    def test_monitor_sensors(self):
+        window_count = 50
+        for mode in ('basic', 'extended'):
+            managers = [self.sfdd_manager(mode), self.sfdd_manager(mode, self.instrumentation()[0])]
+            results = list()
+            for sfdd_manager in managers:
+                monitor_sensors = sfdd_manager.monitor_sensors_basic if mode == 'basic' \
+                                  else sfdd_manager.monitor_sensors_extended
+                results.append([monitor_sensors(self.data[i:i+self.window_size],
+                                                self.timestamps[i:i+self.window_size])
+                                for i in range(window_count)])
+            self.assertEqual(results[1], results[0])
+
+            stats = managers[1].instrumentation.stats()
+            self.assertEqual(stats['windows'], window_count)
+            for stage in ('window', 'patterns', 'decisions'):
+                self.assertEqual(stats['stages'][stage]['count'], window_count)
+            self.assertEqual(sum(stats['sensors_flagged'].values()),
+                             sum(len(anomalous) for anomalous in results[0]))
+
+if __name__ == '__main__':
+    unittest.main()
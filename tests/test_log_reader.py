@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from sfdd.structural_model import StructuralModel
+from sfdd.log_reader import LogReader
+from tests.test_detection import model_file_name, test_log_file_name
+
+class LogReaderTest(unittest.TestCase):
+    '''Checks the columns read by a "LogReader" against "np.loadtxt"
+    and the invalidation of its binary cache
+    '''
+    ## the log columns of the youBot sensors, in model order
+    sensor_columns = ['robot_pos_x', 'robot_pos_y', 'robot_pos_z', 'robot_orientation',
+                      'sensed_longit_vel', 'sensed_transv_vel', 'sensed_angular_vel',
+                      'sensed_velocity_joint1', 'sensed_velocity_joint2',
+                      'sensed_velocity_joint3', 'sensed_velocity_joint4',
+                      'sensed_current_joint1', 'sensed_current_joint2',
+                      'sensed_current_joint3', 'sensed_current_joint4',
+                      'sensed_angle_joint1', 'sensed_angle_joint2',
+                      'sensed_angle_joint3', 'sensed_angle_joint4',
+                      'battery_status', 'external_source_status']
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='sfdd_tests_')
+        self.log_file_name = os.path.join(self.directory, 'robot.log')
+        with open(test_log_file_name, 'r') as log_file:
+            self.header = log_file.readline()
+            self.lines = log_file.readlines()[0:500]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_log(self, lines):
+        with open(self.log_file_name, 'w') as log_file:
+            log_file.write(self.header)
+            log_file.writelines(lines)
+
+    def loadtxt(self):
+        return np.loadtxt(self.log_file_name, skiprows=1, delimiter=';')
+
+    def assert_log_read(self, data):
+        '''Checks that "data" contains the values of the log; the header of
+        the test log names one more column than there are values in a row
+        '''
+        expected = self.loadtxt()
+        np.testing.assert_array_equal(data[:, 0:expected.shape[1]], expected)
+        self.assertTrue(np.isnan(data[:, expected.shape[1]:]).all())
+
+    def test_sensor_columns(self):
+        self.write_log(self.lines)
+        structural_model = StructuralModel(model_file_name)
+        log_reader = LogReader(self.log_file_name, chunk_size=97)
+        header = [name.strip() for name in self.header.strip().split(';')]
+        expected = self.loadtxt()
+
+        timestamps, data = log_reader.read_sensors(structural_model.sensors)
+        np.testing.assert_array_equal(timestamps, expected[:, 0])
+        np.testing.assert_array_equal(data, expected[:, [header.index(column)
+                                                         for column in self.sensor_columns]])
+
+        column_map = {'pos_x': 'commanded_longit_vel', 'battery_status': 'sensed_angle_joint4'}
+        _, data = log_reader.read_sensors(structural_model.sensors, column_map)
+        np.testing.assert_array_equal(data[:, 0], expected[:, header.index('commanded_longit_vel')])
+        np.testing.assert_array_equal(data[:, 19], expected[:, header.index('sensed_angle_joint4')])
+
+        with self.assertRaises(KeyError):
+            log_reader.read_sensors(['missing_sensor'])
+
+    def test_cache_invalidation(self):
+        self.write_log(self.lines)
+        self.assert_log_read(LogReader(self.log_file_name).read())
+        cache_file_name = LogReader(self.log_file_name).cache_file_name
+        cache_mtime = os.stat(cache_file_name).st_mtime_ns
+
+        # an unchanged log is read from the existing cache
+        self.assert_log_read(LogReader(self.log_file_name).read())
+        self.assertEqual(os.stat(cache_file_name).st_mtime_ns, cache_mtime)
+
+        # a log with a different size
+        self.write_log(self.lines[0:300])
+        self.assert_log_read(LogReader(self.log_file_name).read())
+        self.assertEqual(LogReader(self.log_file_name).read().shape[0], 300)
+
+        # a log with the same size and a different modification time
+        values = self.lines[0].split(';')
+        values[1] = values[1].replace('2.', '3.', 1)
+        lines = [';'.join(values)] + self.lines[1:300]
+        size = os.path.getsize(self.log_file_name)
+        mtime = os.stat(self.log_file_name).st_mtime_ns
+        self.write_log(lines)
+        os.utime(self.log_file_name, ns=(mtime + 10**9, mtime + 10**9))
+        self.assertEqual(os.path.getsize(self.log_file_name), size)
+        data = LogReader(self.log_file_name).read()
+        self.assert_log_read(data)
+        self.assertEqual(data[0, 1], float(values[1]))
+        self.assertNotEqual(data[0, 1], float(self.lines[0].split(';')[1]))
+
+if __name__ == '__main__':
+    unittest.main()
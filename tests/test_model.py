@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+import unittest
+import yaml
+import numpy as np
+
+from sfdd.structural_model import StructuralModel
+from sfdd.sfdd import SFDD
+
+package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+model_file_name = os.path.join(package_directory, 'structural_models', 'sample.yaml')
+youbot_model_file_name = os.path.join(package_directory, 'structural_models', 'youBot.yaml')
+
+class ModelStateTest(unittest.TestCase):
+    '''Checks that the derived state of an "SFDD" model follows its arrays
+    '''
+    def setUp(self):
+        self.structural_model = StructuralModel(model_file_name)
+        self.sfdd_manager = SFDD(self.structural_model.sensors, self.structural_model, 0.8)
+        self.directory = tempfile.mkdtemp(prefix='sfdd_tests_')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def trained_manager(self):
+        '''Returns an "SFDD" instance with random model arrays
+        '''
+        random_state = np.random.RandomState(0)
+        sfdd_manager = SFDD(self.structural_model.sensors, self.structural_model, 0.7)
+        sensor_count = len(sfdd_manager.sensor_names)
+        sfdd_manager.correlated_sensor_matrix = random_state.rand(sensor_count,
+                                                                  sensor_count) < 0.5
+        sfdd_manager.independence_matrix = random_state.rand(sensor_count, sensor_count) < 0.5
+        sfdd_manager.pattern_pair_table = random_state.rand(
+            *sfdd_manager.pattern_pair_table.shape) < 0.3
+        return sfdd_manager
+
+    def test_save_and_load_model(self):
+        sfdd_manager = self.trained_manager()
+        model_file_name = os.path.join(self.directory, 'model.npz')
+        sfdd_manager.save_model(model_file_name)
+
+        for mmap_mode in (None, 'r'):
+            loaded_manager = SFDD(self.structural_model.sensors, self.structural_model, 0.8)
+            loaded_manager.load_model(model_file_name, mmap_mode=mmap_mode)
+            self.assertEqual(loaded_manager.correlation_threshold, 0.7)
+            for array_name in SFDD.mapped_model_arrays:
+                np.testing.assert_array_equal(getattr(loaded_manager, array_name),
+                                              getattr(sfdd_manager, array_name))
+                self.assertEqual(isinstance(getattr(loaded_manager, array_name), np.memmap),
+                                 mmap_mode is not None)
+
+            # the derived dictionaries follow the loaded matrices
+            self.assertEqual(dict(loaded_manager.independent_sensors),
+                             dict(sfdd_manager.independent_sensors))
+            self.assertEqual(dict(loaded_manager.correlated_sensors),
+                             dict(sfdd_manager.correlated_sensors))
+            self.assertEqual(loaded_manager.sensor_pattern_pairs,
+                             sfdd_manager.sensor_pattern_pairs)
+            del loaded_manager
+
+    def test_unsupported_model_format(self):
+        sfdd_manager = self.trained_manager()
+        model_file_name = os.path.join(self.directory, 'model.npz')
+        sfdd_manager.save_model(model_file_name)
+        with np.load(model_file_name) as model_data:
+            model_arrays = dict(model_data)
+        model_arrays['format_version'] = np.array(SFDD.model_format_version - 1)
+        np.savez(model_file_name, **model_arrays)
+        with self.assertRaises(ValueError):
+            self.sfdd_manager.load_model(model_file_name)
+
+    def test_correlated_sensor_views(self):
+        sensors = self.sfdd_manager.sensor_names
+        correlated_sensor_matrix = np.zeros((len(sensors), len(sensors)), dtype=bool)
+        correlated_sensor_matrix[0, [1, 3]] = True
+        self.sfdd_manager.correlated_sensor_matrix = correlated_sensor_matrix
+        self.assertEqual(self.sfdd_manager.correlated_sensors[sensors[0]],
+                         [sensors[1], sensors[3]])
+        self.assertEqual(self.sfdd_manager.correlated_sensor_indices[sensors[0]], [1, 3])
+
+        self.sfdd_manager.correlated_sensor_matrix[2, 0] = True
+        self.assertEqual(self.sfdd_manager.correlated_sensors[sensors[2]], [sensors[0]])
+        self.assertEqual(self.sfdd_manager.correlated_sensors[sensors[1]], [])
+
+class CompiledModelTest(unittest.TestCase):
+    '''Checks that a compiled structural model is loaded with the state of the YAML model
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='sfdd_tests_')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_compiled_model(self):
+        for yaml_file_name in (model_file_name, youbot_model_file_name):
+            structural_model = StructuralModel(yaml_file_name)
+            compiled_model_file_name = os.path.join(self.directory, 'model.npz')
+            structural_model.compile(compiled_model_file_name)
+            compiled_model = StructuralModel(compiled_model_file_name)
+
+            self.assertEqual(compiled_model.sensors, structural_model.sensors)
+            self.assertEqual(compiled_model.nodes, structural_model.nodes)
+            np.testing.assert_array_equal(compiled_model.ancestor_matrix,
+                                          structural_model.ancestor_matrix)
+            np.testing.assert_array_equal(
+                compiled_model.independence_matrix(compiled_model.sensors),
+                structural_model.independence_matrix(structural_model.sensors))
+            self.assertEqual(compiled_model.fingerprint(), structural_model.fingerprint())
+            self.assertEqual(sorted(compiled_model.structural_model.edges()),
+                             sorted(structural_model.structural_model.edges()))
+
+    def test_stale_fingerprint(self):
+        structural_model = StructuralModel(model_file_name)
+        compiled_model_file_name = os.path.join(self.directory, 'model.npz')
+        structural_model.compile(compiled_model_file_name)
+
+        # a model saved with a changed structural model cannot be loaded
+        # with the compiled version of the original one
+        with open(model_file_name, 'r') as model_file:
+            model_config = yaml.safe_load(model_file)
+        sensor = structural_model.sensors[0]
+        model_config['system_components'][sensor]['parents'].append(
+            structural_model.components[-1])
+        changed_model_file_name = os.path.join(self.directory, 'changed_model.yaml')
+        with open(changed_model_file_name, 'w') as model_file:
+            yaml.safe_dump(model_config, model_file)
+        changed_model = StructuralModel(changed_model_file_name)
+        self.assertNotEqual(changed_model.fingerprint(), structural_model.fingerprint())
+
+        sfdd_model_file_name = os.path.join(self.directory, 'sfdd_model.npz')
+        SFDD(changed_model.sensors, changed_model, 0.8).save_model(sfdd_model_file_name)
+        compiled_model = StructuralModel(compiled_model_file_name)
+        with self.assertRaises(ValueError):
+            SFDD(compiled_model.sensors, compiled_model, 0.8).load_model(sfdd_model_file_name)
+
+        # a compiled model whose stored fingerprint does not match its edges is rejected
+        with np.load(compiled_model_file_name) as model_data:
+            model_arrays = dict(model_data)
+        model_arrays['fingerprint'] = np.array(changed_model.fingerprint())
+        np.savez(compiled_model_file_name, **model_arrays)
+        with self.assertRaises(ValueError):
+            StructuralModel(compiled_model_file_name)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+
+from sfdd.patterns import PatternLibrary, PatternRegistry
+
+class PatternLibraryTest(unittest.TestCase):
+    '''Checks the vectorised pattern detectors against the per-column reference implementation
+    '''
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        self.timestamps = np.cumsum(random_state.uniform(0.005, 0.015, size=40))
+
+        # the windows contain noisy, stuck, drifting and piecewise linear columns
+        columns = [random_state.normal(0., 1., size=40),
+                   np.full(40, 3.),
+                   3. + random_state.uniform(-5e-4, 5e-4, size=40),
+                   np.concatenate((np.zeros(20), np.arange(20) * 0.1)),
+                   np.concatenate((np.zeros(10), np.arange(15) * 0.1, np.full(15, 1.4))),
+                   self.timestamps * 2.]
+        self.data = np.column_stack(columns)
+
+    def test_stuck_at_all(self):
+        for window_size in (2, 3, 10, 40):
+            windows = self.__windows(window_size)
+            expected = [[PatternLibrary.stuck_at(window[:, j]) for j in range(window.shape[1])]
+                        for window in windows]
+            np.testing.assert_array_equal(PatternLibrary.stuck_at_all(windows), expected)
+            np.testing.assert_array_equal(PatternLibrary.stuck_at_all(windows[0]), expected[0])
+
+    def test_drift_all(self):
+        for window_size in (3, 10, 40):
+            windows = self.__windows(window_size)
+            window_timestamps = self.__timestamps(window_size)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                expected = [[PatternLibrary.drift(window[:, j], timestamps)
+                             for j in range(window.shape[1])]
+                            for window, timestamps in zip(windows, window_timestamps)]
+            np.testing.assert_array_equal(PatternLibrary.drift_all(windows, window_timestamps),
+                                          expected)
+            np.testing.assert_array_equal(PatternLibrary.drift_all(windows[0], self.timestamps),
+                                          expected[0])
+
+    def test_default_registry(self):
+        windows = self.__windows(10)
+        window_timestamps = self.__timestamps(10)
+        patterns = PatternRegistry.default().evaluate(windows, window_timestamps)
+        np.testing.assert_array_equal(patterns[..., 0], PatternLibrary.stuck_at_all(windows))
+        np.testing.assert_array_equal(patterns[..., 1],
+                                      PatternLibrary.drift_all(windows, window_timestamps))
+
+    def __windows(self, window_size):
+        '''Returns a c x window_size x n array with all windows of self.data
+        '''
+        windows = np.lib.stride_tricks.sliding_window_view(self.data, window_size, axis=0)
+        return windows.transpose(0, 2, 1)
+
+    def __timestamps(self, window_size):
+        '''Returns a c x window_size array with the timestamps of the windows of self.data
+        '''
+        return np.lib.stride_tricks.sliding_window_view(self.timestamps, window_size)
+
+if __name__ == '__main__':
+    unittest.main()
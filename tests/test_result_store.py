@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from sfdd.result_store import FaultIntervalStore
+
+class FaultIntervalStoreTest(unittest.TestCase):
+    '''Checks that a reopened store continues the stored results
+    '''
+    sensor_names = ['a', 'b', 'c']
+    pattern_names = ['stuck_at', 'drift']
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, 'results.faults')
+        with FaultIntervalStore(self.file_name, self.sensor_names, self.pattern_names) as store:
+            store.append(1., np.array([True, False, False]))
+            store.append(2., np.array([True, True, False]))
+            store.append(3., np.array([False, False, False]))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_reopen(self):
+        with FaultIntervalStore(self.file_name, self.sensor_names, self.pattern_names) as store:
+            self.assertEqual(store.last_timestamp, 2.)
+            with self.assertRaises(ValueError):
+                store.append(1.5, np.array([False, False, True]))
+            store.append(4., np.array([False, False, True]))
+            self.assertEqual(store.intervals(), [(1., 2., 'a', None), (2., 2., 'b', None),
+                                                 (4., 4., 'c', None)])
+
+    def test_reopen_different_names(self):
+        with self.assertRaises(ValueError):
+            FaultIntervalStore(self.file_name, ['a', 'b', 'd'])
+        with self.assertRaises(ValueError):
+            FaultIntervalStore(self.file_name, self.sensor_names, ['stuck_at'])
+
+if __name__ == '__main__':
+    unittest.main()
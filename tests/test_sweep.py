@@ -0,0 +1,101 @@
+import unittest
+import numpy as np
+
+from sfdd.structural_model import StructuralModel
+from sfdd.patterns import PatternLibrary, PatternRegistry
+from sfdd.sfdd import SFDD
+from sfdd.sweep import DetectionStatistics, ParameterSweep
+from tests.test_detection import model_file_name, test_log_file_name, read_log
+
+class ParameterSweepTest(unittest.TestCase):
+    '''Checks that the result of every configuration of a "ParameterSweep"
+    equals the statistics of "SFDD.detect_log" with the same configuration
+    '''
+    correlation_thresholds = (0.7, 0.8, 0.9)
+    window_sizes = (5, 20)
+    pattern_tolerances = (None, 0.01)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.structural_model = StructuralModel(model_file_name)
+        # most sensors are constant at the beginning of the training log, so that
+        # all thresholds would give the same extended model; the second half
+        # of the test log slice is used for training instead
+        timestamps, data = read_log(cls.structural_model, test_log_file_name, 1200)
+        cls.timestamps, cls.data = timestamps[0:600], data[0:600]
+        cls.training_timestamps, cls.training_data = timestamps[600:], data[600:]
+        cls.fault_intervals = [('pos_x', cls.timestamps[100], cls.timestamps[300]),
+                               ('current_joint4', cls.timestamps[400], cls.timestamps[420]),
+                               ('sensed_angle_joint2', cls.timestamps[450], cls.timestamps[590]),
+                               ('battery_status', cls.timestamps[590], cls.timestamps[599])]
+
+    def sfdd_manager(self, correlation_threshold, pattern_tolerance=None):
+        pattern_registry = None
+        if pattern_tolerance is not None:
+            pattern_registry = PatternRegistry()
+            pattern_registry.register('stuck_at', PatternLibrary.stuck_at_features,
+                                      ['differences'], pattern_tolerance)
+            pattern_registry.register('drift', PatternLibrary.drift_features,
+                                      ['differences', 'slopes', 'slope_differences'],
+                                      pattern_tolerance)
+        return SFDD(self.structural_model.sensors, self.structural_model,
+                    correlation_threshold, 2, pattern_registry=pattern_registry)
+
+    def expected_summary(self, sfdd_manager, window_size, mode):
+        '''Returns the statistics of the faults found by "detect_log", with the
+        (window, sensor) pairs whose time span overlaps a fault interval labelled as faulty
+        '''
+        faults, end_times = sfdd_manager.detect_log(self.data, self.timestamps, window_size,
+                                                    mode=mode)
+        start_times = self.timestamps[0:faults.shape[0]]
+        faulty = np.zeros(faults.shape, dtype=bool)
+        fault_windows = list()
+        fault_intervals = list()
+        for sensor, start_time, end_time in self.fault_intervals:
+            sensor_idx = sfdd_manager.sensor_names.index(sensor)
+            windows = np.where((end_times >= start_time) & (start_times <= end_time))[0]
+            faulty[windows, sensor_idx] = True
+            fault_windows.append((windows[0], windows[-1] + 1, sensor_idx))
+            fault_intervals.append((sensor_idx, start_time, end_time))
+
+        statistics = DetectionStatistics(len(fault_intervals))
+        statistics.add(faults, faulty, fault_windows, end_times)
+        return statistics.summary(fault_intervals)
+
+    def check_sweep(self, mode):
+        sweep = ParameterSweep(self.sfdd_manager(0.8), self.correlation_thresholds,
+                               self.window_sizes, self.pattern_tolerances, mode, chunk_size=97)
+        results = sweep.run(self.data, self.timestamps, self.fault_intervals,
+                            self.training_data, self.training_timestamps)
+        self.assertEqual(len(results), len(self.correlation_thresholds) *
+                         len(self.window_sizes) * len(self.pattern_tolerances))
+
+        for result in results:
+            sfdd_manager = self.sfdd_manager(result['correlation_threshold'],
+                                             result['pattern_tolerance'])
+            if mode == 'extended':
+                sfdd_manager.learn_correlations(self.training_data)
+                sfdd_manager.find_normal_patterns(self.training_data, self.training_timestamps,
+                                                  window_size=result['window_size'])
+            expected = self.expected_summary(sfdd_manager, result['window_size'], mode)
+            summary = dict((key, value) for key, value in result.items()
+                           if key not in ('correlation_threshold', 'window_size',
+                                          'pattern_tolerance'))
+            self.assertEqual(summary, expected)
+        self.assertTrue(any(result['true_positives'] > 0 for result in results))
+
+        # the thresholds have to give different results for the comparison to cover them
+        window_size, tolerance = self.window_sizes[-1], self.pattern_tolerances[0]
+        self.assertEqual(len(set(result['false_positives'] for result in results
+                                 if result['window_size'] == window_size and
+                                 result['pattern_tolerance'] == tolerance)),
+                         len(self.correlation_thresholds))
+
+    def test_sweep_basic(self):
+        self.check_sweep('basic')
+
+    def test_sweep_extended(self):
+        self.check_sweep('extended')
+
+if __name__ == '__main__':
+    unittest.main()
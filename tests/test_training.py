@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from sfdd.structural_model import StructuralModel
+from sfdd.log_reader import LogReader
+from sfdd.sfdd import SFDD
+from sfdd.training import TrainingPipeline
+from tests.test_detection import model_file_name, test_log_file_name
+
+class TrainingPipelineTest(unittest.TestCase):
+    '''Checks the model trained by a "TrainingPipeline" on a log split into several files
+    '''
+    window_size = 10
+    split_rows = (0, 300, 700, 1200)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.structural_model = StructuralModel(model_file_name)
+        cls.directory = tempfile.mkdtemp()
+        with open(test_log_file_name, 'r') as log_file:
+            header = log_file.readline()
+            lines = log_file.readlines()
+
+        cls.log_file_names = list()
+        for i, (start, end) in enumerate(zip(cls.split_rows[:-1], cls.split_rows[1:])):
+            log_file_name = os.path.join(cls.directory, 'part_{0}.log'.format(i))
+            with open(log_file_name, 'w') as log_file:
+                log_file.write(header)
+                log_file.writelines(lines[start:end])
+            cls.log_file_names.append(log_file_name)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def sfdd_manager(self):
+        return SFDD(self.structural_model.sensors, self.structural_model, 0.8, 2)
+
+    def train(self, log_file_names, process_count):
+        sfdd_manager = self.sfdd_manager()
+        TrainingPipeline(sfdd_manager, self.window_size, process_count,
+                         cache_directory=self.directory).run(log_file_names)
+        return sfdd_manager
+
+    def test_merged_training(self):
+        logs = [LogReader(log_file_name, use_cache=False).read_sensors(
+                    self.structural_model.sensors)
+                for log_file_name in self.log_file_names]
+
+        # the correlations are learned from the concatenated data
+        expected_manager = self.sfdd_manager()
+        expected_manager.learn_correlations(np.vstack([data for _, data in logs]))
+
+        # the windows do not cross the boundaries of the log files, so the pattern
+        # pairs are those found in each of the logs with the same correlations
+        pattern_pair_table = np.zeros_like(expected_manager.pattern_pair_table)
+        for timestamps, data in logs:
+            expected_manager.find_normal_patterns(data, timestamps, window_size=self.window_size)
+            pattern_pair_table |= expected_manager.pattern_pair_table
+        expected_manager.pattern_pair_table = pattern_pair_table
+        self.assertTrue(expected_manager.correlated_sensor_matrix.any())
+        self.assertTrue(pattern_pair_table.any())
+
+        for log_file_names in (self.log_file_names, self.log_file_names[::-1]):
+            for process_count in (1, 2):
+                sfdd_manager = self.train(log_file_names, process_count)
+                np.testing.assert_array_equal(sfdd_manager.correlated_sensor_matrix,
+                                              expected_manager.correlated_sensor_matrix)
+                np.testing.assert_array_equal(sfdd_manager.pattern_pair_table,
+                                              expected_manager.pattern_pair_table)
+
+    def test_single_log(self):
+        # with a single log, the pipeline is the same as the direct training
+        timestamps, data = LogReader(test_log_file_name, use_cache=False).read_sensors(
+            self.structural_model.sensors)
+        timestamps, data = timestamps[0:1200], data[0:1200]
+        expected_manager = self.sfdd_manager()
+        expected_manager.learn_correlations(data)
+        expected_manager.find_normal_patterns(data, timestamps, window_size=self.window_size)
+
+        log_file_name = os.path.join(self.directory, 'whole.log')
+        with open(test_log_file_name, 'r') as log_file, open(log_file_name, 'w') as whole_log:
+            whole_log.writelines(log_file.readlines()[0:1201])
+        sfdd_manager = self.train([log_file_name], 1)
+        np.testing.assert_array_equal(sfdd_manager.correlated_sensor_matrix,
+                                      expected_manager.correlated_sensor_matrix)
+        np.testing.assert_array_equal(sfdd_manager.pattern_pair_table,
+                                      expected_manager.pattern_pair_table)
+
+    def test_no_logs(self):
+        with self.assertRaises(ValueError):
+            self.train([], 1)
+
+if __name__ == '__main__':
+    unittest.main()